@@ -27,7 +27,7 @@ export const VoiceProvider = ({ children }) => {
         }
     };
 
-    const speak = async (text, forceLang) => {
+    const speak = async (text, forceLang, audioUrl) => {
         const targetLang = forceLang || language;
 
         // 1. Stop any current audio
@@ -37,9 +37,9 @@ export const VoiceProvider = ({ children }) => {
         }
         if (synth) synth.cancel();
 
-        // 2. Try Backend TTS (High Quality)
+        // 2. Try Backend TTS (High Quality); audioUrl is a clip the server already synthesized
         try {
-            const response = await fetch(`/api/chat/tts?text=${encodeURIComponent(text)}&lang=${targetLang}`);
+            const response = await fetch(audioUrl || `/api/chat/tts?text=${encodeURIComponent(text)}&lang=${targetLang}`);
             if (response.ok) {
                 const blob = await response.blob();
                 const url = URL.createObjectURL(blob);
@@ -127,7 +127,7 @@ const Schemes = () => {
                                     </span>
                                 )}
                             </div>
-                            <button onClick={() => speak(item.detailed_description || `${item.name}. ${item.description}`)} className="text-mitron-green text-xl">🔊</button>
+                            <button onClick={() => speak(item.detailed_description || `${item.name}. ${item.description}`, undefined, item.audio_url)} className="text-mitron-green text-xl">🔊</button>
                         </div>
                         <p className="text-gray-600 dark:text-green-200 mt-2 text-sm leading-relaxed">
                             {item.detailed_description || item.description}
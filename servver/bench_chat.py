@@ -0,0 +1,175 @@
+import sys
+import os
+import json
+import time
+import asyncio
+import threading
+
+import numpy as np
+
+# Load test for /api/chat against a local stub LLM server.
+#
+# The stub answers OpenAI-style chat completions after STUB_DELAY_MS, like a
+# slow Groq reply (streamed replies spread that delay over their tokens). While CONCURRENCY chats are in flight, a probe hits GET
+# /api/sensors/live every PROBE_INTERVAL_MS: if the chat path blocks the event
+# loop, the probe latency climbs to the LLM round trip.
+#
+#   python bench_chat.py          # shared AsyncGroq client (current code)
+#   python bench_chat.py --sync   # per-request synchronous Groq client (old code)
+#   python bench_chat.py --stream # /api/chat/stream (Server-Sent Events)
+#   add --slow-primary to make the first model 10x slower (exercises hedging)
+#
+# Chat sessions are kept in memory so the benchmark doesn't need MongoDB.
+
+STUB_PORT = 8765
+APP_PORT = 8766
+STUB_DELAY_MS = 300
+STUB_REPLY = "Apply 50 kg/acre of urea in two splits: half at sowing and half at knee height."
+CONCURRENCY = 20
+TOTAL_CHATS = 100
+PROBE_INTERVAL_MS = 50
+STREAM = "--stream" in sys.argv
+SLOW_MODEL = "llama-3.3-70b-versatile" if "--slow-primary" in sys.argv else None
+
+os.environ["GROQ_API_KEY"] = "stub-key"
+os.environ["GROQ_BASE_URL"] = f"http://127.0.0.1:{STUB_PORT}"
+os.environ["MONGO_URI"] = "mongodb://127.0.0.1:9/?serverSelectionTimeoutMS=100"
+os.environ.setdefault("INFERENCE_WORKERS", "0")
+
+# Ensure we can import from local directory
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+def run_stub_llm():
+    """Minimal OpenAI-compatible /chat/completions endpoint on its own thread and loop."""
+    from aiohttp import web
+
+    async def completions(request):
+        body = await request.json()
+        delay_ms = STUB_DELAY_MS * (10 if body["model"] == SLOW_MODEL else 1)
+        if body.get("stream"):
+            words = STUB_REPLY.split(" ")
+            response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+            await response.prepare(request)
+            for i, word in enumerate(words):
+                await asyncio.sleep(delay_ms / 1000 / len(words))
+                chunk = {"id": "stub", "object": "chat.completion.chunk", "created": int(time.time()), "model": body["model"],
+                         "choices": [{"index": 0, "delta": {"content": word if i == 0 else " " + word}, "finish_reason": None}]}
+                await response.write(f"data: {json.dumps(chunk)}\n\n".encode())
+            await response.write(b"data: [DONE]\n\n")
+            return response
+
+        await asyncio.sleep(delay_ms / 1000)
+        return web.json_response({
+            "id": "stub", "object": "chat.completion", "created": int(time.time()), "model": body["model"],
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": STUB_REPLY}}],
+            "usage": {"prompt_tokens": 100, "completion_tokens": 16, "total_tokens": 116},
+        })
+
+    app = web.Application()
+    app.router.add_post("/openai/v1/chat/completions", completions)
+    web.run_app(app, host="127.0.0.1", port=STUB_PORT, print=None, handle_signals=False)
+
+def use_legacy_client():
+    """The old chat path: a new synchronous Groq client per call, blocking the loop."""
+    from groq import Groq
+    from llm_client import llm_client
+
+    async def legacy_complete(messages, model, **kwargs):
+        client = Groq(api_key=os.environ["GROQ_API_KEY"], base_url=os.environ["GROQ_BASE_URL"])
+        completion = client.chat.completions.create(messages=messages, model=model, **kwargs)
+        return completion.choices[0].message.content
+
+    llm_client.complete = legacy_complete
+
+def run_app():
+    import uvicorn
+    import main
+    from routes import api
+    from memory_db import MemoryDB
+
+    api.db = MemoryDB()
+    if "--sync" in sys.argv:
+        use_legacy_client()
+    uvicorn.run(main.app, host="127.0.0.1", port=APP_PORT, log_level="warning")
+
+async def wait_until_up(client, url):
+    for _ in range(200):
+        try:
+            await client.get(url)
+            return
+        except Exception:
+            await asyncio.sleep(0.1)
+    raise RuntimeError(f"{url} did not come up")
+
+async def load_test():
+    import httpx
+
+    base = f"http://127.0.0.1:{APP_PORT}"
+    async with httpx.AsyncClient(timeout=120, limits=httpx.Limits(max_connections=CONCURRENCY + 5)) as client:
+        await wait_until_up(client, f"{base}/")
+
+        chat_latencies, first_byte_latencies, probe_latencies, failures = [], [], [], []
+        queue = asyncio.Queue()
+        for i in range(TOTAL_CHATS):
+            queue.put_nowait(i)
+        done = asyncio.Event()
+
+        async def chatter():
+            while not queue.empty():
+                i = queue.get_nowait()
+                body = {"message": f"Which fertilizer for maize? #{i}", "userId": "bench"}
+                started = time.perf_counter()
+                if STREAM:
+                    first_byte, events = None, ""
+                    async with client.stream("POST", f"{base}/api/chat/stream", json=body) as r:
+                        async for chunk in r.aiter_text():
+                            if first_byte is None and "event: token" in chunk:
+                                first_byte = time.perf_counter()
+                            events += chunk
+                    first_byte_latencies.append(((first_byte or time.perf_counter()) - started) * 1000)
+                    if "event: done" not in events:
+                        failures.append(events[-200:])
+                else:
+                    r = await client.post(f"{base}/api/chat", json=body)
+                    first_byte_latencies.append((time.perf_counter() - started) * 1000)
+                    if r.status_code != 200 or "Error" in r.json().get("reply", ""):
+                        failures.append(r.text[:200])
+                chat_latencies.append((time.perf_counter() - started) * 1000)
+
+        async def prober():
+            while not done.is_set():
+                started = time.perf_counter()
+                await client.get(f"{base}/api/sensors/live")
+                probe_latencies.append((time.perf_counter() - started) * 1000)
+                await asyncio.sleep(PROBE_INTERVAL_MS / 1000)
+
+        probe = asyncio.create_task(prober())
+        started = time.perf_counter()
+        await asyncio.gather(*(chatter() for _ in range(CONCURRENCY)))
+        elapsed = time.perf_counter() - started
+        done.set()
+        await probe
+        chat_stats = (await client.get(f"{base}/api/chat/stats")).json()
+
+    chats, probes = np.asarray(chat_latencies), np.asarray(probe_latencies)
+    first_bytes = np.asarray(first_byte_latencies)
+    mode = "sync Groq per request" if "--sync" in sys.argv else "shared AsyncGroq"
+    if STREAM:
+        mode += ", /api/chat/stream"
+    print(f"\n🔍 {mode}: {TOTAL_CHATS} chats, concurrency {CONCURRENCY}, stub LLM delay {STUB_DELAY_MS} ms")
+    print(f"   throughput:        {TOTAL_CHATS / elapsed:8.1f} chats/s  ({elapsed:.1f}s total, {len(failures)} failed)")
+    print(f"   time to 1st byte:  p50 {np.percentile(first_bytes, 50):8.1f} ms   p95 {np.percentile(first_bytes, 95):8.1f} ms")
+    print(f"   chat latency:      p50 {np.percentile(chats, 50):8.1f} ms   p95 {np.percentile(chats, 95):8.1f} ms")
+    print(f"   probe /sensors:    p50 {np.percentile(probes, 50):8.1f} ms   max {probes.max():8.1f} ms  ({len(probes)} probes)")
+    health = chat_stats["health"]
+    print(f"   hedges fired:      {health['hedges']}")
+    for model, entry in health["models"].items():
+        print(f"   {model:<26} ok {entry['successes']:>4}  lost hedges {entry['cancelled']:>4}  errors {entry['errors']:>3}  latency {entry['latency_ms']} ms")
+    if failures:
+        print(f"   first failure: {failures[0]}")
+
+if __name__ == "__main__":
+    threading.Thread(target=run_stub_llm, daemon=True).start()
+    threading.Thread(target=run_app, daemon=True).start()
+    asyncio.run(load_test())
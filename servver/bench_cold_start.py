@@ -0,0 +1,74 @@
+import sys
+import os
+import json
+import subprocess
+
+# Measures cold start and memory of N concurrent workers per model backend.
+# Each worker warms up model_loader (like an inference worker does at boot),
+# reports its load time, RSS and PSS, and stays alive until all N are up,
+# so the PSS column shows how much of the model memory is shared.
+# Linux only (reads /proc). Run `python forest_compiler.py` first so the
+# flat backends have something to load.
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+WORKERS = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+
+WORKER_CODE = """
+import json, sys
+import model_loader
+model_loader.warm_up()
+
+pss_mb = None
+with open("/proc/self/smaps_rollup") as f:
+    for line in f:
+        if line.startswith("Pss:"):
+            pss_mb = round(int(line.split()[1]) / 1024, 1)
+
+report = dict(model_loader.load_report, pss_mb=pss_mb)
+print(json.dumps(report), flush=True)
+sys.stdin.read()  # stay alive until the parent has measured everyone
+"""
+
+BACKENDS = [
+    ("sklearn pickle", {"MODEL_BACKEND": "sklearn"}),
+    ("flat (in RAM)", {"MODEL_BACKEND": "flat", "MODEL_MMAP": "none"}),
+    ("flat + mmap", {"MODEL_BACKEND": "flat", "MODEL_MMAP": "r"}),
+]
+
+def run_workers(env_overrides):
+    env = dict(os.environ, PYTHONWARNINGS="ignore", **env_overrides)
+    workers = [
+        subprocess.Popen(
+            [sys.executable, "-c", WORKER_CODE],
+            cwd=BASE_DIR, env=env, text=True,
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+        )
+        for _ in range(WORKERS)
+    ]
+    reports = []
+    for worker in workers:
+        # model_loader prints progress lines; the report is the last JSON line
+        for line in worker.stdout:
+            if line.startswith("{"):
+                reports.append(json.loads(line))
+                break
+    for worker in workers:
+        worker.stdin.close()
+        worker.wait()
+    return reports
+
+def run_benchmark():
+    print(f"🔍 Cold start of {WORKERS} concurrent workers per backend\n")
+    print(f"{'backend':<18}{'load s (mean)':>15}{'RSS MB (mean)':>15}{'PSS MB (mean)':>15}{'PSS MB (total)':>16}")
+    for name, env_overrides in BACKENDS:
+        reports = run_workers(env_overrides)
+        if len(reports) < WORKERS:
+            print(f"{name:<18}  ❌ only {len(reports)}/{WORKERS} workers reported")
+            continue
+        load = sum(sum(r["load_seconds"].values()) for r in reports) / len(reports)
+        rss = sum(r["rss_mb"] or 0 for r in reports) / len(reports)
+        pss = [r["pss_mb"] or 0 for r in reports]
+        print(f"{name:<18}{load:>15.3f}{rss:>15.1f}{sum(pss) / len(pss):>15.1f}{sum(pss):>16.1f}")
+
+if __name__ == "__main__":
+    run_benchmark()
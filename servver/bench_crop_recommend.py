@@ -0,0 +1,80 @@
+import sys
+import os
+import time
+import random
+
+import numpy as np
+import pandas as pd
+
+# Ensure we can import from local directory
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from model_loader import crop_model, label_encoder
+from crop_recommender import predict_top_crops
+
+DURATION = 5  # seconds per path
+
+def legacy_predict(data):
+    """The old /api/ml/recommend body: one-row DataFrame + full argsort."""
+    input_data = pd.DataFrame([{
+        "N": data["N"],
+        "P": data["P"],
+        "K": data["K"],
+        "temperature": data["temperature"],
+        "humidity": data["humidity"],
+        "ph": data["ph"],
+        "rainfall": data["rainfall"]
+    }])
+    proba = crop_model.predict_proba(input_data)[0]
+    top_5_indices = np.argsort(proba)[-5:][::-1]
+    classes = label_encoder.classes_
+    recommendations = []
+    for idx in top_5_indices:
+        score = proba[idx] * 100
+        if score > 0:
+            recommendations.append({"name": classes[idx], "confidence": round(score, 1)})
+    return {"crops": recommendations}
+
+def random_request():
+    return {
+        "N": random.uniform(0, 140),
+        "P": random.uniform(5, 145),
+        "K": random.uniform(5, 205),
+        "temperature": random.uniform(8, 44),
+        "humidity": random.uniform(14, 100),
+        "ph": random.uniform(3.5, 10),
+        "rainfall": random.uniform(20, 300),
+    }
+
+def requests_per_second(fn, requests):
+    done = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < DURATION:
+        fn(requests[done % len(requests)])
+        done += 1
+    return done / (time.perf_counter() - start)
+
+def run_benchmark():
+    if crop_model is None or label_encoder is None:
+        print("❌ Crop model not loaded, nothing to benchmark.")
+        return
+
+    random.seed(42)
+    requests = [random_request() for _ in range(200)]
+
+    # Sanity check: the fast path must pick the same top crop
+    mismatches = sum(
+        legacy_predict(r)["crops"][0]["name"] != predict_top_crops(r)["crops"][0]["name"]
+        for r in requests[:50]
+    )
+    print(f"Top-crop mismatches on 50 samples: {mismatches}")
+
+    print(f"\n🔍 /api/ml/recommend prediction path, single worker, {DURATION}s each\n")
+    before = requests_per_second(legacy_predict, requests)
+    after = requests_per_second(predict_top_crops, requests)
+    print(f"{'before (DataFrame + argsort)':<38}{before:8.1f} req/s")
+    print(f"{'after (float64 row + argpartition)':<38}{after:8.1f} req/s")
+    print(f"speedup: {after / before:.2f}x")
+
+if __name__ == "__main__":
+    run_benchmark()
@@ -0,0 +1,61 @@
+import sys
+import os
+import time
+import warnings
+
+import numpy as np
+import joblib
+
+# Ensure we can import from local directory
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from forest_compiler import FlatForest, HybridForest
+from model_loader import FLAT_MAX_BATCH_ROWS
+from test_forest_parity import REAL_MODELS, random_rows
+
+# predict_proba throughput per batch size: the sklearn pickle, the flattened
+# forest, and what MODEL_BACKEND=auto serves (flat up to FLAT_MAX_BATCH_ROWS
+# rows, sklearn above).
+#
+#   python bench_forest.py
+
+BATCH_SIZES = [1, 64, 10000]
+DURATION = 1.0  # seconds per backend and batch size (at least 3 calls)
+
+def rows_per_second(fn, X):
+    fn(X)  # warm-up
+    calls = 0
+    start = time.perf_counter()
+    while calls < 3 or time.perf_counter() - start < DURATION:
+        fn(X)
+        calls += 1
+    elapsed = time.perf_counter() - start
+    return calls * len(X) / elapsed, elapsed / calls * 1000
+
+def run_benchmark():
+    print(f"\n🔍 predict_proba throughput, rows/s (ms per call); auto = flat up to {FLAT_MAX_BATCH_ROWS} rows\n")
+    print(f"{'model':<22}{'rows':>7}{'sklearn':>22}{'flat':>22}{'auto':>22}")
+    for pickle_path, ranges in REAL_MODELS:
+        if not os.path.exists(pickle_path):
+            print(f"Skipping {pickle_path} (not found)")
+            continue
+        model = joblib.load(pickle_path)
+        flat = FlatForest.from_sklearn(model)
+        auto = HybridForest(flat, lambda: model, FLAT_MAX_BATCH_ROWS)
+
+        for size in BATCH_SIZES:
+            X = random_rows(ranges, size)
+            if hasattr(model, "feature_names_in_"):
+                import pandas as pd
+                X = pd.DataFrame(X, columns=model.feature_names_in_)
+            np.testing.assert_allclose(flat.predict_proba(X), model.predict_proba(X), rtol=0, atol=1e-12)
+
+            cells = []
+            for backend in (model, flat, auto):
+                throughput, call_ms = rows_per_second(backend.predict_proba, X)
+                cells.append(f"{throughput:>12,.0f} ({call_ms:>6.2f})")
+            print(f"{os.path.basename(pickle_path):<22}{size:>7}" + "".join(f"{c:>22}" for c in cells))
+
+if __name__ == "__main__":
+    warnings.simplefilter("ignore")  # sklearn feature-name warnings
+    run_benchmark()
@@ -0,0 +1,233 @@
+import sys
+import os
+import time
+import asyncio
+import threading
+
+import numpy as np
+
+# Load test for GET /api/market/prices against a local fixture server.
+#
+# The fixture server serves the saved pages in fixtures/commodityonline/ after
+# FIXTURE_DELAY_MS, like a slow mandi price site: Madurai has district pages,
+# Coimbatore doesn't (404, so the fetcher falls back to the state page).
+# While CONCURRENCY dashboards load, a probe hits GET /api/sensors/live every
+# PROBE_INTERVAL_MS: if the price fetch blocks the event loop, the probe
+# latency climbs to the page fetch time.
+#
+#   python bench_market.py           # shared aiohttp session (current code), price cache off
+#   python bench_market.py --cached  # the same with the price cache (loads after the first are hits)
+#   python bench_market.py --legacy  # ThreadPoolExecutor + requests per call (old code)
+#   python bench_market.py --bulk    # BULK_DISTRICTS districts: one GET /prices each vs one POST /prices/bulk
+
+FIXTURE_PORT = 8775
+APP_PORT = 8776
+FIXTURE_DELAY_MS = 200
+CONCURRENCY = 10
+TOTAL_LOADS = 40
+PROBE_INTERVAL_MS = 50
+DISTRICTS = ["Madurai", "Coimbatore"]
+BULK_DISTRICTS = 30
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "commodityonline")
+
+os.environ["MARKET_BASE_URL"] = f"http://127.0.0.1:{FIXTURE_PORT}"
+os.environ["MONGO_URI"] = "mongodb://127.0.0.1:9/?serverSelectionTimeoutMS=100"
+os.environ.setdefault("INFERENCE_WORKERS", "0")
+os.environ.setdefault("SCHEME_AUDIO_BACKFILL", "0")
+CACHED = "--cached" in sys.argv
+if not CACHED:
+    os.environ["MARKET_CACHE_TTL"] = "0"
+
+# Ensure we can import from local directory
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+fixture_requests = {"district": 0, "state": 0}
+
+def run_fixture_server():
+    """CommodityOnline-like pages on their own thread and loop."""
+    from aiohttp import web
+
+    def page(name):
+        with open(os.path.join(FIXTURE_DIR, name), encoding="utf-8") as f:
+            return f.read()
+
+    district_page = page("tomato_tamil-nadu_madurai.html")
+    state_page = page("rice_tamil-nadu.html")
+
+    async def district(request):
+        fixture_requests["district"] += 1
+        await asyncio.sleep(FIXTURE_DELAY_MS / 1000)
+        if request.match_info["district"] != "madurai":
+            raise web.HTTPNotFound()
+        return web.Response(text=district_page, content_type="text/html")
+
+    async def state(request):
+        fixture_requests["state"] += 1
+        await asyncio.sleep(FIXTURE_DELAY_MS / 1000)
+        return web.Response(text=state_page, content_type="text/html")
+
+    app = web.Application()
+    app.router.add_get("/mandiprices/{slug}/{state}/{district}", district)
+    app.router.add_get("/mandiprices/{slug}/{state}", state)
+    web.run_app(app, host="127.0.0.1", port=FIXTURE_PORT, print=None, handle_signals=False)
+
+def legacy_fetch_commodity_price(commodity, state, district):
+    """The old fetcher: blocking requests, district page then state page, BeautifulSoup."""
+    import requests
+    from price_parser import parse_price_page_soup as parse_price_page
+
+    base = os.environ["MARKET_BASE_URL"]
+    state_slug = state.lower().replace(" ", "-")
+    district_slug = district.lower().replace(" ", "-")
+    url = f"{base}/mandiprices/{commodity['slug']}/{state_slug}/{district_slug}"
+    try:
+        headers = {'User-Agent': 'Mozilla/5.0'}
+        response = requests.get(url, headers=headers, timeout=3)
+        if response.status_code != 200:
+            url = f"{base}/mandiprices/{commodity['slug']}/{state_slug}"
+            response = requests.get(url, headers=headers, timeout=3)
+        if response.status_code == 200:
+            price = parse_price_page(response.text)
+            if price:
+                return {"commodity": commodity['id'], "name": commodity['name'], "price": round(price / 100, 2),
+                        "change": 0, "unit": "₹/kg",
+                        "market": f"{district} Mandi" if district_slug in url else f"{state} Avg", "grade": "FAQ"}
+    except Exception as e:
+        print(f"Error fetching {commodity['name']}: {e}")
+    return None
+
+async def legacy_fetch_all_prices(state, district):
+    """The old route body: a new 5-thread pool per call, waited on inside the event loop."""
+    import concurrent.futures
+    from routes.market import COMMODITIES
+
+    results = []
+    with concurrent.futures.ThreadPoolExecutor(max_workers=5) as executor:
+        futures = [executor.submit(legacy_fetch_commodity_price, c, state, district) for c in COMMODITIES]
+        for future in concurrent.futures.as_completed(futures):
+            if future.result():
+                results.append(future.result())
+    return results
+
+def run_app():
+    import uvicorn
+    import main
+    from routes import market
+
+    if "--legacy" in sys.argv:
+        market.fetch_all_prices = legacy_fetch_all_prices
+    uvicorn.run(main.app, host="127.0.0.1", port=APP_PORT, log_level="warning")
+
+async def wait_until_up(client, url):
+    for _ in range(200):
+        try:
+            await client.get(url)
+            return
+        except Exception:
+            await asyncio.sleep(0.1)
+    raise RuntimeError(f"{url} did not come up")
+
+async def load_test():
+    import httpx
+
+    base = f"http://127.0.0.1:{APP_PORT}"
+    async with httpx.AsyncClient(timeout=120, limits=httpx.Limits(max_connections=CONCURRENCY + 5)) as client:
+        await wait_until_up(client, f"{base}/")
+
+        # Same prices as the old fetcher, from the same pages
+        def comparable(rows):
+            return sorted(str({k: v for k, v in row.items() if k not in ("age_seconds", "updated_at", "level")}) for row in rows)
+
+        expected = {d: comparable(await legacy_fetch_all_prices("Tamil Nadu", d)) for d in DISTRICTS}
+        for d in DISTRICTS:
+            got = (await client.get(f"{base}/api/market/prices", params={"state": "Tamil Nadu", "district": d})).json()
+            assert comparable(got) == expected[d], (d, got, expected[d])
+        fixture_requests.update(district=0, state=0)
+
+        load_latencies, probe_latencies, failures = [], [], []
+        queue = asyncio.Queue()
+        for i in range(TOTAL_LOADS):
+            queue.put_nowait(i)
+        done = asyncio.Event()
+
+        async def dashboard():
+            while not queue.empty():
+                i = queue.get_nowait()
+                started = time.perf_counter()
+                r = await client.get(f"{base}/api/market/prices",
+                                     params={"state": "Tamil Nadu", "district": DISTRICTS[i % len(DISTRICTS)]})
+                load_latencies.append((time.perf_counter() - started) * 1000)
+                if r.status_code != 200 or r.json()[0]["commodity"] == "error":
+                    failures.append(r.text[:200])
+
+        async def prober():
+            while not done.is_set():
+                started = time.perf_counter()
+                await client.get(f"{base}/api/sensors/live")
+                probe_latencies.append((time.perf_counter() - started) * 1000)
+                await asyncio.sleep(PROBE_INTERVAL_MS / 1000)
+
+        probe = asyncio.create_task(prober())
+        started = time.perf_counter()
+        await asyncio.gather(*(dashboard() for _ in range(CONCURRENCY)))
+        elapsed = time.perf_counter() - started
+        done.set()
+        await probe
+
+    loads, probes = np.asarray(load_latencies), np.asarray(probe_latencies)
+    mode = "ThreadPoolExecutor + requests per call" if "--legacy" in sys.argv else "shared aiohttp session"
+    if CACHED:
+        mode += " + price cache"
+    print(f"\n🔍 {mode}: {TOTAL_LOADS} dashboard loads, concurrency {CONCURRENCY}, fixture delay {FIXTURE_DELAY_MS} ms")
+    print(f"   prices match the old fetcher for {', '.join(DISTRICTS)}")
+    print(f"   throughput:        {TOTAL_LOADS / elapsed:8.1f} loads/s  ({elapsed:.1f}s total, {len(failures)} failed)")
+    print(f"   dashboard latency: p50 {np.percentile(loads, 50):8.1f} ms   p95 {np.percentile(loads, 95):8.1f} ms")
+    print(f"   probe /sensors:    p50 {np.percentile(probes, 50):8.1f} ms   max {probes.max():8.1f} ms  ({len(probes)} probes)")
+    print(f"   fixture requests:  {fixture_requests['district']} district pages, {fixture_requests['state']} state pages")
+    if failures:
+        print(f"   first failure: {failures[0]}")
+
+async def bulk_test():
+    import json
+    import httpx
+
+    base = f"http://127.0.0.1:{APP_PORT}"
+    districts = ["Madurai"] + [f"District {i}" for i in range(1, BULK_DISTRICTS)]
+    async with httpx.AsyncClient(timeout=120, limits=httpx.Limits(max_connections=BULK_DISTRICTS + 5)) as client:
+        await wait_until_up(client, f"{base}/")
+
+        fixture_requests.update(district=0, state=0)
+        started = time.perf_counter()
+        singles = await asyncio.gather(*(
+            client.get(f"{base}/api/market/prices", params={"state": "Tamil Nadu", "district": d}) for d in districts
+        ))
+        single_elapsed = time.perf_counter() - started
+        single_requests = dict(fixture_requests)
+
+        fixture_requests.update(district=0, state=0)
+        lines, first_line = [], None
+        started = time.perf_counter()
+        payload = {"locations": [{"state": "Tamil Nadu", "district": d} for d in districts]}
+        async with client.stream("POST", f"{base}/api/market/prices/bulk", json=payload) as response:
+            async for line in response.aiter_lines():
+                if line:
+                    first_line = first_line or time.perf_counter() - started
+                    lines.append(json.loads(line))
+        bulk_elapsed = time.perf_counter() - started
+
+    # Same prices either way
+    by_district = {line["district"]: line["prices"] for line in lines[:-1]}
+    for d, r in zip(districts, singles):
+        assert by_district[d] == r.json(), d
+
+    print(f"\n🔍 {BULK_DISTRICTS} districts of one state, fixture delay {FIXTURE_DELAY_MS} ms, price cache off")
+    print(f"   {BULK_DISTRICTS} x GET /prices: {single_elapsed:6.2f}s   fixture requests: "
+          f"{single_requests['district']} district + {single_requests['state']} state pages")
+    print(f"   POST /prices/bulk:  {bulk_elapsed:6.2f}s   fixture requests: "
+          f"{fixture_requests['district']} district + {fixture_requests['state']} state pages, first district after {first_line:.2f}s")
+    print(f"   summary: {lines[-1]['summary']}")
+
+if __name__ == "__main__":
+    threading.Thread(target=run_fixture_server, daemon=True).start()
+    threading.Thread(target=run_app, daemon=True).start()
+    asyncio.run(bulk_test() if "--bulk" in sys.argv else load_test())
@@ -0,0 +1,49 @@
+import sys
+import os
+import time
+
+import numpy as np
+
+# Ensure we can import from local directory
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from price_parser import parse_price_page_soup, parse_price_page_stream
+
+# Parse time per saved CommodityOnline page, soup (html.parser, whole tree)
+# vs stream (lxml pull parser, stops at the price table).
+#
+#   python bench_price_parser.py
+
+ITERATIONS = 200
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "commodityonline")
+
+def measure(fn, html):
+    timings = []
+    for _ in range(ITERATIONS):
+        start = time.perf_counter()
+        fn(html)
+        timings.append((time.perf_counter() - start) * 1000)
+    return np.percentile(timings, 50), np.percentile(timings, 99)
+
+def run_benchmark():
+    pages = sorted(name for name in os.listdir(FIXTURE_DIR) if name.endswith(".html"))
+
+    print(f"\n🔍 Price page parse time over {ITERATIONS} parses (ms)\n")
+    print(f"{'page':<34}{'price':>9}{'soup p50':>11}{'p99':>9}{'stream p50':>12}{'p99':>9}{'speedup':>9}")
+    for name in pages:
+        with open(os.path.join(FIXTURE_DIR, name), encoding="utf-8") as f:
+            html = f.read()
+
+        # Sanity check: both parsers must agree before timing them
+        price = parse_price_page_soup(html)
+        if parse_price_page_stream(html) != price:
+            print(f"❌ {name}: soup {price}, stream {parse_price_page_stream(html)}")
+            continue
+
+        soup_p50, soup_p99 = measure(parse_price_page_soup, html)
+        stream_p50, stream_p99 = measure(parse_price_page_stream, html)
+        print(f"{name:<34}{price:>9}{soup_p50:>11.2f}{soup_p99:>9.2f}{stream_p50:>12.2f}{stream_p99:>9.2f}"
+              f"{soup_p50 / stream_p50:>8.1f}x")
+
+if __name__ == "__main__":
+    run_benchmark()
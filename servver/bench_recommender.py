@@ -0,0 +1,90 @@
+import sys
+import os
+import time
+import random
+
+import numpy as np
+
+# Ensure we can import from local directory
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from model_loader import model, encoders, inference_plan
+from confidence import calculate_confidence
+from recommender import recommend
+
+ITERATIONS = 500
+
+def legacy_predict(input_data):
+    """The pre-plan path: LabelEncoder per string, predict + predict_proba (two forest passes)."""
+    encoded_soil = encoders['Soil Type'].transform([input_data['soil_type']])[0]
+    encoded_crop = encoders['Crop Type'].transform([input_data['crop']])[0]
+    input_vector = [[
+        input_data['temperature'], input_data['humidity'], input_data['moisture'],
+        encoded_soil, encoded_crop,
+        input_data['nitrogen'], input_data['potassium'], input_data['phosphorus']
+    ]]
+    pred_idx = model.predict(input_vector)[0]
+    pred_name = encoders['Fertilizer Name'].inverse_transform([pred_idx])[0]
+    confidence = calculate_confidence(model, input_vector[0])
+    return pred_name, confidence
+
+def plan_predict(input_data):
+    """The compiled-plan path: dict lookups and a single predict_proba."""
+    encoded_soil, encoded_crop = inference_plan.encode(input_data['soil_type'], input_data['crop'])
+    input_vector = [[
+        input_data['temperature'], input_data['humidity'], input_data['moisture'],
+        encoded_soil, encoded_crop,
+        input_data['nitrogen'], input_data['potassium'], input_data['phosphorus']
+    ]]
+    pred_names, confidences = inference_plan.predict(input_vector)
+    return pred_names[0], confidences[0]
+
+def random_input():
+    return {
+        "soil_type": random.choice(list(encoders['Soil Type'].classes_)),
+        "crop": random.choice(list(encoders['Crop Type'].classes_)),
+        "temperature": random.uniform(15, 40),
+        "humidity": random.uniform(30, 90),
+        "moisture": random.uniform(20, 70),
+        "nitrogen": random.uniform(0, 140),
+        "potassium": random.uniform(0, 60),
+        "phosphorus": random.uniform(0, 60),
+    }
+
+def measure(fn, inputs):
+    timings = []
+    for input_data in inputs:
+        start = time.perf_counter()
+        fn(input_data)
+        timings.append((time.perf_counter() - start) * 1000)
+    return np.percentile(timings, 50), np.percentile(timings, 99)
+
+def run_benchmark():
+    if model is None or inference_plan is None:
+        print("❌ Fertilizer model/encoders not loaded, nothing to benchmark.")
+        return
+
+    random.seed(42)
+    inputs = [random_input() for _ in range(ITERATIONS)]
+
+    # Sanity check: both paths must agree before timing them
+    mismatches = sum(legacy_predict(i)[0] != plan_predict(i)[0] for i in inputs[:50])
+    print(f"Label mismatches on 50 samples: {mismatches}")
+
+    # Warm up (first calls pay for lazy imports / allocations)
+    for input_data in inputs[:20]:
+        legacy_predict(input_data)
+        plan_predict(input_data)
+
+    print(f"\n🔍 Fertilizer inference latency over {ITERATIONS} single-row calls (ms)\n")
+    print(f"{'path':<28}{'p50':>10}{'p99':>10}")
+    for name, fn in [
+        ("before (encoders + 2 passes)", legacy_predict),
+        ("after (inference plan)", plan_predict),
+        ("recommend() end-to-end", recommend),
+    ]:
+        p50, p99 = measure(fn, inputs)
+        print(f"{name:<28}{p50:>10.3f}{p99:>10.3f}")
+
+if __name__ == "__main__":
+    run_benchmark()
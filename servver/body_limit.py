@@ -0,0 +1,57 @@
+import os
+import json
+
+from fastapi import HTTPException
+
+# Configuration
+CHAT_MAX_BODY_BYTES = int(float(os.getenv("CHAT_MAX_BODY_MB", "12")) * 1024 * 1024)  # base64 image + message
+
+class BodySizeLimitMiddleware:
+    """
+    Rejects request bodies over a per-path-prefix limit with 413, before
+    they are buffered and parsed. A Content-Length over the limit is
+    refused without reading the body; otherwise (chunked uploads) the
+    bytes are counted as they arrive and reading stops at the limit.
+    """
+
+    def __init__(self, app, limits):
+        self.app = app
+        self.limits = sorted(limits.items(), key=lambda item: -len(item[0]))  # prefix -> bytes, longest first
+
+    def _limit(self, path):
+        for prefix, limit in self.limits:
+            if path == prefix or path.startswith(prefix.rstrip("/") + "/"):
+                return limit
+        return None
+
+    async def _reject(self, send, limit):
+        body = json.dumps({"detail": f"Request body is larger than {limit // (1024 * 1024)} MB"}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 413,
+            "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+    async def __call__(self, scope, receive, send):
+        limit = self._limit(scope["path"]) if scope["type"] == "http" else None
+        if limit is None:
+            return await self.app(scope, receive, send)
+
+        declared = dict(scope["headers"]).get(b"content-length")
+        if declared is not None and declared.isdigit() and int(declared) > limit:
+            return await self._reject(send, limit)
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    # HTTPException passes through FastAPI's body parsing and is rendered as a 413
+                    raise HTTPException(status_code=413, detail=f"Request body is larger than {limit // (1024 * 1024)} MB")
+            return message
+
+        await self.app(scope, limited_receive, send)
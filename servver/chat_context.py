@@ -0,0 +1,199 @@
+import os
+import re
+import json
+import math
+import hashlib
+import threading
+from collections import OrderedDict, deque
+
+import numpy as np
+
+# Configuration
+CHAT_CONTEXT_MESSAGES = int(os.getenv("CHAT_CONTEXT_MESSAGES", "10"))        # most history messages loaded per turn
+CHAT_HISTORY_TOKEN_BUDGET = int(os.getenv("CHAT_HISTORY_TOKEN_BUDGET", "1500"))  # estimated tokens of history sent
+CHAT_MESSAGE_TOKEN_LIMIT = int(os.getenv("CHAT_MESSAGE_TOKEN_LIMIT", "2000"))    # longer messages are cut (pasted text)
+CHAT_PROFILE_CACHE_SIZE = int(os.getenv("CHAT_PROFILE_CACHE_SIZE", "5000"))      # rendered system prompts kept
+METRICS_WINDOW = 1000                                                            # recent prompts kept for percentiles
+TRUNCATION_MARK = " …[truncated]"
+
+# Token estimate without a tokenizer dependency, using the usual rules of thumb
+# for BPE tokenizers like Llama's: ~4 characters per token for Latin-script
+# words, ~2 for Indic scripts, 3 digits per token, one per punctuation mark.
+# It errs on the high side, which is the safe side for a budget.
+# (Indic vowel signs and viramas are not \w, hence the explicit Unicode blocks.)
+_PIECES = re.compile(r"[A-Za-z]+|\d+|(?:[^\W\d_]|[\u0900-\u0DFF])+|\S", re.UNICODE)
+
+def estimate_tokens(text):
+    if not text:
+        return 0
+    tokens = 0
+    for piece in _PIECES.findall(text):
+        if piece.isascii() and piece.isalpha():
+            tokens += math.ceil(len(piece) / 4)
+        elif piece.isdigit():
+            tokens += math.ceil(len(piece) / 3)
+        elif len(piece) > 1 or piece.isalpha():
+            tokens += math.ceil(len(piece) / 2)
+        else:
+            tokens += 1
+    return tokens
+
+def truncate_to_tokens(text, limit):
+    """text cut (on a piece boundary) to about `limit` estimated tokens, marked as truncated."""
+    if estimate_tokens(text) <= limit:
+        return text
+    tokens = 0
+    for match in _PIECES.finditer(text):
+        tokens += estimate_tokens(match.group())
+        if tokens > limit:
+            return text[:match.start()].rstrip() + TRUNCATION_MARK
+    return text
+
+def render_system_prompt(language, user_context):
+    """The MITRON system prompt with the farmer profile and live sensor block."""
+    system_context = f"""You are "MITRON", a helpful and expert farming assistant.
+        Context: User language is {language}.
+        Task: Answer the user's question about agriculture, crops, weather, or the provided image.
+        Style: Simple, encouraging, expert advice. Respond in the user's language if specified."""
+
+    # Inject User Profile & Soil Data if available
+    if user_context:
+        system_context += f"\n\n--- FARMER PROFILE ---\n"
+        system_context += f"Name: {user_context.get('name', 'Farmer')}\n"
+        system_context += f"Location: {user_context.get('location', 'Unknown')}\n"
+
+        if 'soil' in user_context:
+            s = user_context['soil']
+            system_context += f"Soil Type: {s.get('type', 'N/A')}\n"
+            system_context += f"Land Size: {s.get('landSize', 'N/A')}\n"
+            system_context += f"Water Source: {s.get('waterSource', 'N/A')}\n"
+
+        if 'sensors' in user_context:
+            sn = user_context['sensors']
+            system_context += f"\n--- REAL-TIME SOIL SENSORS (Live Data) ---\n"
+            system_context += f"Soil pH: {sn.get('ph', 'N/A')} (Ideal: 6.5-7.5)\n"
+            system_context += f"Nitrogen (N): {sn.get('n', 'N/A')} mg/kg\n"
+            system_context += f"Phosphorus (P): {sn.get('p', 'N/A')} mg/kg\n"
+            system_context += f"Potassium (K): {sn.get('k', 'N/A')} mg/kg\n"
+            system_context += f"Soil Moisture: {sn.get('moisture', 'N/A')}%\n"
+            system_context += f"Note: Use these sensor values to give specific fertilizer or irrigation advice."
+
+    return system_context
+
+def context_hash(language, user_context):
+    raw = json.dumps([language, user_context], sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+class ChatContextBuilder:
+    """
+    Builds the messages sent to the LLM for a chat turn.
+
+    The system prompt (profile + sensor block) is rendered once per
+    (userId, context hash) and kept in an LRU with its token estimate, since
+    a farmer's profile rarely changes between turns. History is added newest
+    first until CHAT_HISTORY_TOKEN_BUDGET would be exceeded, so one long
+    message costs older turns instead of blowing up the prompt; any single
+    message is also cut to CHAT_MESSAGE_TOKEN_LIMIT.
+    """
+
+    def __init__(self, history_budget=CHAT_HISTORY_TOKEN_BUDGET, message_limit=CHAT_MESSAGE_TOKEN_LIMIT,
+                 cache_size=CHAT_PROFILE_CACHE_SIZE):
+        self.history_budget = history_budget
+        self.message_limit = message_limit
+        self.cache_size = cache_size
+        self.system_prompts = OrderedDict()  # (userId, context hash) -> (prompt, tokens)
+        self.lock = threading.Lock()
+
+        # Metrics
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.prompt_tokens = deque(maxlen=METRICS_WINDOW)
+        self.dropped_messages = 0
+        self.truncated_messages = 0
+
+    def system_prompt(self, user_id, language, user_context):
+        """(prompt, estimated tokens), rendered only when this user's context changed."""
+        key = (user_id, context_hash(language, user_context))
+        with self.lock:
+            cached = self.system_prompts.get(key)
+            if cached is not None:
+                self.system_prompts.move_to_end(key)
+                self.cache_hits += 1
+                return cached
+        prompt = render_system_prompt(language, user_context)
+        cached = (prompt, estimate_tokens(prompt))
+        with self.lock:
+            self.cache_misses += 1
+            self.system_prompts[key] = cached
+            while len(self.system_prompts) > self.cache_size:
+                self.system_prompts.popitem(last=False)
+        return cached
+
+    def _cap(self, text):
+        capped = truncate_to_tokens(text, self.message_limit)
+        if capped is not text:
+            self.truncated_messages += 1
+        return capped
+
+    def build(self, user_id, language, user_context, history, current):
+        """
+        history: earlier {"role", "content"} messages, oldest first.
+        current: the user's message (str, or a list of content parts for images).
+        Returns (messages, token counts).
+        """
+        system_prompt, system_tokens = self.system_prompt(user_id, language, user_context)
+
+        if isinstance(current, str):
+            current = self._cap(current)
+            current_tokens = estimate_tokens(current)
+        else:
+            current_tokens = sum(estimate_tokens(part.get("text", "")) for part in current)
+
+        kept, history_tokens = [], 0
+        for message in reversed(history):
+            content = self._cap(message["content"])
+            tokens = estimate_tokens(content)
+            if history_tokens + tokens > self.history_budget:
+                break
+            kept.append({"role": message["role"], "content": content})
+            history_tokens += tokens
+        kept.reverse()
+        # A reply without the question it answers only confuses the model
+        if kept and kept[0]["role"] == "assistant" and len(kept) < len(history):
+            history_tokens -= estimate_tokens(kept.pop(0)["content"])
+        dropped = len(history) - len(kept)
+
+        messages = [{"role": "system", "content": system_prompt}] + kept + [{"role": "user", "content": current}]
+        counts = {
+            "system": system_tokens,
+            "history": history_tokens,
+            "history_messages": len(kept),
+            "dropped_messages": dropped,
+            "message": current_tokens,
+            "total": system_tokens + history_tokens + current_tokens,
+        }
+        with self.lock:
+            self.prompt_tokens.append(counts["total"])
+            self.dropped_messages += dropped
+        return messages, counts
+
+    def stats(self):
+        lookups = self.cache_hits + self.cache_misses
+        values = np.asarray(self.prompt_tokens) if self.prompt_tokens else np.zeros(1)
+        return {
+            "history_token_budget": self.history_budget,
+            "message_token_limit": self.message_limit,
+            "profile_cache_entries": len(self.system_prompts),
+            "profile_cache_hit_rate": round(self.cache_hits / lookups, 4) if lookups else 0.0,
+            "prompt_tokens": {
+                "prompts": len(self.prompt_tokens),
+                "p50": round(float(np.percentile(values, 50)), 1),
+                "p95": round(float(np.percentile(values, 95)), 1),
+                "max": int(values.max()),
+            },
+            "dropped_messages": self.dropped_messages,
+            "truncated_messages": self.truncated_messages,
+        }
+
+# Global instance
+context_builder = ChatContextBuilder()
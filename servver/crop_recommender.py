@@ -0,0 +1,70 @@
+import warnings
+
+import numpy as np
+from model_loader import get_crop_models
+
+TOP_K = 5
+
+# The model was fitted on a DataFrame; we feed it a plain float64 array in the
+# same column order, so sklearn's per-call feature-name warning is just noise.
+warnings.filterwarnings("ignore", message="X does not have valid feature names")
+
+def _to_matrix(crop, rows):
+    """Contiguous float64 matrix in the model's feature order (no DataFrame construction)."""
+    return np.array([[row[name] for name in crop.feature_order] for row in rows], dtype=np.float64)
+
+def _top_crops(crop, proba):
+    """Top 5 crops (with a non-zero probability) for one row of predict_proba."""
+    k = min(TOP_K, len(proba))
+    # argpartition finds the top k in O(n); only those k get sorted
+    top_indices = np.argpartition(proba, -k)[-k:]
+    top_indices = top_indices[np.argsort(proba[top_indices])[::-1]]
+
+    recommendations = []
+    for idx in top_indices:
+        score = float(proba[idx]) * 100 # Percentage
+        if score > 0: # Only include if some probability
+            recommendations.append({
+                "name": crop.classes[idx],
+                "confidence": round(score, 1)
+            })
+    return recommendations
+
+def predict_top_crops(features):
+    """
+    features expected keys:
+    - N, P, K
+    - temperature
+    - humidity
+    - ph
+    - rainfall
+    Returns the top 5 crops with their confidence (%).
+    """
+    crop = get_crop_models()  # loaded on first use
+    if not crop.model or not crop.label_encoder:
+        return {"error": "Model not loaded", "crops": []}
+
+    try:
+        proba = crop.model.predict_proba(_to_matrix(crop, [features]))[0]
+        return {"crops": _top_crops(crop, proba)}
+
+    except Exception as e:
+        print(f"ML Prediction Error: {e}")
+        return {"error": str(e), "crops": []}
+
+def predict_top_crops_batch(rows):
+    """
+    Batched variant of predict_top_crops(): one predict_proba for all rows.
+    Returns one {"crops": [...]} result per row, in order.
+    """
+    crop = get_crop_models()  # loaded on first use
+    if not crop.model or not crop.label_encoder:
+        return {"error": "Model not loaded", "crops": []}
+
+    try:
+        probas = crop.model.predict_proba(_to_matrix(crop, rows))
+        return [{"crops": _top_crops(crop, proba)} for proba in probas]
+
+    except Exception as e:
+        print(f"ML Prediction Error: {e}")
+        return {"error": str(e), "crops": []}
@@ -0,0 +1,237 @@
+import os
+import sys
+import json
+import time
+import threading
+
+import numpy as np
+
+# Arrays written by FlatForest.save(), one .npy file each
+ARRAY_NAMES = ["feature", "threshold", "left", "right", "value", "roots"]
+META_FILE = "meta.json"
+
+class FlatForest:
+    """
+    A fitted RandomForestClassifier flattened into packed NumPy arrays.
+
+    All trees share one node table (feature, threshold, left, right, value),
+    with child indices already offset to absolute positions and leaves
+    pointing at themselves. predict_proba walks every tree for every row at
+    once: one vectorized step per tree level, over only the (row, tree) pairs
+    that haven't reached a leaf yet, instead of sklearn's per-estimator
+    dispatch through joblib. That wins for small batches; for thousands of
+    rows sklearn's compiled traversal is faster (see HybridForest).
+
+    Exposes classes_, n_features_in_, feature_names_in_, predict_proba and
+    predict, so it drops in wherever the sklearn model was used.
+    """
+
+    def __init__(self, feature, threshold, left, right, value, roots, classes, feature_names=None, max_depth=None):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.value = value
+        self.roots = roots
+        self.classes_ = np.asarray(classes)
+        self.n_features_in_ = None
+        if feature_names is not None:
+            self.feature_names_in_ = np.asarray(feature_names, dtype=object)
+            self.n_features_in_ = len(feature_names)
+        self.max_depth = int(max_depth) if max_depth is not None else len(feature)
+        # Leaves point at themselves
+        self.is_leaf = left == np.arange(len(left), dtype=left.dtype)
+
+    @classmethod
+    def from_sklearn(cls, model):
+        if getattr(model, "n_outputs_", 1) != 1:
+            raise ValueError("Only single-output forests can be flattened")
+
+        features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+        offset = 0
+        max_depth = 0
+        for estimator in model.estimators_:
+            tree = estimator.tree_
+            n_nodes = tree.node_count
+            node_ids = np.arange(offset, offset + n_nodes, dtype=np.int32)
+            is_leaf = tree.children_left == -1
+
+            features.append(np.where(is_leaf, 0, tree.feature).astype(np.int32))
+            thresholds.append(tree.threshold.astype(np.float64))
+            lefts.append(np.where(is_leaf, node_ids, tree.children_left + offset).astype(np.int32))
+            rights.append(np.where(is_leaf, node_ids, tree.children_right + offset).astype(np.int32))
+
+            # Leaf class distribution, normalized the same way DecisionTreeClassifier.predict_proba does
+            value = tree.value[:, 0, :].astype(np.float64)
+            normalizer = value.sum(axis=1, keepdims=True)
+            normalizer[normalizer == 0.0] = 1.0
+            values.append(value / normalizer)
+
+            roots.append(offset)
+            offset += n_nodes
+            max_depth = max(max_depth, tree.max_depth)
+
+        return cls(
+            feature=np.concatenate(features),
+            threshold=np.concatenate(thresholds),
+            left=np.concatenate(lefts),
+            right=np.concatenate(rights),
+            value=np.ascontiguousarray(np.concatenate(values)),
+            roots=np.asarray(roots, dtype=np.int32),
+            classes=model.classes_,
+            feature_names=getattr(model, "feature_names_in_", None),
+            max_depth=max_depth,
+        )
+
+    def _as_matrix(self, X):
+        if hasattr(X, "columns") and hasattr(self, "feature_names_in_"):
+            X = X[list(self.feature_names_in_)]
+        # sklearn trees compare float32 inputs against float64 thresholds; do the same for parity
+        return np.asarray(X, dtype=np.float32).reshape(-1, self.feature_dim)
+
+    @property
+    def feature_dim(self):
+        if self.n_features_in_ is not None:
+            return self.n_features_in_
+        return int(self.feature.max()) + 1
+
+    def predict_proba(self, X):
+        X = self._as_matrix(X)
+        n_rows, n_trees = X.shape[0], len(self.roots)
+        values = np.ascontiguousarray(X).ravel()
+
+        # nodes[i * n_trees + t] = current node of row i in tree t. Only the
+        # pairs still on an inner node take the next step; a pair drops out
+        # of `active` as soon as it lands on a leaf.
+        nodes = np.tile(self.roots, n_rows)
+        active = np.flatnonzero(~self.is_leaf[nodes])
+        current = nodes[active]
+        offsets = (active // n_trees) * X.shape[1]  # start of each pair's row in `values`
+        while active.size:
+            go_left = values[offsets + self.feature[current]] <= self.threshold[current]
+            current = np.where(go_left, self.left[current], self.right[current])
+            nodes[active] = current
+            inner = ~self.is_leaf[current]
+            active, current, offsets = active[inner], current[inner], offsets[inner]
+
+        # Accumulate tree by tree, in estimator order, like sklearn does
+        nodes = nodes.reshape(n_rows, n_trees)
+        proba = np.zeros((n_rows, self.value.shape[1]))
+        for t in range(n_trees):
+            proba += self.value[nodes[:, t]]
+        proba /= n_trees
+        return proba
+
+    def predict(self, X):
+        return self.classes_[np.argmax(self.predict_proba(X), axis=1)]
+
+    def save(self, path):
+        os.makedirs(path, exist_ok=True)
+        for name in ARRAY_NAMES:
+            np.save(os.path.join(path, f"{name}.npy"), getattr(self, name))
+        meta = {
+            "classes": self.classes_.tolist(),
+            "feature_names": self.feature_names_in_.tolist() if hasattr(self, "feature_names_in_") else None,
+            "max_depth": self.max_depth,
+            "n_trees": len(self.roots),
+            "n_nodes": len(self.feature),
+        }
+        with open(os.path.join(path, META_FILE), "w") as f:
+            json.dump(meta, f)
+
+    @classmethod
+    def load(cls, path, mmap_mode=None):
+        """
+        mmap_mode="r" maps the arrays read-only instead of reading them into
+        private memory, so every worker on the host shares one copy of the
+        forest through the OS page cache.
+        """
+        with open(os.path.join(path, META_FILE)) as f:
+            meta = json.load(f)
+        arrays = {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode=mmap_mode) for name in ARRAY_NAMES}
+        return cls(
+            classes=meta["classes"],
+            feature_names=meta.get("feature_names"),
+            max_depth=meta.get("max_depth"),
+            **arrays,
+        )
+
+class HybridForest:
+    """
+    A FlatForest that hands batches of more than max_flat_rows rows to the
+    sklearn model, unpickled by load_sklearn() on the first such batch.
+    Processes that only ever see small batches never load the pickle and
+    keep sharing the memory-mapped arrays.
+    """
+
+    def __init__(self, flat, load_sklearn, max_flat_rows):
+        self.flat = flat
+        self.load_sklearn = load_sklearn
+        self.max_flat_rows = max_flat_rows
+        self.sklearn_model = None
+        self.lock = threading.Lock()
+
+    def __getattr__(self, name):
+        # classes_, feature_names_in_, n_features_in_, ... come from the flat export
+        return getattr(self.flat, name)
+
+    def backend_for(self, X):
+        if len(X) <= self.max_flat_rows:
+            return self.flat
+        with self.lock:
+            if self.sklearn_model is None:
+                self.sklearn_model = self.load_sklearn()
+        return self.sklearn_model
+
+    def predict_proba(self, X):
+        return self.backend_for(X).predict_proba(X)
+
+    def predict(self, X):
+        return self.backend_for(X).predict(X)
+
+def flat_path_for(pickle_path):
+    """trained_model/fertilizer_model.pkl -> trained_model/fertilizer_model.flat"""
+    return os.path.splitext(pickle_path)[0] + ".flat"
+
+def is_fresh(flat_path, pickle_path):
+    """True if a flattened export exists and is not older than its pickle."""
+    meta_path = os.path.join(flat_path, META_FILE)
+    if not os.path.exists(meta_path):
+        return False
+    if not os.path.exists(pickle_path):
+        return True
+    return os.path.getmtime(meta_path) >= os.path.getmtime(pickle_path)
+
+def export(pickle_path):
+    """Flattens one pickled forest next to it. Returns the export directory."""
+    import joblib
+
+    start = time.perf_counter()
+    model = joblib.load(pickle_path)
+    load_time = time.perf_counter() - start
+
+    flat = FlatForest.from_sklearn(model)
+    flat_path = flat_path_for(pickle_path)
+    flat.save(flat_path)
+
+    start = time.perf_counter()
+    FlatForest.load(flat_path)
+    flat_load_time = time.perf_counter() - start
+
+    print(f"✅ {os.path.basename(pickle_path)}: {len(flat.roots)} trees, {len(flat.feature)} nodes -> {flat_path}")
+    print(f"   load time: pickle {load_time:.2f}s, flat {flat_load_time:.3f}s")
+    return flat_path
+
+if __name__ == "__main__":
+    # Usage: python forest_compiler.py [model.pkl ...]
+    # Without arguments, exports the fertilizer and crop models used by model_loader.
+    base_dir = os.path.dirname(os.path.abspath(__file__))
+    paths = sys.argv[1:] or [
+        os.path.join(base_dir, "trained_model", "fertilizer_model.pkl"),
+        os.path.join(base_dir, "models", "crop_model.pkl"),
+    ]
+    for pickle_path in paths:
+        try:
+            export(pickle_path)
+        except Exception as e:
+            print(f"❌ Could not export {pickle_path}: {e}")
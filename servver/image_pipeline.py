@@ -0,0 +1,152 @@
+import os
+import io
+import re
+import time
+import base64
+import asyncio
+import hashlib
+import binascii
+import threading
+from collections import OrderedDict
+
+# Configuration
+CHAT_IMAGE_MAX_BYTES = int(float(os.getenv("CHAT_IMAGE_MAX_MB", "8")) * 1024 * 1024)  # decoded upload, before resizing
+CHAT_IMAGE_MAX_SIDE = int(os.getenv("CHAT_IMAGE_MAX_SIDE", "1024"))     # px; longer side after resizing
+CHAT_IMAGE_QUALITY = int(os.getenv("CHAT_IMAGE_QUALITY", "80"))         # JPEG quality of the re-encoded image
+CHAT_IMAGE_MAX_PIXELS = int(os.getenv("CHAT_IMAGE_MAX_PIXELS", "40000000"))  # refuse to decode larger (decompression bombs)
+CHAT_IMAGE_CACHE_SIZE = int(os.getenv("CHAT_IMAGE_CACHE_SIZE", "256"))  # processed images kept, by content hash
+CHAT_IMAGE_WORKERS = int(os.getenv("CHAT_IMAGE_WORKERS", "2"))          # images decoded at once (bounds memory)
+ALLOWED_FORMATS = {"JPEG", "PNG", "WEBP", "GIF", "BMP", "MPO"}
+
+_DATA_URL = re.compile(r"^data:(?P<mime>[\w/+.-]*)(?:;[\w=.-]+)*?;base64,", re.IGNORECASE)
+
+class ImageError(ValueError):
+    """The image can't be used: too large, not an image, or not decodable."""
+
+def decode_image_payload(image):
+    """Bytes of a data URL or bare base64 string (ChatRequest.image)."""
+    match = _DATA_URL.match(image)
+    payload = image[match.end():] if match else image
+    # Reject before decoding: base64 is 4 characters per 3 bytes
+    if len(payload) * 3 // 4 > CHAT_IMAGE_MAX_BYTES:
+        raise ImageError(f"Image is larger than {CHAT_IMAGE_MAX_BYTES // (1024 * 1024)} MB")
+    try:
+        return base64.b64decode(payload, validate=False)
+    except (binascii.Error, ValueError):
+        raise ImageError("Image is not valid base64")
+
+def process_image(data, max_side=CHAT_IMAGE_MAX_SIDE, quality=CHAT_IMAGE_QUALITY):
+    """
+    Decodes, applies the EXIF rotation, downsizes to max_side and re-encodes
+    as JPEG. Returns (jpeg bytes, (width, height)). A JPEG that is already
+    small enough is returned as is when re-encoding wouldn't make it smaller.
+    """
+    from PIL import Image, ImageOps, UnidentifiedImageError
+
+    try:
+        with Image.open(io.BytesIO(data)) as img:
+            if img.format not in ALLOWED_FORMATS:
+                raise ImageError(f"Unsupported image format: {img.format}")
+            if img.width * img.height > CHAT_IMAGE_MAX_PIXELS:
+                raise ImageError(f"Image is too large ({img.width}x{img.height})")
+            source_format, source_size = img.format, img.size
+
+            # JPEG: let the decoder downscale by 1/2, 1/4 or 1/8 while decoding (much less work and memory)
+            img.draft("RGB", (max_side, max_side))
+            img = ImageOps.exif_transpose(img)
+            if img.mode in ("RGBA", "LA", "P"):
+                # Transparent areas become white instead of black
+                rgba = img.convert("RGBA")
+                img = Image.new("RGB", rgba.size, (255, 255, 255))
+                img.paste(rgba, mask=rgba.getchannel("A"))
+            elif img.mode != "RGB":
+                img = img.convert("RGB")
+            img.thumbnail((max_side, max_side), Image.Resampling.LANCZOS)
+
+            out = io.BytesIO()
+            img.save(out, "JPEG", quality=quality, optimize=True)
+            size = img.size
+    except ImageError:
+        raise
+    except (UnidentifiedImageError, OSError, Image.DecompressionBombError) as e:
+        raise ImageError(f"Could not read image: {e}")
+
+    if source_format == "JPEG" and max(source_size) <= max_side and len(data) <= out.tell():
+        return data, source_size
+    return out.getvalue(), size
+
+class ImagePipeline:
+    """
+    Prepares ChatRequest.image for the vision model: data URLs and bare
+    base64 are decoded, bounded (size, pixels), downsized and re-encoded as
+    a JPEG data URL. Results are cached by sha256 of the decoded bytes, so a
+    photo that is asked about again isn't decoded again. http(s) URLs are
+    passed through unchanged: the LLM provider fetches those, and fetching
+    user-supplied URLs from here would reach into our own network.
+    """
+
+    def __init__(self, cache_size=CHAT_IMAGE_CACHE_SIZE, workers=CHAT_IMAGE_WORKERS):
+        self.cache_size = cache_size
+        self.cache = OrderedDict()  # sha256 -> data URL
+        self.lock = threading.Lock()
+        self.semaphore = asyncio.Semaphore(max(1, workers))
+
+        # Metrics
+        self.processed = 0
+        self.cache_hits = 0
+        self.rejected = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.process_seconds = 0.0
+
+    async def prepare(self, image):
+        """The image to send to the LLM. Raises ImageError for unusable images."""
+        if not image or image.startswith(("http://", "https://")):
+            return image
+        try:
+            data = decode_image_payload(image)
+        except ImageError:
+            self.rejected += 1
+            raise
+
+        key = hashlib.sha256(data).hexdigest()
+        with self.lock:
+            cached = self.cache.get(key)
+            if cached is not None:
+                self.cache.move_to_end(key)
+                self.cache_hits += 1
+                return cached
+
+        started = time.perf_counter()
+        async with self.semaphore:
+            try:
+                # Decoding/resizing is CPU work (Pillow releases the GIL for most of it)
+                jpeg, _ = await asyncio.to_thread(process_image, data)
+            except ImageError:
+                self.rejected += 1
+                raise
+        prepared = "data:image/jpeg;base64," + base64.b64encode(jpeg).decode("ascii")
+
+        with self.lock:
+            self.processed += 1
+            self.bytes_in += len(data)
+            self.bytes_out += len(jpeg)
+            self.process_seconds += time.perf_counter() - started
+            self.cache[key] = prepared
+            while len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+        return prepared
+
+    def stats(self):
+        return {
+            "processed": self.processed,
+            "cache_hits": self.cache_hits,
+            "cache_entries": len(self.cache),
+            "rejected": self.rejected,
+            "mb_in": round(self.bytes_in / 1024 / 1024, 2),
+            "mb_out": round(self.bytes_out / 1024 / 1024, 2),
+            "mean_process_ms": round(self.process_seconds / self.processed * 1000, 1) if self.processed else None,
+        }
+
+# Global instance
+image_pipeline = ImagePipeline()
@@ -0,0 +1,48 @@
+import os
+import sys
+import subprocess
+
+# Wraps `python -X importtime` and ranks the imports of a module by cost,
+# so it's easy to see what a cold start actually pays for.
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+def parse_importtime(stderr):
+    """Parses -X importtime output into (module, self_us, cumulative_us) tuples."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        try:
+            self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+            rows.append((name.strip(), int(self_us), int(cumulative_us)))
+        except ValueError:
+            continue
+    return rows
+
+def profile_imports(module="main", top=25, out=sys.stdout):
+    """Imports `module` in a fresh interpreter and prints the slowest imports."""
+    env = dict(os.environ, PYTHONWARNINGS="ignore")
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=BASE_DIR, env=env, capture_output=True, text=True,
+    )
+    rows = parse_importtime(result.stderr)
+    if result.returncode != 0:
+        print(f"❌ import {module} failed:\n{result.stderr.splitlines()[-1] if result.stderr else ''}", file=out)
+    if not rows:
+        return rows
+
+    total_us = max(cumulative for _, _, cumulative in rows)
+    print(f"🔍 import {module}: {total_us / 1000:.1f} ms total, {len(rows)} modules\n", file=out)
+
+    for title, index in (("by cumulative time", 2), ("by self time", 1)):
+        print(f"Top {top} {title}:", file=out)
+        print(f"{'cumulative ms':>14}{'self ms':>10}  module", file=out)
+        for name, self_us, cumulative_us in sorted(rows, key=lambda r: r[index], reverse=True)[:top]:
+            print(f"{cumulative_us / 1000:>14.1f}{self_us / 1000:>10.1f}  {name}", file=out)
+        print(file=out)
+    return rows
+
+if __name__ == "__main__":
+    profile_imports(sys.argv[1] if len(sys.argv) > 1 else "main")
@@ -0,0 +1,136 @@
+import os
+import time
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+# Configuration
+# Number of worker processes for model inference.
+# 0 disables the pool and runs predictions on the default threadpool instead.
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+def _init_worker(versions=None):
+    """Runs once in each worker: load the models before the first task arrives."""
+    import model_loader
+    import recommender  # noqa: F401
+    import crop_recommender  # noqa: F401
+    from model_registry import registry
+
+    if versions:
+        registry.pin(versions)
+    model_loader.warm_up()
+
+def _ping():
+    return os.getpid()
+
+def _worker_status():
+    from model_registry import registry
+    return {"pid": os.getpid(), "versions": registry.loaded_versions(), "ready": registry.is_ready()}
+
+def _worker_report(hold_seconds=0.0):
+    """This worker's model load report (cold-start seconds, backends) with its current RSS."""
+    import model_loader
+
+    # Holding the worker briefly makes the other report tasks go to the other workers
+    time.sleep(hold_seconds)
+    return model_loader.current_report()
+
+class InferencePool:
+    """
+    Dedicated process pool for the sklearn forests.
+
+    The forests hold the GIL while predicting, so running them on FastAPI's
+    threadpool stalls the event loop (Motor, sensors, chat). Each worker has
+    its own interpreter with the models preloaded by _init_worker.
+    """
+
+    def __init__(self, workers=INFERENCE_WORKERS):
+        self.workers = workers
+        self.executor = None
+
+    def _create_executor(self, versions):
+        # spawn (not fork): the parent holds Motor/serial threads that must not be copied
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(versions,),
+        )
+
+    def start(self):
+        if self.executor is not None or self.workers <= 0:
+            return
+        from model_registry import registry
+        self.executor = self._create_executor(registry.active_versions())
+        # Workers are launched on demand: one task each makes them all start (and preload) now
+        for _ in range(self.workers):
+            self.executor.submit(_ping)
+        print(f"[InferencePool] Started {self.workers} inference workers")
+
+    async def reload(self, versions):
+        """
+        Starts a new set of workers on the given model versions and swaps them
+        in once they have loaded. Tasks already queued on the old workers
+        still finish there. Raises RuntimeError (keeping the old workers) if
+        the new ones can't load the models.
+        """
+        new_executor = self._create_executor(versions)
+        try:
+            statuses = await asyncio.gather(*(
+                asyncio.wrap_future(new_executor.submit(_worker_status)) for _ in range(self.workers)
+            ))
+        except BrokenProcessPool as e:
+            new_executor.shutdown(wait=False, cancel_futures=True)
+            raise RuntimeError(f"Inference workers failed to start: {e}")
+
+        if not all(status["ready"] for status in statuses):
+            new_executor.shutdown(wait=False, cancel_futures=True)
+            raise RuntimeError(f"Inference workers could not load models {versions}")
+
+        old_executor, self.executor = self.executor, new_executor
+        if old_executor is not None:
+            old_executor.shutdown(wait=False)
+        print(f"[InferencePool] Reloaded {self.workers} inference workers on {versions}")
+
+    async def reports(self, timeout=5.0):
+        """load_report of each worker (by pid), for /api/ml/stats. [] without a pool."""
+        executor = self.executor
+        if executor is None:
+            return []
+        futures = [asyncio.wrap_future(executor.submit(_worker_report, 0.05)) for _ in range(self.workers)]
+        try:
+            reports = await asyncio.wait_for(asyncio.gather(*futures), timeout)
+        except (asyncio.TimeoutError, BrokenProcessPool) as e:
+            print(f"[InferencePool] Worker reports unavailable: {e!r}")
+            return []
+        return sorted({report["pid"]: report for report in reports}.values(), key=lambda r: r["pid"])
+
+    def stop(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+            print("[InferencePool] Stopped inference workers")
+
+    async def run(self, fn, *args):
+        """
+        Runs fn(*args) in the pool and awaits the result without blocking the
+        event loop. fn must be a module-level (picklable) function.
+        """
+        loop = asyncio.get_running_loop()
+        if self.executor is None:
+            return await loop.run_in_executor(None, fn, *args)
+
+        executor = self.executor
+        try:
+            return await loop.run_in_executor(executor, fn, *args)
+        except BrokenProcessPool:
+            # A worker died (e.g. OOM). Replace the pool (unless a reload already did) and retry once.
+            if self.executor is executor:
+                print("[InferencePool] Worker crashed, restarting pool")
+                self.executor = None
+                self.start()
+            return await loop.run_in_executor(self.executor, fn, *args)
+
+# Global instance
+inference_pool = InferencePool()
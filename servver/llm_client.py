@@ -0,0 +1,296 @@
+import os
+import time
+import asyncio
+from collections import deque
+
+import httpx
+import numpy as np
+
+# Configuration
+GROQ_BASE_URL = os.getenv("GROQ_BASE_URL") or None            # None = api.groq.com; point at a stub for load tests
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "100"))
+LLM_MAX_KEEPALIVE = int(os.getenv("LLM_MAX_KEEPALIVE", "20"))  # idle connections kept open for reuse
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "60"))            # seconds per completion
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "0"))       # per model; failures go to the next model instead
+# Hedging: if a model hasn't answered within the deadline, the next one is started
+# concurrently and the first good answer wins (0 = start every model at once)
+LLM_HEDGE_DEADLINE_MS = float(os.getenv("LLM_HEDGE_DEADLINE_MS", "2500"))        # whole reply (/chat)
+LLM_HEDGE_STREAM_DEADLINE_MS = float(os.getenv("LLM_HEDGE_STREAM_DEADLINE_MS", "1000"))  # first token (/chat/stream)
+HEALTH_EWMA_ALPHA = 0.2                                        # weight of the newest sample in model latency/error rate
+METRICS_WINDOW = 1000                                          # recent replies kept for percentiles
+
+class ModelHealth:
+    """
+    Per-model latency and error counters that decide which model is tried first.
+
+    Models are ordered by smoothed latency divided by their recent success
+    rate. A model with no successful reply yet keeps its configured position
+    after the measured ones.
+    """
+
+    def __init__(self):
+        self.models = {}
+        self.hedges = 0
+
+    def _entry(self, model):
+        return self.models.setdefault(model, {
+            "requests": 0, "successes": 0, "errors": 0, "cancelled": 0,
+            "latency_ms": None, "error_rate": 0.0,
+        })
+
+    def _observe_latency(self, entry, seconds):
+        ms = seconds * 1000
+        if entry["latency_ms"] is None:
+            entry["latency_ms"] = ms
+        else:
+            entry["latency_ms"] += HEALTH_EWMA_ALPHA * (ms - entry["latency_ms"])
+
+    def record_success(self, model, seconds):
+        entry = self._entry(model)
+        entry["requests"] += 1
+        entry["successes"] += 1
+        entry["error_rate"] *= 1 - HEALTH_EWMA_ALPHA
+        self._observe_latency(entry, seconds)
+
+    def record_error(self, model, seconds):
+        entry = self._entry(model)
+        entry["requests"] += 1
+        entry["errors"] += 1
+        entry["error_rate"] += HEALTH_EWMA_ALPHA * (1 - entry["error_rate"])
+
+    def record_cancelled(self, model, seconds):
+        """A losing hedge: it took at least `seconds`, which only tells us something if that's slow."""
+        entry = self._entry(model)
+        entry["requests"] += 1
+        entry["cancelled"] += 1
+        if entry["latency_ms"] is not None and seconds * 1000 > entry["latency_ms"]:
+            self._observe_latency(entry, seconds)
+
+    def score(self, model):
+        entry = self.models.get(model)
+        if entry is None or entry["latency_ms"] is None:
+            return None
+        return entry["latency_ms"] / max(0.05, 1 - entry["error_rate"])
+
+    def order(self, model_names, keep_first=False):
+        """model_names, fastest first. keep_first pins the first one (e.g. the only vision model)."""
+        head = list(model_names[:1]) if keep_first else []
+        rest = list(model_names[len(head):])
+        measured = sorted((m for m in rest if self.score(m) is not None), key=self.score)
+        return head + measured + [m for m in rest if self.score(m) is None]
+
+    def stats(self):
+        return {
+            "hedges": self.hedges,
+            "models": {
+                model: dict(entry,
+                            latency_ms=round(entry["latency_ms"], 1) if entry["latency_ms"] is not None else None,
+                            error_rate=round(entry["error_rate"], 3))
+                for model, entry in self.models.items()
+            },
+        }
+
+class LLMClient:
+    """
+    One AsyncGroq client for the whole worker, on a pooled keep-alive httpx
+    connection. Completions are awaited, so a slow LLM reply no longer holds
+    up the event loop (sensors, auth, every other route) the way the
+    per-request synchronous Groq client did.
+    """
+
+    def __init__(self):
+        self.client = None
+        self.http_client = None
+        self.health = ModelHealth()
+
+    def start(self):
+        if self.client is not None:
+            return self.client
+        api_key = os.getenv("GROQ_API_KEY")
+        if not api_key or "YOUR_GROQ_API_KEY" in api_key:
+            print("[LLMClient] GROQ_API_KEY not set, chat is disabled")
+            return None
+
+        from groq import AsyncGroq
+
+        self.http_client = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=LLM_MAX_CONNECTIONS, max_keepalive_connections=LLM_MAX_KEEPALIVE),
+            timeout=httpx.Timeout(LLM_TIMEOUT, connect=10.0),
+        )
+        self.client = AsyncGroq(
+            api_key=api_key,
+            base_url=GROQ_BASE_URL,
+            http_client=self.http_client,
+            max_retries=LLM_MAX_RETRIES,
+        )
+        print(f"[LLMClient] Ready ({GROQ_BASE_URL or 'api.groq.com'}, up to {LLM_MAX_CONNECTIONS} connections)")
+        return self.client
+
+    async def stop(self):
+        if self.http_client is not None:
+            await self.http_client.aclose()
+        self.client = None
+        self.http_client = None
+
+    def get(self):
+        """The shared client (started on first use if startup didn't), or None without an API key."""
+        return self.client or self.start()
+
+    async def complete(self, messages, model, **kwargs):
+        """Returns the reply text of one chat completion."""
+        completion = await self.get().chat.completions.create(messages=messages, model=model, **kwargs)
+        return completion.choices[0].message.content
+
+    async def stream(self, messages, model, **kwargs):
+        """Yields the reply text piece by piece as the LLM generates it."""
+        stream = await self.get().chat.completions.create(messages=messages, model=model, stream=True, **kwargs)
+        try:
+            async for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        finally:
+            # Release the connection promptly if the reader stops early (lost hedge, client gone)
+            await stream.close()
+
+    async def _race(self, attempt, model_names, deadline_ms, keep_first=False, discard=None):
+        """
+        Runs attempt(model) for the models in health order, starting the next
+        one whenever the running ones pass deadline_ms or one fails (with
+        deadline_ms=None, only when one fails: no hedging). Returns
+        (model, result) of the first good result and cancels the rest.
+        discard(result) releases results that arrive but lose the race.
+        """
+        remaining = self.health.order(model_names, keep_first)
+        pending = {}  # task -> (model, started)
+        errors = []
+
+        def launch():
+            model = remaining.pop(0)
+            pending[asyncio.ensure_future(attempt(model))] = (model, time.perf_counter())
+
+        launch()
+        try:
+            while pending:
+                done, _ = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED,
+                    timeout=deadline_ms / 1000 if remaining and deadline_ms is not None else None,
+                )
+                if not done:
+                    # Nothing back in time: hedge with the next model
+                    self.health.hedges += 1
+                    launch()
+                    continue
+
+                winner = None
+                for task in done:
+                    model, started = pending.pop(task)
+                    elapsed = time.perf_counter() - started
+                    try:
+                        result = task.result()
+                        if result is None:
+                            raise ValueError("empty reply")
+                    except Exception as e:
+                        self.health.record_error(model, elapsed)
+                        errors.append(f"{model}: {e}")
+                        continue
+                    if winner is None:
+                        self.health.record_success(model, elapsed)
+                        winner = (model, result)
+                    elif discard is not None:
+                        await discard(result)
+                if winner is not None:
+                    return winner
+                if remaining:
+                    launch()  # a failure: don't wait for the deadline
+            raise RuntimeError("All models failed: " + "; ".join(errors))
+        finally:
+            for task, (model, started) in pending.items():
+                task.cancel()
+                self.health.record_cancelled(model, time.perf_counter() - started)
+            # Let the losers unwind (close their connections) before returning
+            for result in await asyncio.gather(*pending, return_exceptions=True):
+                if discard is not None and result is not None and not isinstance(result, BaseException):
+                    await discard(result)
+
+    async def complete_hedged(self, messages_for_model, model_names, keep_first=False, deadline_ms=LLM_HEDGE_DEADLINE_MS):
+        """
+        Hedged completion across model_names. messages_for_model(model) builds
+        the messages for that model. Returns (model, reply text); raises
+        RuntimeError if every model fails.
+        """
+        async def attempt(model):
+            return await self.complete(messages_for_model(model), model) or None
+
+        return await self._race(attempt, model_names, deadline_ms, keep_first)
+
+    async def stream_hedged(self, messages_for_model, model_names, keep_first=False, deadline_ms=LLM_HEDGE_STREAM_DEADLINE_MS):
+        """
+        Hedged streaming: models race to their first token, then the winner's
+        stream is yielded as (model, text) pieces. Raises RuntimeError if no
+        model produces a token.
+        """
+        async def first_token(model):
+            pieces = self.stream(messages_for_model(model), model)
+            try:
+                return pieces, await pieces.__anext__()
+            except StopAsyncIteration:
+                await pieces.aclose()
+                return None
+            except BaseException:
+                await pieces.aclose()
+                raise
+
+        async def discard(result):
+            await result[0].aclose()
+
+        model, (pieces, text) = await self._race(first_token, model_names, deadline_ms, keep_first, discard)
+        try:
+            yield model, text
+            async for text in pieces:
+                yield model, text
+        except Exception:
+            self.health.record_error(model, 0)
+            raise
+        finally:
+            await pieces.aclose()
+
+class ChatMetrics:
+    """
+    Time to first byte of chat replies: when the first token was sent for
+    streamed replies, when the whole reply was ready otherwise. This is what
+    a farmer on a slow connection waits for, so it's the number we track.
+    """
+
+    def __init__(self):
+        self.first_byte_ms = {"stream": deque(maxlen=METRICS_WINDOW), "full": deque(maxlen=METRICS_WINDOW)}
+        self.replies = {"stream": 0, "full": 0}
+        self.failures = {"stream": 0, "full": 0}
+        self.models = {}
+
+    def record(self, model, streamed, first_byte_seconds):
+        kind = "stream" if streamed else "full"
+        self.first_byte_ms[kind].append(first_byte_seconds * 1000)
+        self.replies[kind] += 1
+        self.models[model] = self.models.get(model, 0) + 1
+
+    def record_failure(self, streamed):
+        self.failures["stream" if streamed else "full"] += 1
+
+    def stats(self):
+        stats = {"models": dict(self.models)}
+        for kind, values in self.first_byte_ms.items():
+            values = np.asarray(values) if values else np.zeros(1)
+            stats[kind] = {
+                "replies": self.replies[kind],
+                "failures": self.failures[kind],
+                "ttfb_ms": {
+                    "p50": round(float(np.percentile(values, 50)), 1),
+                    "p95": round(float(np.percentile(values, 95)), 1),
+                    "max": round(float(values.max()), 1),
+                },
+            }
+        return stats
+
+# Global instances
+llm_client = LLMClient()
+chat_metrics = ChatMetrics()
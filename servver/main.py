@@ -1,4 +1,13 @@
 import os
+import sys
+import asyncio
+
+if __name__ == "__main__":
+    # python main.py is python run.py: spawned inference workers re-run the
+    # __main__ module, so it must not be this one (it builds the whole app)
+    launcher = os.path.join(os.path.dirname(os.path.abspath(__file__)), "run.py")
+    os.execv(sys.executable, [sys.executable, launcher] + sys.argv[1:])
+
 import certifi
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
@@ -7,15 +16,21 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
+from body_limit import BodySizeLimitMiddleware, CHAT_MAX_BODY_BYTES
+
 app = FastAPI()
 
 # Middleware
+# Refuse oversize chat bodies (base64 photos) while they stream in, not after parsing
+# (added first so it runs inside CORS, and the 413 still carries CORS headers)
+app.add_middleware(BodySizeLimitMiddleware, limits={"/api/chat": CHAT_MAX_BODY_BYTES})
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],  # In production, specify the frontend URL
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],  # chat history pagination
 )
 
 # MongoDB Connection
@@ -24,23 +39,73 @@ client = AsyncIOMotorClient(MONGO_URI, tlsCAFile=certifi.where())
 db = client.mitron_db
 
 from sensor_manager import sensor_manager
+from inference_pool import inference_pool
+from model_loader import warm_up
+from llm_client import llm_client
+from scheme_audio import scheme_audio
+from market_client import market_client
+from price_history import price_history
+
+# Models load lazily on first request; MODEL_WARMUP=1 loads them at startup instead
+MODEL_WARMUP = os.getenv("MODEL_WARMUP", "0") == "1"
+
+async def ensure_indexes():
+    """Indexes behind hot queries; creating an existing index is a no-op."""
+    try:
+        # Chat history list: userId filter, newest first (_id breaks ties for cursor pagination)
+        await db.chat_sessions.create_index(
+            [("userId", 1), ("updatedAt", -1), ("_id", -1)], name="userId_updatedAt"
+        )
+    except Exception as e:
+        print(f"Index creation failed: {e}")
+
+# Background tasks started at startup (a reference keeps them from being collected)
+background_tasks = set()
 
 @app.on_event("startup")
 async def startup_db_client():
     try:
         await client.admin.command('ping')
         print("Combined to MongoDB Atlas - Connection Verified")
+        await ensure_indexes()
+        await price_history.start(db)
     except Exception as e:
         print(f"MongoDB Connection Failed: {e}")
     
     # Start Sensor Manager
     sensor_manager.start()
 
+    # Start model inference workers (models are preloaded in each worker)
+    inference_pool.start()
+
+    # Shared LLM client (pooled keep-alive connections to Groq)
+    llm_client.start()
+
+    # Shared connection pool for mandi price pages
+    market_client.start()
+
+    # Pre-synthesize scheme voice playback in the background (TTS cache)
+    scheme_audio.start(db)
+
+    # Switch models when another uvicorn worker activates a version
+    from routes.admin import follow_model_registry
+    background_tasks.add(asyncio.create_task(follow_model_registry()))
+
+    if MODEL_WARMUP:
+        report = await asyncio.get_running_loop().run_in_executor(None, warm_up)
+        print(f"Models warmed up: {report['load_seconds']} (RSS {report['rss_mb']} MB)")
+
 
 @app.on_event("shutdown")
 async def shutdown_db_client():
     client.close()
+    for task in background_tasks:
+        task.cancel()
     sensor_manager.stop()
+    inference_pool.stop()
+    await llm_client.stop()
+    await scheme_audio.stop()
+    await market_client.stop()
 
 @app.get("/")
 async def root():
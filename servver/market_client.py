@@ -0,0 +1,86 @@
+import os
+import asyncio
+
+# Configuration
+MARKET_BASE_URL = os.getenv("MARKET_BASE_URL", "https://www.commodityonline.com")  # point at a fixture server for benchmarks
+MARKET_MAX_CONNECTIONS = int(os.getenv("MARKET_MAX_CONNECTIONS", "20"))  # pooled keep-alive connections
+MARKET_MAX_CONCURRENCY = int(os.getenv("MARKET_MAX_CONCURRENCY", "10"))  # page requests in flight across all users
+MARKET_TIMEOUT = float(os.getenv("MARKET_TIMEOUT", "3"))                # seconds per page
+MARKET_USER_AGENT = "Mozilla/5.0"
+
+class MarketClient:
+    """
+    One aiohttp session for mandi price pages, with a keep-alive connection
+    pool and a cap on requests in flight (shared by every dashboard load, so
+    a burst of users can't open hundreds of connections to the site).
+    """
+
+    def __init__(self):
+        self.session = None
+        self.semaphore = None
+
+    def start(self):
+        if self.session is None or self.session.closed:
+            import aiohttp  # ~170 ms; only paid by the first price request, not at startup
+
+            self.session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=MARKET_MAX_CONNECTIONS, ttl_dns_cache=300),
+                timeout=aiohttp.ClientTimeout(total=MARKET_TIMEOUT),
+                headers={"User-Agent": MARKET_USER_AGENT},
+            )
+            self.semaphore = asyncio.Semaphore(MARKET_MAX_CONCURRENCY)
+        return self.session
+
+    def saturated(self):
+        """True while every request slot is taken (another request would only queue)."""
+        return self.semaphore is not None and self.semaphore.locked()
+
+    async def stop(self):
+        if self.session is not None:
+            await self.session.close()
+        self.session = None
+
+    async def get_page(self, path):
+        """(status, html) of MARKET_BASE_URL + path; (None, None) on timeout or connection error."""
+        import aiohttp
+
+        session = self.start()
+        try:
+            async with self.semaphore:
+                async with session.get(MARKET_BASE_URL + path) as response:
+                    if response.status != 200:
+                        return response.status, None
+                    return response.status, await response.text()
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            print(f"[MarketClient] {path}: {e!r}")
+            return None, None
+
+class PageBatch:
+    """
+    The pages of one bulk request: each path is requested at most once and
+    the response is shared by every commodity/district that needs it (e.g.
+    the state page all districts of a state fall back to). Requests still
+    go through the client's concurrency cap.
+    """
+
+    def __init__(self, client):
+        self.client = client
+        self.tasks = {}    # path -> asyncio.Task of client.get_page(path)
+        self.lookups = 0
+
+    def get_page(self, path):
+        """
+        Awaitable (status, html) of path. Cancelling it doesn't cancel the
+        request, which other lookups may be waiting on.
+        """
+        self.lookups += 1
+        task = self.tasks.get(path)
+        if task is None:
+            task = self.tasks[path] = asyncio.ensure_future(self.client.get_page(path))
+        return asyncio.shield(task)
+
+    def stats(self):
+        return {"page_lookups": self.lookups, "pages_fetched": len(self.tasks)}
+
+# Global instance
+market_client = MarketClient()
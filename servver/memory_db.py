@@ -0,0 +1,96 @@
+from bson import ObjectId
+
+# In-memory stand-in for the Motor database, for benchmarks and route tests
+# that shouldn't need MongoDB. Covers the queries the chat routes make:
+# equality, $lt, $in and $or filters; field and $slice projections;
+# sort/limit/to_list cursors; $set and $push ($each, $slice) updates.
+
+def _matches(doc, query):
+    for field, condition in query.items():
+        if field == "$or":
+            if not any(_matches(doc, q) for q in condition):
+                return False
+        elif isinstance(condition, dict):
+            value = doc.get(field)
+            for op, arg in condition.items():
+                if op == "$lt" and not (value is not None and value < arg):
+                    return False
+                if op == "$in" and value not in arg:
+                    return False
+        elif doc.get(field) != condition:
+            return False
+    return True
+
+def _project(doc, projection):
+    # A copy: callers may mutate what they get back, like with a real driver
+    doc = dict(doc)
+    if not projection:
+        return doc
+    included = [field for field, spec in projection.items() if spec == 1]
+    if included:
+        doc = {field: doc[field] for field in ["_id"] + included if field in doc}
+    for field, spec in projection.items():
+        if isinstance(spec, dict) and "$slice" in spec and field in doc:
+            doc[field] = doc[field][spec["$slice"]:]
+    return doc
+
+class MemoryCursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def sort(self, keys):
+        for field, direction in reversed(keys):
+            self.docs.sort(key=lambda d: d[field], reverse=direction < 0)
+        return self
+
+    def limit(self, n):
+        self.docs = self.docs[:n]
+        return self
+
+    async def to_list(self, length=None):
+        return self.docs[:length] if length else list(self.docs)
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for doc in self.docs:
+            yield doc
+
+class MemoryCollection:
+    def __init__(self):
+        self.docs = {}  # _id -> document
+
+    def find(self, query=None, projection=None):
+        return MemoryCursor([_project(d, projection) for d in self.docs.values() if _matches(d, query or {})])
+
+    async def find_one(self, query, projection=None):
+        for doc in self.docs.values():
+            if _matches(doc, query):
+                return _project(doc, projection)
+        return None
+
+    async def insert_one(self, doc):
+        doc = dict(doc, _id=doc.get("_id") or ObjectId())
+        self.docs[doc["_id"]] = doc
+
+        class Result:
+            inserted_id = doc["_id"]
+        return Result()
+
+    async def update_one(self, query, update):
+        doc = next((d for d in self.docs.values() if _matches(d, query)), None)
+        if doc is None:
+            return
+        doc.update(update.get("$set", {}))
+        for field, push in update.get("$push", {}).items():
+            doc[field] = doc.get(field, []) + push["$each"]
+            if "$slice" in push:
+                doc[field] = doc[field][push["$slice"]:]
+
+class MemoryDB:
+    def __init__(self):
+        self.collections = {}
+
+    def __getattr__(self, name):
+        return self.collections.setdefault(name, MemoryCollection())
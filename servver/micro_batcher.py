@@ -0,0 +1,122 @@
+import os
+import time
+import asyncio
+from collections import deque
+
+import numpy as np
+
+from inference_pool import inference_pool
+from model_registry import registry
+from recommender import recommend_batch
+from crop_recommender import predict_top_crops_batch
+
+# Configuration
+BATCH_MAX_SIZE = int(os.getenv("BATCH_MAX_SIZE", "64"))         # rows per predict_proba call
+BATCH_MAX_WAIT_MS = float(os.getenv("BATCH_MAX_WAIT_MS", "5"))  # how long the first row may wait for company
+METRICS_WINDOW = 1000                                           # recent batches/rows kept for percentiles
+
+class MicroBatcher:
+    """
+    Collects concurrent single-row prediction requests for a few milliseconds
+    (or until max_batch rows are queued), runs one vectorized batch_fn over
+    all of them in the inference pool, and hands each caller its own row.
+    The name is the model family, used to attribute batch latency to the
+    active model version.
+
+    batch_fn must be a module-level function taking a list of rows and
+    returning a list of results in the same order (or an {"error": ...} dict,
+    which is then returned to every caller in the batch).
+    """
+
+    def __init__(self, name, batch_fn, max_batch=BATCH_MAX_SIZE, max_wait_ms=BATCH_MAX_WAIT_MS):
+        self.name = name
+        self.batch_fn = batch_fn
+        self.max_batch = max(1, max_batch)
+        self.max_wait = max(0.0, max_wait_ms) / 1000
+        self.pending = []
+        self._timer = None
+        self._tasks = set()
+
+        # Metrics
+        self.total_batches = 0
+        self.total_rows = 0
+        self.batch_sizes = deque(maxlen=METRICS_WINDOW)
+        self.queue_delays_ms = deque(maxlen=METRICS_WINDOW)
+
+    async def submit(self, row):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self.pending.append((row, future, time.perf_counter()))
+
+        if len(self.pending) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        while self.pending:
+            batch, self.pending = self.pending[:self.max_batch], self.pending[self.max_batch:]
+            task = asyncio.create_task(self._run(batch))
+            # Keep a reference so the task isn't garbage collected mid-flight
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch):
+        started = time.perf_counter()
+        rows = [row for row, _, _ in batch]
+
+        self.total_batches += 1
+        self.total_rows += len(rows)
+        self.batch_sizes.append(len(rows))
+        self.queue_delays_ms.extend((started - queued_at) * 1000 for _, _, queued_at in batch)
+
+        version = registry.active[self.name]
+        try:
+            results = await inference_pool.run(self.batch_fn, rows)
+        except Exception as e:
+            registry.record(self.name, version, time.perf_counter() - started, len(rows), error=True)
+            print(f"[MicroBatcher:{self.name}] Batch of {len(rows)} failed: {e}")
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        registry.record(self.name, version, time.perf_counter() - started, len(rows), error=isinstance(results, dict))
+        if isinstance(results, dict):
+            results = [results] * len(rows)
+
+        for (_, future, _), result in zip(batch, results):
+            # The caller may have gone away (client disconnect cancels the await)
+            if not future.done():
+                future.set_result(result)
+
+    def stats(self):
+        sizes = np.asarray(self.batch_sizes) if self.batch_sizes else np.zeros(1)
+        delays = np.asarray(self.queue_delays_ms) if self.queue_delays_ms else np.zeros(1)
+        return {
+            "max_batch": self.max_batch,
+            "max_wait_ms": self.max_wait * 1000,
+            "total_batches": self.total_batches,
+            "total_rows": self.total_rows,
+            "queued_rows": len(self.pending),
+            "batch_size": {
+                "mean": round(float(sizes.mean()), 2),
+                "p50": float(np.percentile(sizes, 50)),
+                "max": int(sizes.max()),
+            },
+            "queue_delay_ms": {
+                "mean": round(float(delays.mean()), 3),
+                "p50": round(float(np.percentile(delays, 50)), 3),
+                "p99": round(float(np.percentile(delays, 99)), 3),
+            },
+        }
+
+# Global instances
+crop_batcher = MicroBatcher("crop", predict_top_crops_batch)
+fertilizer_batcher = MicroBatcher("fertilizer", recommend_batch)
@@ -1,6 +1,11 @@
 import joblib
+import numpy as np
 import os
 import sys
+import time
+import warnings
+
+from forest_compiler import FlatForest, HybridForest, flat_path_for, is_fresh
 
 # Define base directory
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -9,25 +14,229 @@ MODEL_DIR = os.path.join(BASE_DIR, "trained_model")
 MODEL_PATH = os.path.join(MODEL_DIR, "fertilizer_model.pkl")
 ENCODER_PATH = os.path.join(MODEL_DIR, "encoders.pkl")
 
-# Load model and encoders
-try:
-    print(f"Loading model from {MODEL_PATH}...")
-    model = joblib.load(MODEL_PATH)
-    print("Model loaded successfully.")
-except Exception as e:
-    print(f"Error loading model: {e}")
-    model = None
-
-try:
-    print(f"Loading encoders from {ENCODER_PATH}...")
-    encoders = joblib.load(ENCODER_PATH)
-    print("Encoders loaded successfully.")
-    # Print classes for debugging
-    # for key, enc in encoders.items():
-    #     print(f"{key}: {enc.classes_}")
-except Exception as e:
-    print(f"Error loading encoders: {e}")
-    encoders = None
-
-# No scaler in the trained model based on analysis of train_model.py
-scaler = None 
+# Crop recommendation model (trained by models/croprecommodel.py)
+CROP_MODEL_DIR = os.path.join(BASE_DIR, "models")
+CROP_MODEL_PATH = os.path.join(CROP_MODEL_DIR, "crop_model.pkl")
+LABEL_ENCODER_PATH = os.path.join(CROP_MODEL_DIR, "label_encoder.pkl")
+
+# "auto": use the flattened export (python forest_compiler.py) when it is at least as new as the pickle
+# "flat": always use the flattened export; "sklearn": always unpickle the sklearn model
+MODEL_BACKEND = os.getenv("MODEL_BACKEND", "auto").lower()
+# Flattened forests are memory-mapped read-only by default so all workers share
+# one copy through the page cache. Set MODEL_MMAP=none to read them into RAM.
+# (Pickled sklearn forests cannot be shared: Tree.__setstate__ copies its arrays.)
+MODEL_MMAP = os.getenv("MODEL_MMAP", "r").lower()
+MODEL_MMAP = None if MODEL_MMAP in ("", "none", "off") else MODEL_MMAP
+# In "auto" mode, batches above this many rows go to the sklearn model (unpickled
+# on the first such batch): the flattened forest is ~10x faster for single rows
+# but slower than sklearn's compiled traversal past a couple hundred rows.
+FLAT_MAX_BATCH_ROWS = int(os.getenv("FLAT_MAX_BATCH_ROWS", "128"))
+
+# Models are loaded on first use (or by warm_up()), not at import, so that
+# importing the app stays cheap. Unpickling the encoders alone imports sklearn.
+
+def _rss_mb():
+    """Resident set size of this process in MB (Linux only, None elsewhere)."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    return None
+
+# Cold-start cost of this worker, reported in the logs and on /api/ml/stats
+load_report = {
+    "pid": os.getpid(),
+    "backends": {},
+    "versions": {},
+    "load_seconds": {},
+    "rss_mb": _rss_mb(),
+}
+
+def current_report():
+    """load_report with this process's current RSS."""
+    return dict(load_report, pid=os.getpid(), rss_mb=_rss_mb())
+
+def load_forest(pickle_path):
+    """Loads a random forest, preferring its flattened array export per MODEL_BACKEND."""
+    flat_path = flat_path_for(pickle_path)
+    if MODEL_BACKEND == "flat" or (MODEL_BACKEND == "auto" and is_fresh(flat_path, pickle_path)):
+        print(f"Loading flattened forest from {flat_path} (mmap_mode={MODEL_MMAP})...")
+        load_report["backends"][os.path.basename(pickle_path)] = "flat+mmap" if MODEL_MMAP else "flat"
+        flat = FlatForest.load(flat_path, mmap_mode=MODEL_MMAP)
+        if MODEL_BACKEND == "flat" or not os.path.exists(pickle_path):
+            return flat
+
+        def load_sklearn():
+            print(f"Loading model from {pickle_path} for batches over {FLAT_MAX_BATCH_ROWS} rows...")
+            load_report["backends"][os.path.basename(pickle_path)] += f", sklearn over {FLAT_MAX_BATCH_ROWS} rows"
+            return joblib.load(pickle_path)
+        return HybridForest(flat, load_sklearn, FLAT_MAX_BATCH_ROWS)
+    print(f"Loading model from {pickle_path}...")
+    load_report["backends"][os.path.basename(pickle_path)] = "sklearn"
+    return joblib.load(pickle_path)
+
+class InferencePlan:
+    """
+    Lookups compiled once from the fitted encoders so a request never touches
+    LabelEncoder.transform / inverse_transform (each of which builds arrays
+    and runs a searchsorted for a single string).
+    """
+
+    def __init__(self, model, encoders):
+        self.model = model
+        self.soil_codes = {label: code for code, label in enumerate(encoders['Soil Type'].classes_)}
+        self.crop_codes = {label: code for code, label in enumerate(encoders['Crop Type'].classes_)}
+
+        # predict_proba columns follow model.classes_ (encoded fertilizer ids),
+        # so resolve each column straight to its fertilizer name
+        fertilizer_classes = np.asarray(encoders['Fertilizer Name'].classes_)
+        if model is not None:
+            fertilizer_classes = fertilizer_classes[np.asarray(model.classes_, dtype=int)]
+        self.fertilizer_names = [str(name) for name in fertilizer_classes]
+
+    def encode(self, soil_type, crop):
+        """Returns (soil_code, crop_code), or None if either label is unseen."""
+        soil_code = self.soil_codes.get(soil_type)
+        crop_code = self.crop_codes.get(crop)
+        if soil_code is None or crop_code is None:
+            return None
+        return soil_code, crop_code
+
+    def predict(self, input_matrix):
+        """
+        Single predict_proba pass over a 2D input.
+        Returns (fertilizer names, confidences in %) per row.
+        """
+        probas = np.asarray(self.model.predict_proba(input_matrix))
+        best = probas.argmax(axis=1)
+        confidences = np.round(probas[np.arange(len(best)), best] * 100, 2)
+        return [self.fertilizer_names[i] for i in best], confidences.tolist()
+
+def build_inference_plan(model, encoders):
+    if encoders is None:
+        return None
+    try:
+        return InferencePlan(model, encoders)
+    except Exception as e:
+        print(f"Error building inference plan: {e}")
+        return None
+
+class FertilizerModels:
+    """Fertilizer forest + its encoders and the inference plan compiled from them."""
+
+    def __init__(self, model, encoders):
+        self.model = model
+        self.encoders = encoders
+        # No scaler in the trained model based on analysis of train_model.py
+        self.scaler = None
+        self.plan = build_inference_plan(model, encoders)
+
+class CropModels:
+    """Crop forest + label encoder, with the lookups the crop recommender needs."""
+
+    FEATURES = ["N", "P", "K", "temperature", "humidity", "ph", "rainfall"]
+
+    def __init__(self, model, label_encoder):
+        self.model = model
+        self.label_encoder = label_encoder
+
+        # Column order the model was trained with
+        if model is not None and hasattr(model, "feature_names_in_"):
+            self.feature_order = [str(name) for name in model.feature_names_in_]
+        else:
+            self.feature_order = self.FEATURES
+
+        # Crop name for each predict_proba column, cached as a plain list
+        if model is not None and label_encoder is not None:
+            self.classes = [str(name) for name in label_encoder.classes_[np.asarray(model.classes_, dtype=int)]]
+        else:
+            self.classes = []
+
+def load_fertilizer_models(model_path=MODEL_PATH, encoder_path=ENCODER_PATH):
+    started = time.perf_counter()
+
+    # Load model and encoders
+    try:
+        model = load_forest(model_path)
+        print("Model loaded successfully.")
+    except Exception as e:
+        print(f"Error loading model: {e}")
+        model = None
+
+    try:
+        print(f"Loading encoders from {encoder_path}...")
+        encoders = joblib.load(encoder_path)
+        print("Encoders loaded successfully.")
+        # Print classes for debugging
+        # for key, enc in encoders.items():
+        #     print(f"{key}: {enc.classes_}")
+    except Exception as e:
+        print(f"Error loading encoders: {e}")
+        encoders = None
+
+    _record_load("fertilizer", started)
+    return FertilizerModels(model, encoders)
+
+def load_crop_models(model_path=CROP_MODEL_PATH, label_encoder_path=LABEL_ENCODER_PATH):
+    started = time.perf_counter()
+    try:
+        crop_model = load_forest(model_path)
+        label_encoder = joblib.load(label_encoder_path)
+        print("✅ Crop ML Model Loaded")
+    except Exception as e:
+        print(f"⚠️ MLA Model Load Failed: {e}")
+        crop_model = None
+        label_encoder = None
+
+    _record_load("crop", started)
+    return CropModels(crop_model, label_encoder)
+
+def _record_load(name, started):
+    load_report["load_seconds"][name] = round(time.perf_counter() - started, 3)
+    load_report["rss_mb"] = _rss_mb()
+    print(f"[model_loader] {name} models loaded in {load_report['load_seconds'][name]}s, RSS {load_report['rss_mb']} MB")
+
+# The active version of each family comes from the model registry, which
+# can swap in a new version at runtime (see model_registry.py).
+
+def get_fertilizer_models():
+    from model_registry import registry
+    return registry.get("fertilizer")
+
+def get_crop_models():
+    from model_registry import registry
+    return registry.get("crop")
+
+def warm_up():
+    """
+    Loads both model families and runs one prediction through each, so the
+    first real request doesn't pay for unpickling, imports or cold mmap pages.
+    """
+    fertilizer = get_fertilizer_models()
+    if fertilizer.model is not None and fertilizer.plan is not None:
+        fertilizer.plan.predict(np.zeros((1, 8)))
+
+    crop = get_crop_models()
+    if crop.model is not None:
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")  # array input to a model fitted on a DataFrame
+            crop.model.predict_proba(np.zeros((1, len(crop.feature_order))))
+    return load_report
+
+# Backwards-compatible module attributes (model_loader.model etc.), loaded on access
+_LAZY_ATTRIBUTES = {
+    "model": lambda: get_fertilizer_models().model,
+    "encoders": lambda: get_fertilizer_models().encoders,
+    "scaler": lambda: get_fertilizer_models().scaler,
+    "inference_plan": lambda: get_fertilizer_models().plan,
+    "crop_model": lambda: get_crop_models().model,
+    "label_encoder": lambda: get_crop_models().label_encoder,
+}
+
+def __getattr__(name):
+    if name in _LAZY_ATTRIBUTES:
+        return _LAZY_ATTRIBUTES[name]()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
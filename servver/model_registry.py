@@ -0,0 +1,334 @@
+import os
+import re
+import sys
+import json
+import time
+import shutil
+import hashlib
+import threading
+from collections import deque
+from datetime import datetime
+
+import numpy as np
+
+import model_loader
+
+# Define base directory
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+REGISTRY_DIR = os.getenv("MODEL_REGISTRY_DIR", os.path.join(BASE_DIR, "model_registry"))
+STATE_FILE = "registry.json"
+META_FILE = "meta.json"
+METRICS_WINDOW = 1000  # recent batches kept per version for latency percentiles
+# How often each API worker checks registry.json for versions activated by another worker (0 = never)
+MODEL_REGISTRY_POLL = float(os.getenv("MODEL_REGISTRY_POLL", "5"))
+
+# "baseline" is the artifacts the app has always shipped with (trained_model/, models/).
+# Other versions live in REGISTRY_DIR/<family>/<version>/ with the same file names.
+BASELINE = "baseline"
+FAMILIES = {
+    "fertilizer": {
+        "files": ["fertilizer_model.pkl", "encoders.pkl"],
+        "baseline_dir": model_loader.MODEL_DIR,
+        "loader": model_loader.load_fertilizer_models,
+    },
+    "crop": {
+        "files": ["crop_model.pkl", "label_encoder.pkl"],
+        "baseline_dir": model_loader.CROP_MODEL_DIR,
+        "loader": model_loader.load_crop_models,
+    },
+}
+VERSION_PATTERN = re.compile(r"^[A-Za-z0-9][A-Za-z0-9._-]{0,63}$")
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def _is_usable(family, models):
+    if family == "fertilizer":
+        return models.model is not None and models.plan is not None
+    return models.model is not None and models.label_encoder is not None
+
+class VersionStats:
+    """Latency of prediction batches served by one model version."""
+
+    def __init__(self):
+        self.batches = 0
+        self.rows = 0
+        self.errors = 0
+        self.latencies_ms = deque(maxlen=METRICS_WINDOW)
+
+    def to_dict(self):
+        latencies = np.asarray(self.latencies_ms) if self.latencies_ms else np.zeros(1)
+        return {
+            "batches": self.batches,
+            "rows": self.rows,
+            "errors": self.errors,
+            "latency_ms": {
+                "mean": round(float(latencies.mean()), 3),
+                "p50": round(float(np.percentile(latencies, 50)), 3),
+                "p95": round(float(np.percentile(latencies, 95)), 3),
+                "p99": round(float(np.percentile(latencies, 99)), 3),
+            },
+        }
+
+class ModelRegistry:
+    """
+    Versioned fertilizer and crop model artifacts, with one active version per family.
+
+    get() hands out the loaded models of the active version. activate() loads
+    the new version first and then swaps a single reference, so a request
+    that already holds the old models finishes on them. The active version
+    and the activation history (for rollback) are persisted in registry.json.
+
+    registry.json is shared by every uvicorn worker: activate() merges into
+    what is on disk, and refresh() tells a worker which versions another
+    worker activated, so it can switch too.
+    """
+
+    def __init__(self, root=REGISTRY_DIR):
+        self.root = root
+        self.state_mtime = None
+        self.state = self._read_state()
+        self.active = {family: self.state[family]["active"] for family in FAMILIES}
+        self._loaded = {}  # family -> (version, models)
+        self._lock = threading.Lock()
+        self.stats = {}    # (family, version) -> VersionStats
+
+    # --- State ---------------------------------------------------------------
+
+    def _state_path(self):
+        return os.path.join(self.root, STATE_FILE)
+
+    def _stat_state(self):
+        try:
+            return os.stat(self._state_path()).st_mtime_ns
+        except OSError:
+            return None
+
+    def _read_state(self):
+        state = {}
+        self.state_mtime = self._stat_state()
+        try:
+            with open(self._state_path()) as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            pass
+        for family in FAMILIES:
+            entry = state.setdefault(family, {})
+            entry.setdefault("active", BASELINE)
+            entry.setdefault("history", [entry["active"]])
+        return state
+
+    def _write_state(self):
+        os.makedirs(self.root, exist_ok=True)
+        path = self._state_path()
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.state, f, indent=2)
+        os.replace(tmp_path, path)  # atomic: readers never see half a file
+        self.state_mtime = self._stat_state()
+
+    def refresh(self):
+        """
+        Re-reads registry.json if it changed since this process last read or
+        wrote it. Returns {family: version} for families whose active version
+        there differs from the one this process serves (activated by another
+        worker); the caller switches with activate(..., persist=False).
+        """
+        if self._stat_state() == self.state_mtime:
+            return {}
+        with self._lock:
+            self.state = self._read_state()
+        return {family: self.state[family]["active"] for family in FAMILIES
+                if self.state[family]["active"] != self.active[family]}
+
+    # --- Versions ------------------------------------------------------------
+
+    def version_dir(self, family, version):
+        if version == BASELINE:
+            return FAMILIES[family]["baseline_dir"]
+        return os.path.join(self.root, family, version)
+
+    def artifact_paths(self, family, version):
+        directory = self.version_dir(family, version)
+        return [os.path.join(directory, name) for name in FAMILIES[family]["files"]]
+
+    def check(self, family, version):
+        """Raises ValueError unless version exists with all of its artifacts."""
+        if family not in FAMILIES:
+            raise ValueError(f"Unknown model family '{family}'")
+        if version != BASELINE and not VERSION_PATTERN.match(version or ""):
+            raise ValueError(f"Invalid version name '{version}'")
+        missing = [os.path.basename(p) for p in self.artifact_paths(family, version) if not os.path.exists(p)]
+        if missing:
+            raise ValueError(f"Version '{version}' of {family} is missing {', '.join(missing)}")
+
+    def list_versions(self, family):
+        versions = [BASELINE]
+        family_dir = os.path.join(self.root, family)
+        if os.path.isdir(family_dir):
+            versions += sorted(v for v in os.listdir(family_dir) if os.path.isdir(os.path.join(family_dir, v)))
+
+        listed = []
+        for version in versions:
+            meta = {}
+            try:
+                with open(os.path.join(self.version_dir(family, version), META_FILE)) as f:
+                    meta = json.load(f)
+            except (OSError, ValueError):
+                pass
+            stats = self.stats.get((family, version))
+            listed.append({
+                "version": version,
+                "active": version == self.active[family],
+                "complete": all(os.path.exists(p) for p in self.artifact_paths(family, version)),
+                "created_at": meta.get("created_at"),
+                "files": meta.get("files"),
+                "stats": stats.to_dict() if stats else None,
+            })
+        return listed
+
+    def register(self, family, source_dir, version=None, export_flat=True):
+        """Copies a family's artifacts from source_dir into a new version. Returns the version name."""
+        version = version or datetime.now().strftime("v%Y%m%d-%H%M%S")
+        if family not in FAMILIES:
+            raise ValueError(f"Unknown model family '{family}'")
+        if version == BASELINE or not VERSION_PATTERN.match(version):
+            raise ValueError(f"Invalid version name '{version}'")
+        target = self.version_dir(family, version)
+        if os.path.exists(target):
+            raise ValueError(f"Version '{version}' of {family} already exists")
+
+        os.makedirs(target)
+        files = {}
+        for name in FAMILIES[family]["files"]:
+            shutil.copy2(os.path.join(source_dir, name), os.path.join(target, name))
+            files[name] = _sha256(os.path.join(target, name))
+
+        if export_flat:
+            # Flattened forest next to the pickle, picked up by load_forest (MODEL_BACKEND=auto)
+            from forest_compiler import export
+            try:
+                export(os.path.join(target, FAMILIES[family]["files"][0]))
+            except Exception as e:
+                print(f"[ModelRegistry] Could not flatten {family} {version}, it will load as sklearn: {e}")
+
+        with open(os.path.join(target, META_FILE), "w") as f:
+            json.dump({"family": family, "version": version, "created_at": datetime.now().isoformat(),
+                       "source": os.path.abspath(source_dir), "files": files}, f, indent=2)
+        print(f"[ModelRegistry] Registered {family} {version}")
+        return version
+
+    # --- Loading and switching -----------------------------------------------
+
+    def load(self, family, version):
+        """Loads one version. Raises ValueError if it is missing or doesn't load."""
+        self.check(family, version)
+        models = FAMILIES[family]["loader"](*self.artifact_paths(family, version))
+        if not _is_usable(family, models):
+            raise ValueError(f"Version '{version}' of {family} failed to load")
+        model_loader.load_report["versions"][family] = version
+        return models
+
+    def get(self, family):
+        """Loaded models of the active version (loaded on first use)."""
+        loaded = self._loaded.get(family)
+        if loaded is None:
+            with self._lock:
+                loaded = self._loaded.get(family)
+                if loaded is None:
+                    # Not validated: like before versioning, a model that fails to
+                    # load makes each request return an error instead of crashing
+                    version = self.active[family]
+                    models = FAMILIES[family]["loader"](*self.artifact_paths(family, version))
+                    model_loader.load_report["versions"][family] = version
+                    loaded = (version, models)
+                    self._loaded[family] = loaded
+        return loaded[1]
+
+    def loaded_versions(self):
+        return {family: loaded[0] for family, loaded in self._loaded.items()}
+
+    def is_ready(self):
+        return all(family in self._loaded and _is_usable(family, self._loaded[family][1]) for family in FAMILIES)
+
+    def pin(self, versions):
+        """Serves the given versions in this process only (inference workers)."""
+        for family, version in versions.items():
+            self.active[family] = version
+
+    def activate(self, family, version, load=True, rollback=False, persist=True):
+        """
+        Makes version the active one and persists it. With load=True the models
+        are loaded (outside the lock, while the old version keeps serving) and
+        swapped in; with load=False the caller has already loaded them elsewhere
+        (the inference pool) and this process will load them on next use.
+        persist=False only switches this process (following registry.json).
+        """
+        self.check(family, version)
+        models = self.load(family, version) if load else None
+
+        with self._lock:
+            if models is not None:
+                self._loaded[family] = (version, models)
+            else:
+                self._loaded.pop(family, None)
+            self.active[family] = version
+            if not persist:
+                print(f"[ModelRegistry] {family} model is now {version} (activated by another worker)")
+                return
+
+            # Merge into the file: other workers may have switched models since we read it
+            self.state = self._read_state()
+            history = self.state[family]["history"]
+            if rollback:
+                history.pop()
+            elif history[-1] != version:
+                history.append(version)
+            self.state[family]["active"] = version
+            self._write_state()
+        print(f"[ModelRegistry] {family} model is now {version}")
+
+    def rollback_target(self, family):
+        self.refresh()
+        history = self.state[family]["history"]
+        if len(history) < 2:
+            raise ValueError(f"No earlier {family} version to roll back to")
+        return history[-2]
+
+    def active_versions(self):
+        return dict(self.active)
+
+    # --- Metrics -------------------------------------------------------------
+
+    def record(self, family, version, seconds, rows=1, error=False):
+        stats = self.stats.get((family, version))
+        if stats is None:
+            stats = self.stats.setdefault((family, version), VersionStats())
+        stats.batches += 1
+        stats.rows += rows
+        stats.errors += int(error)
+        stats.latencies_ms.append(seconds * 1000)
+
+    def describe(self):
+        return {family: {"active": self.active[family], "versions": self.list_versions(family)} for family in FAMILIES}
+
+# Global instance
+registry = ModelRegistry()
+
+if __name__ == "__main__":
+    # Usage:
+    #   python model_registry.py list
+    #   python model_registry.py register <fertilizer|crop> <dir with the .pkl files> [version]
+    command = sys.argv[1] if len(sys.argv) > 1 else "list"
+    if command == "register" and len(sys.argv) >= 4:
+        started = time.perf_counter()
+        name = registry.register(sys.argv[2], sys.argv[3], sys.argv[4] if len(sys.argv) > 4 else None)
+        print(f"✅ {sys.argv[2]} {name} registered in {time.perf_counter() - started:.1f}s; activate it with POST /api/admin/models/{sys.argv[2]}/activate/{name}")
+    elif command == "list":
+        print(json.dumps(registry.describe(), indent=2))
+    else:
+        print("Usage: python model_registry.py [list | register <family> <dir> [version]]")
@@ -138,6 +138,7 @@ class ChatSession(MongoModel):
     messages: List[ChatMessage] = []
     createdAt: datetime = Field(default_factory=datetime.utcnow)
     updatedAt: datetime = Field(default_factory=datetime.utcnow)
+    lastMessagePreview: Optional[str] = None # Denormalized for the history list
 
 class IrrigationEntry(MongoModel):
     sno: Optional[int] = None
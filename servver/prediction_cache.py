@@ -0,0 +1,122 @@
+import os
+import json
+import time
+import threading
+from collections import OrderedDict
+
+# Configuration
+CACHE_MAX_ENTRIES = int(os.getenv("PREDICTION_CACHE_SIZE", "10000"))  # per model; bounds memory
+CACHE_TTL = float(os.getenv("PREDICTION_CACHE_TTL", "300"))          # seconds
+# Optional per-feature step overrides, e.g. '{"ph": 0.05, "N": 2}'. PREDICTION_CACHE_STEPS
+# applies to both models (temperature and humidity are features of both); the
+# per-model variables win over it for their own model.
+CACHE_STEPS_OVERRIDE = json.loads(os.getenv("PREDICTION_CACHE_STEPS", "{}") or "{}")
+FERTILIZER_STEPS_OVERRIDE = json.loads(os.getenv("PREDICTION_CACHE_STEPS_FERTILIZER", "{}") or "{}")
+CROP_STEPS_OVERRIDE = json.loads(os.getenv("PREDICTION_CACHE_STEPS_CROP", "{}") or "{}")
+
+# Quantization step per numeric feature. Sensor readings that differ by less
+# than one step share a cache entry. Categorical fields are matched exactly.
+FERTILIZER_STEPS = {
+    "temperature": 0.5,
+    "humidity": 1,
+    "moisture": 1,
+    "nitrogen": 1,
+    "potassium": 1,
+    "phosphorus": 1,
+}
+FERTILIZER_CATEGORICAL = ["soil_type", "crop"]
+
+CROP_STEPS = {
+    "N": 1,
+    "P": 1,
+    "K": 1,
+    "temperature": 0.5,
+    "humidity": 1,
+    "ph": 0.1,
+    "rainfall": 1,
+}
+
+class PredictionCache:
+    """
+    LRU + TTL cache of model outputs keyed on a quantized feature tuple.
+
+    quantize() snaps the numeric features to their step; the caller predicts
+    on the quantized row, so a cached answer is exactly what the model would
+    return for any input that maps to the same key.
+    """
+
+    def __init__(self, name, steps, categorical=(), max_entries=CACHE_MAX_ENTRIES, ttl=CACHE_TTL, overrides=None):
+        self.name = name
+        overrides = dict(CACHE_STEPS_OVERRIDE, **(overrides or {}))
+        self.steps = {f: overrides.get(f, step) for f, step in steps.items()}
+        self.categorical = list(categorical)
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries = OrderedDict()  # key -> (expires_at, value)
+        self.lock = threading.Lock()
+
+        # Metrics
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def quantize(self, features):
+        """Returns (key, quantized features) for a feature dict."""
+        quantized = dict(features)
+        for field, step in self.steps.items():
+            if field in quantized and quantized[field] is not None:
+                # round() again to drop float noise like 6.500000000001
+                quantized[field] = round(round(float(quantized[field]) / step) * step, 6)
+        key = tuple(quantized.get(f) for f in self.categorical) + tuple(quantized.get(f) for f in self.steps)
+        return key, quantized
+
+    def get(self, key):
+        if self.max_entries <= 0:
+            return None
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self.entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        if self.max_entries <= 0:
+            return
+        with self.lock:
+            self.entries[key] = (time.monotonic() + self.ttl, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl,
+            "steps": self.steps,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+# Global instances
+fertilizer_cache = PredictionCache("fertilizer", FERTILIZER_STEPS, FERTILIZER_CATEGORICAL, overrides=FERTILIZER_STEPS_OVERRIDE)
+crop_cache = PredictionCache("crop", CROP_STEPS, overrides=CROP_STEPS_OVERRIDE)
@@ -0,0 +1,164 @@
+import os
+import time
+import asyncio
+from collections import OrderedDict
+
+# Configuration
+MARKET_CACHE_TTL = float(os.getenv("MARKET_CACHE_TTL", "1800"))          # seconds a price is fresh (0 = no cache)
+MARKET_CACHE_MAX_AGE = float(os.getenv("MARKET_CACHE_MAX_AGE", "86400"))  # older prices aren't served, even stale
+MARKET_CACHE_RETRY = float(os.getenv("MARKET_CACHE_RETRY", "300"))       # wait after a failed fetch before trying again
+MARKET_CACHE_LOCATIONS = int(os.getenv("MARKET_CACHE_LOCATIONS", "1000"))  # (state, district) pairs kept; LRU
+
+class _Entry:
+    __slots__ = ("row", "fetched_at", "previous_price", "retry_at")
+
+    def __init__(self):
+        self.row = None            # last good row (None: never found)
+        self.fetched_at = 0.0      # wall clock of the last successful fetch
+        self.previous_price = None # price before the last change, for "change"
+        self.retry_at = 0.0        # no refresh before this (after a failure)
+
+class PriceCache:
+    """
+    Stale-while-revalidate cache of mandi prices keyed by
+    (state, district, commodity).
+
+    A fresh price (younger than ttl) is served as is. A stale one (up to
+    max_age) is served immediately while a background task refetches it.
+    Without a usable price the request waits for the fetch; concurrent
+    requests for the same key share one fetch. Locations are kept in LRU
+    order, at most max_locations of them.
+
+    "change" is the difference to the price before the last change, so it
+    survives refreshes that return the same price, unless the fetched row
+    brings its own (day-over-day, marked by "change_since").
+    """
+
+    def __init__(self, ttl=MARKET_CACHE_TTL, max_age=MARKET_CACHE_MAX_AGE, retry=MARKET_CACHE_RETRY,
+                 max_locations=MARKET_CACHE_LOCATIONS):
+        self.ttl = ttl
+        self.max_age = max_age
+        self.retry = retry
+        self.max_locations = max_locations
+        self.locations = OrderedDict()  # (state, district) -> {commodity id: _Entry}
+        self.inflight = {}              # key -> asyncio.Task of the running fetch
+        self.background = set()         # refresh tasks (a reference keeps them from being collected)
+
+        # Metrics
+        self.fresh_hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.refreshes = 0
+        self.fetch_failures = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _location(state, district):
+        return (state.strip().lower(), district.strip().lower())
+
+    def _entry(self, location, commodity_id):
+        entries = self.locations.get(location)
+        if entries is None:
+            entries = self.locations[location] = {}
+            while len(self.locations) > self.max_locations:
+                self.locations.popitem(last=False)
+                self.evictions += 1
+        self.locations.move_to_end(location)
+        return entries.setdefault(commodity_id, _Entry())
+
+    def _serve(self, entry, now):
+        row = dict(entry.row)
+        # Day-over-day change from the price history wins over the in-memory previous price
+        if entry.previous_price is not None and "change_since" not in row:
+            row["change"] = round(row["price"] - entry.previous_price, 2)
+        row["age_seconds"] = int(now - entry.fetched_at)
+        row["updated_at"] = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(entry.fetched_at))
+        return row
+
+    async def _fetch(self, key, entry, fetch):
+        try:
+            row = await fetch()
+        except Exception as e:
+            print(f"[PriceCache] {key}: {e}")
+            row = None
+        now = time.time()
+        if row is None:
+            # Keep the last good price; don't ask the site again right away
+            self.fetch_failures += 1
+            entry.retry_at = now + self.retry
+            return
+        if entry.row is not None and row["price"] != entry.row["price"]:
+            entry.previous_price = entry.row["price"]
+        entry.row = row
+        entry.fetched_at = now
+        entry.retry_at = 0.0
+
+    def _start_fetch(self, key, entry, fetch):
+        task = self.inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._fetch(key, entry, fetch))
+            self.inflight[key] = task
+            task.add_done_callback(lambda _: self.inflight.pop(key, None))
+        return task
+
+    async def get(self, state, district, commodity, fetch):
+        """
+        The row for commodity at (state, district), or None if it can't be
+        found. fetch() is the coroutine function that scrapes it.
+        """
+        if self.ttl <= 0:
+            return await fetch()
+
+        location = self._location(state, district)
+        key = location + (commodity["id"],)
+        entry = self._entry(location, commodity["id"])
+        now = time.time()
+        age = now - entry.fetched_at
+
+        if entry.row is not None and age <= self.max_age:
+            if age <= self.ttl:
+                self.fresh_hits += 1
+            else:
+                self.stale_hits += 1
+                if now >= entry.retry_at and key not in self.inflight:
+                    self.refreshes += 1
+                    task = self._start_fetch(key, entry, fetch)
+                    self.background.add(task)
+                    task.add_done_callback(self.background.discard)
+            return self._serve(entry, now)
+
+        if now < entry.retry_at:
+            return None  # failed recently: the site doesn't have it (or is down)
+
+        if key in self.inflight:
+            self.coalesced += 1
+        else:
+            self.misses += 1
+        # shield: a client that disconnects doesn't cancel the fetch others wait on
+        await asyncio.shield(self._start_fetch(key, entry, fetch))
+        if entry.row is None or time.time() - entry.fetched_at > self.max_age:
+            return None
+        return self._serve(entry, time.time())
+
+    def clear(self):
+        self.locations.clear()
+
+    def stats(self):
+        lookups = self.fresh_hits + self.stale_hits + self.misses + self.coalesced
+        return {
+            "locations": len(self.locations),
+            "entries": sum(len(entries) for entries in self.locations.values()),
+            "ttl_seconds": self.ttl,
+            "fresh_hits": self.fresh_hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "refreshes": self.refreshes,
+            "fetch_failures": self.fetch_failures,
+            "evictions": self.evictions,
+            "hit_rate": round((self.fresh_hits + self.stale_hits) / lookups, 4) if lookups else 0.0,
+        }
+
+# Global instance
+price_cache = PriceCache()
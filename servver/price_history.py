@@ -0,0 +1,154 @@
+import os
+from datetime import datetime, timedelta
+
+import numpy as np
+
+# Configuration
+PRICE_HISTORY_COLLECTION = "price_history"
+PRICE_HISTORY_MAX_DAYS = int(os.getenv("PRICE_HISTORY_MAX_DAYS", "730"))  # longest series served
+MARKET_UTC_OFFSET = timedelta(hours=5, minutes=30)                        # mandi days are IST days
+INTERVALS = {"day", "week"}
+LEVELS = {"district", "state"}                                            # district mandi price / state average
+STATE_DEDUP_SECONDS = 900                                                 # one state average point per window
+
+def _normalize(name):
+    return name.strip().lower()
+
+def aggregate_series(timestamps, prices, interval="day"):
+    """
+    Downsamples price points into daily or weekly (Monday-start) buckets in
+    IST. timestamps: naive UTC datetimes (or datetime64), prices: floats.
+    Returns [{date, open, close, min, max, avg, points, change}], oldest
+    first; change is close minus the previous bucket's close.
+    """
+    if len(timestamps) == 0:
+        return []
+    ts = np.asarray(timestamps, dtype="datetime64[s]")
+    prices = np.asarray(prices, dtype=np.float64)
+    order = np.argsort(ts, kind="stable")
+    ts, prices = ts[order], prices[order]
+
+    days = (ts + np.timedelta64(int(MARKET_UTC_OFFSET.total_seconds()), "s")).astype("datetime64[D]")
+    if interval == "week":
+        # 1970-01-01 was a Thursday: shift so weeks start on Monday
+        days = ((days - np.datetime64("1969-12-29")) // 7 * 7 + np.datetime64("1969-12-29")).astype("datetime64[D]")
+
+    buckets, starts, counts = np.unique(days, return_index=True, return_counts=True)
+    ends = starts + counts - 1
+    closes = prices[ends]
+    change = np.diff(closes, prepend=np.nan)
+
+    series = {
+        "open": prices[starts],
+        "close": closes,
+        "min": np.minimum.reduceat(prices, starts),
+        "max": np.maximum.reduceat(prices, starts),
+        "avg": np.add.reduceat(prices, starts) / counts,
+    }
+    return [
+        {
+            "date": str(bucket),
+            **{name: round(float(values[i]), 2) for name, values in series.items()},
+            "points": int(counts[i]),
+            "change": None if np.isnan(change[i]) else round(float(change[i]), 2),
+        }
+        for i, bucket in enumerate(buckets)
+    ]
+
+class PriceHistory:
+    """
+    Every scraped price point, in a MongoDB time-series collection
+    (timeField "ts", metaField "meta" = {commodity, state, district, level}),
+    plus an index on meta + ts. Falls back to a plain collection with the
+    same index where time-series collections aren't available.
+    Until start() succeeds (no MongoDB), recording is a no-op.
+
+    District mandi prices and state averages (what a district without its
+    own page falls back to) are separate series: a state average is stored
+    under the state with district "" and level "state", once per
+    STATE_DEDUP_SECONDS however many districts fell back to it.
+    """
+
+    def __init__(self):
+        self.collection = None
+
+    async def start(self, db):
+        from pymongo.errors import CollectionInvalid, OperationFailure
+
+        try:
+            await db.create_collection(
+                PRICE_HISTORY_COLLECTION,
+                timeseries={"timeField": "ts", "metaField": "meta", "granularity": "hours"},
+            )
+        except CollectionInvalid:
+            pass  # already exists
+        except OperationFailure as e:
+            print(f"[PriceHistory] Time-series collection not available ({e}), using a regular one")
+        collection = db[PRICE_HISTORY_COLLECTION]
+        await collection.create_index(
+            [("meta.commodity", 1), ("meta.state", 1), ("meta.district", 1), ("ts", -1)],
+            name="commodity_state_district_ts",
+        )
+        self.collection = collection
+
+    @staticmethod
+    def _meta(commodity_id, state, district, level="district"):
+        return {
+            "commodity": commodity_id,
+            "state": _normalize(state),
+            "district": _normalize(district) if level == "district" else "",
+            "level": level,
+        }
+
+    def _query(self, commodity_id, state, district, level="district"):
+        return {f"meta.{k}": v for k, v in self._meta(commodity_id, state, district, level).items()}
+
+    async def record(self, row, state, district, when=None):
+        """
+        Stores a scraped row's price (₹/kg): under (state, district) for a
+        district price, under the state for a state average (row["level"]).
+        """
+        if self.collection is None:
+            return
+        level = row.get("level", "district")
+        when = when or datetime.utcnow()
+        try:
+            if level == "state":
+                recent = dict(self._query(row["commodity"], state, district, level),
+                              ts={"$gt": when - timedelta(seconds=STATE_DEDUP_SECONDS)})
+                if await self.collection.find_one(recent, {"_id": 1}):
+                    return  # another district already recorded this average
+            await self.collection.insert_one({
+                "ts": when,
+                "meta": self._meta(row["commodity"], state, district, level),
+                "price": row["price"],
+                "market": row.get("market"),
+            })
+        except Exception as e:
+            print(f"[PriceHistory] Record failed: {e}")
+
+    async def previous_close(self, commodity_id, state, district, level="district", now=None):
+        """The last price of the same level recorded before today (IST) as {"price", "date"}, or None."""
+        if self.collection is None:
+            return None
+        now = now or datetime.utcnow()
+        today_start = datetime.combine((now + MARKET_UTC_OFFSET).date(), datetime.min.time()) - MARKET_UTC_OFFSET
+        try:
+            query = dict(self._query(commodity_id, state, district, level), ts={"$lt": today_start})
+            point = await self.collection.find_one(query, {"price": 1, "ts": 1}, sort=[("ts", -1)])
+        except Exception as e:
+            print(f"[PriceHistory] Lookup failed: {e}")
+            return None
+        if point is None:
+            return None
+        return {"price": point["price"], "date": str((point["ts"] + MARKET_UTC_OFFSET).date())}
+
+    async def series(self, commodity_id, state, district, interval="day", days=90, level="district"):
+        """Aggregated series over the last `days` days (see aggregate_series)."""
+        since = datetime.utcnow() - timedelta(days=min(days, PRICE_HISTORY_MAX_DAYS))
+        query = dict(self._query(commodity_id, state, district, level), ts={"$gte": since})
+        points = await self.collection.find(query, {"_id": 0, "ts": 1, "price": 1}).sort("ts", 1).to_list(None)
+        return aggregate_series([p["ts"] for p in points], [p["price"] for p in points], interval)
+
+# Global instance
+price_history = PriceHistory()
@@ -0,0 +1,164 @@
+import os
+import re
+
+from bs4 import BeautifulSoup
+from lxml import etree
+
+# Configuration
+MARKET_PARSER = os.getenv("MARKET_PARSER", "stream")  # "stream" (lxml, stops at the price table) or "soup"
+STREAM_CHUNK_CHARS = 16384                            # HTML fed to the pull parser between checks
+
+NUMBER_PATTERN = re.compile(r'\b\d+(?:[\.,]\d+)?\b')
+
+def highest_price(cell_texts):
+    """
+    Heuristic: Pick the highest number in the row that looks like a price
+    (per quintal), or None.
+    """
+    potential_prices = []
+    for text in cell_texts:
+        # Find all numbers in the text (integer or float)
+        for match in NUMBER_PATTERN.findall(text.strip()):
+            # Replace comma if present (e.g. 1,200)
+            val = float(match.replace(',', ''))
+            # Filter Sanity Check for Quintal Prices:
+            # - Must be > 100 (exclude small numbers/dates like 1, 31)
+            # - Must be < 30000 (exclude massive concatenated dates like 20241225)
+            if 100 < val < 30000:
+                potential_prices.append(val)
+
+    # Max price is usually a safe bet for "Model Price" or "Max Price"
+    return max(potential_prices) if potential_prices else None
+
+def is_price_header(header_texts):
+    header_text = " ".join(h.strip().lower() for h in header_texts)
+    return "market" in header_text and "price" in header_text
+
+def parse_price_page_soup(html):
+    """
+    Price per quintal from a CommodityOnline mandi price page, or None.
+    Builds the whole BeautifulSoup tree (html.parser) first.
+    """
+    soup = BeautifulSoup(html, 'html.parser')
+    tables = soup.find_all('table')
+
+    target_table = None
+
+    # Smart Table Search: Find the table that looks like a Price Table
+    for table in tables:
+        # Check headers
+        if is_price_header(th.get_text() for th in table.find_all('th')):
+            target_table = table
+            break
+
+    # Fallback: If no smart match, try the second table (often the main one) or first if only 1
+    if not target_table and len(tables) > 0:
+        target_table = tables[1] if len(tables) > 1 else tables[0]
+
+    if not target_table:
+        return None
+
+    # Assuming standard structure: Date | ... | Price | ...
+    # We usually want the first row of data
+    rows = target_table.find_all('tr')
+    if len(rows) < 2:
+        return None
+    return highest_price(cell.get_text() for cell in rows[1].find_all('td'))
+
+class _Table:
+    """What the streaming parser keeps of a table: its headers and its first data row."""
+    __slots__ = ("headers", "matched", "rows", "data_row", "cells", "closed")
+
+    def __init__(self):
+        self.headers = []     # text of every th inside it
+        self.matched = False  # is_price_header(headers)
+        self.rows = 0         # tr seen inside it
+        self.data_row = None  # its second tr (rows[1]) while that is open
+        self.cells = None     # text of the td cells of rows[1]
+        self.closed = False
+
+def _settled_table(tables):
+    """
+    The table parse_price_page_soup would pick, once nothing later in the
+    page can change that (else None): the first table with price headers,
+    after every table before it has closed, with its first data row done.
+    """
+    for table in tables:
+        if table.matched:
+            row_done = table.closed or (table.cells is not None and table.data_row is None)
+            return table if row_done else None
+        if not table.closed:
+            return None  # it may still get price headers
+    return None
+
+def parse_price_page_stream(html):
+    """
+    Same result as parse_price_page_soup, from lxml's pull parser (libxml2).
+    The page is fed in chunks and parsing stops as soon as the price table
+    has its first data row; the rest of the page is never parsed.
+    """
+    parser = etree.HTMLPullParser(events=("start", "end"), tag=("table", "tr", "th", "td"))
+    open_tables = []  # tables being parsed, outermost first
+    tables = []       # every table so far, in document order
+
+    for offset in range(0, len(html), STREAM_CHUNK_CHARS):
+        parser.feed(html[offset:offset + STREAM_CHUNK_CHARS])
+        for event, element in parser.read_events():
+            tag = element.tag
+            if event == "start":
+                if tag == "table":
+                    table = _Table()
+                    open_tables.append(table)
+                    tables.append(table)
+                elif tag == "tr":
+                    # Like find_all, a table's rows include those of tables nested in it
+                    for table in open_tables:
+                        table.rows += 1
+                        if table.rows == 2:
+                            table.data_row, table.cells = element, []
+                continue
+
+            if tag == "td":
+                text = "".join(element.itertext())
+                for table in open_tables:
+                    if table.data_row is not None:
+                        table.cells.append(text)
+                continue
+            if tag == "th":
+                text = "".join(element.itertext())
+                for table in open_tables:
+                    table.headers.append(text)
+                    table.matched = table.matched or is_price_header(table.headers)
+            elif tag == "tr":
+                for table in open_tables:
+                    if table.data_row is element:
+                        table.data_row = None
+            elif open_tables:
+                open_tables.pop().closed = True
+
+            target = _settled_table(tables)
+            if target is not None:
+                return highest_price(target.cells) if target.cells is not None else None
+
+    try:
+        parser.close()
+    except etree.XMLSyntaxError:
+        return None  # nothing to parse (empty page)
+    for table in tables:
+        if table.matched:
+            return highest_price(table.cells) if table.cells is not None else None
+    # Fallback: If no smart match, try the second table (often the main one) or first if only 1
+    if not tables:
+        return None
+    target = tables[1] if len(tables) > 1 else tables[0]
+    return highest_price(target.cells) if target.cells is not None else None
+
+PARSERS = {"stream": parse_price_page_stream, "soup": parse_price_page_soup}
+
+def parse_price_page(html):
+    """
+    Price per quintal from a CommodityOnline mandi price page, or None
+    (MARKET_PARSER picks the implementation).
+    CPU-bound (HTML parsing): call it off the event loop.
+    """
+    return PARSERS[MARKET_PARSER](html)
@@ -1,6 +1,5 @@
 import numpy as np
-from model_loader import model, encoders, scaler
-from confidence import calculate_confidence
+from model_loader import get_fertilizer_models
 from regulatory_filter import filter_indian_regulations
 
 # Mapping for organic alternatives based on chemical prediction
@@ -57,6 +56,38 @@ def get_pesticide_recommendation(crop):
     rules = PESTICIDE_RULES.get(crop, PESTICIDE_RULES["default"])
     return rules["organic"], rules["chemical"]
 
+def build_recommendation(pred_name, confidence, crop):
+    """
+    Expands a predicted fertilizer name into the organic/chemical payload.
+    """
+    # 1. Chemical Fertilizer (The Prediction)
+    chemical_fertilizers = [{
+        "name": pred_name,
+        "quantity": "As per soil test (approx 50-100 kg/acre)", # Can be refined based on NPK gap
+        "split": "Split into 2-3 doses"
+    }]
+
+    # 2. Organic Fertilizer (Mapped from Prediction)
+    organic_fertilizers = ORGANIC_MAPPING.get(pred_name, DEFAULT_ORGANIC)
+
+    # 3. Pesticides (Rule based on Crop)
+    organic_pesticides, chemical_pesticides = get_pesticide_recommendation(crop)
+
+    # 4. Filter Regulations
+    chemical_pesticides = filter_indian_regulations(chemical_pesticides)
+
+    return {
+        "confidence": confidence,
+        "organic": {
+            "fertilizers": organic_fertilizers,
+            "pesticides": organic_pesticides
+        },
+        "chemical": {
+            "fertilizers": chemical_fertilizers,
+            "pesticides": chemical_pesticides
+        }
+    }
+
 def recommend(input_data):
     """
     input_data expected keys:
@@ -70,19 +101,19 @@ def recommend(input_data):
     - phosphorus
     """
     try:
-        # Encode inputs
-        try:
-            encoded_soil = encoders['Soil Type'].transform([input_data['soil_type']])[0]
-            encoded_crop = encoders['Crop Type'].transform([input_data['crop']])[0]
-        except ValueError as e:
-            print(f"Encoding error: {e}. Using defaults/0.")
-            # Fallback for unseen values
-            encoded_soil = 0
-            encoded_crop = 0
-        except KeyError as e:
-            print(f"Encoder key error: {e}")
+        fertilizer = get_fertilizer_models()  # loaded on first use
+        model, scaler, inference_plan = fertilizer.model, fertilizer.scaler, fertilizer.plan
+        if inference_plan is None:
             return {"error": "Model encoders not loaded correctly."}
 
+        # Encode inputs (dict lookups precompiled in model_loader)
+        codes = inference_plan.encode(input_data['soil_type'], input_data['crop'])
+        if codes is None:
+            print(f"Encoding error: unseen soil type '{input_data['soil_type']}' or crop '{input_data['crop']}'. Using defaults/0.")
+            # Fallback for unseen values
+            codes = (0, 0)
+        encoded_soil, encoded_crop = codes
+
         # Prepare feature vector
         # Order: Temparature, Humidity, Moisture, Soil Type, Crop Type, Nitrogen, Potassium, Phosphorous
         features = [
@@ -102,45 +133,76 @@ def recommend(input_data):
         else:
             input_vector = [features]
 
-        # Predict
+        # Predict: one predict_proba gives both the label (argmax) and the confidence (max)
         if model:
-            pred_idx = model.predict(input_vector)[0]
-            pred_name = encoders['Fertilizer Name'].inverse_transform([pred_idx])[0]
-            confidence = calculate_confidence(model, input_vector[0])
+            pred_names, confidences = inference_plan.predict(input_vector)
+            pred_name, confidence = pred_names[0], confidences[0]
         else:
             # Fallback if model is not loaded
             pred_name = "Urea"
             confidence = 0.0
 
-        # Generate Recommendations
-        
-        # 1. Chemical Fertilizer (The Prediction)
-        chemical_fertilizers = [{
-            "name": pred_name,
-            "quantity": "As per soil test (approx 50-100 kg/acre)", # Can be refined based on NPK gap
-            "split": "Split into 2-3 doses"
-        }]
-
-        # 2. Organic Fertilizer (Mapped from Prediction)
-        organic_fertilizers = ORGANIC_MAPPING.get(pred_name, DEFAULT_ORGANIC)
-
-        # 3. Pesticides (Rule based on Crop)
-        organic_pesticides, chemical_pesticides = get_pesticide_recommendation(input_data.get('crop'))
-
-        # 4. Filter Regulations
-        chemical_pesticides = filter_indian_regulations(chemical_pesticides)
-
-        return {
-            "confidence": confidence,
-            "organic": {
-                "fertilizers": organic_fertilizers,
-                "pesticides": organic_pesticides
-            },
-            "chemical": {
-                "fertilizers": chemical_fertilizers,
-                "pesticides": chemical_pesticides
-            }
-        }
+        return build_recommendation(pred_name, confidence, input_data.get('crop'))
+
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        return {"error": str(e)}
+
+def recommend_batch(rows):
+    """
+    Batched variant of recommend() for many soil samples at once
+    (e.g. a village-wide soil health card export).
+
+    rows: list of dicts with the same keys as recommend().
+    Runs a single predict_proba over the whole matrix; the argmax gives the
+    label and the max gives the confidence, so each forest is walked once.
+    """
+    try:
+        if not rows:
+            return []
+
+        fertilizer = get_fertilizer_models()  # loaded on first use
+        model, scaler, inference_plan = fertilizer.model, fertilizer.scaler, fertilizer.plan
+        if inference_plan is None:
+            return {"error": "Model encoders not loaded correctly."}
+
+        soil_codes = np.fromiter((inference_plan.soil_codes.get(r['soil_type'], -1) for r in rows), dtype=np.int64, count=len(rows))
+        crop_codes = np.fromiter((inference_plan.crop_codes.get(r['crop'], -1) for r in rows), dtype=np.int64, count=len(rows))
+
+        # Same fallback as recommend(): an unseen soil or crop zeroes both codes
+        unseen = (soil_codes < 0) | (crop_codes < 0)
+        if unseen.any():
+            print(f"Encoding error: {int(unseen.sum())} rows with unseen labels. Using defaults/0.")
+            soil_codes[unseen] = 0
+            crop_codes[unseen] = 0
+
+        # Order: Temparature, Humidity, Moisture, Soil Type, Crop Type, Nitrogen, Potassium, Phosphorous
+        input_matrix = np.column_stack([
+            [r.get('temperature', 25) for r in rows],
+            [r.get('humidity', 50) for r in rows],
+            [r.get('moisture', 40) for r in rows],
+            soil_codes,
+            crop_codes,
+            [r.get('nitrogen', 0) for r in rows],
+            [r.get('potassium', 0) for r in rows],
+            [r.get('phosphorus', 0) for r in rows],
+        ]).astype(np.float64)
+
+        if scaler:
+            input_matrix = scaler.transform(input_matrix)
+
+        if model:
+            pred_names, confidences = inference_plan.predict(input_matrix)
+        else:
+            # Fallback if model is not loaded
+            pred_names = ["Urea"] * len(rows)
+            confidences = [0.0] * len(rows)
+
+        return [
+            build_recommendation(name, conf, row.get('crop'))
+            for row, name, conf in zip(rows, pred_names, confidences)
+        ]
 
     except Exception as e:
         import traceback
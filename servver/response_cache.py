@@ -0,0 +1,262 @@
+import os
+import re
+import json
+import time
+import zlib
+import threading
+import unicodedata
+from collections import OrderedDict
+
+import numpy as np
+
+# Configuration
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "2000"))             # answers kept; bounds memory
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "21600"))            # seconds (6 h)
+RESPONSE_CACHE_THRESHOLD = float(os.getenv("RESPONSE_CACHE_THRESHOLD", "0.85"))  # cosine similarity to serve a hit
+EMBEDDING_DIM = 2048                                                             # hashed feature buckets (float32)
+
+# Sensor readings are compared in bands, so farmers with similar soil share answers
+SENSOR_BANDS = {
+    "ph": 0.5,
+    "n": 40,
+    "p": 15,
+    "k": 20,
+    "moisture": 10,
+}
+
+# Filler words carry little of a question's meaning ("when to apply urea for
+# paddy" vs "when should I apply urea to my paddy"), so they are down-weighted.
+# Question words (when/how/which) are kept at full weight: they change the answer.
+STOPWORDS = set("""
+a an the to for in on of at is are am be i my me we our you your should can could would will
+do does please tell crop field farm and or with it this that some any
+kya hai ka ki ke mein
+में का की के है को से और चाहिए मुझे मेरे मेरी अपने लिए पर भी तो
+""".split())
+
+# "when not to apply urea" embeds close to "when to apply urea" but asks the
+# opposite, so questions only match when they negate the same number of times.
+# "t" is what is left of n't once punctuation is stripped (don't -> don t).
+NEGATIONS = set("""
+not no never nor cannot t
+nahi nahin mat na
+नहीं नही मत न
+""".split())
+
+_PUNCTUATION = re.compile(r"[^\w\s]", re.UNICODE)
+_WHITESPACE = re.compile(r"\s+")
+
+def normalize_question(text):
+    """Lowercase, Unicode-normalized, punctuation stripped, whitespace collapsed."""
+    text = unicodedata.normalize("NFKC", text or "").lower()
+    return _WHITESPACE.sub(" ", _PUNCTUATION.sub(" ", text)).strip()
+
+def context_text(value):
+    """
+    A userContext field as text. userContext is free-form, so a field may
+    be an object (e.g. {"state": "TN"}) instead of a string.
+    """
+    if value is None:
+        return ""
+    if isinstance(value, str):
+        return value
+    return json.dumps(value, sort_keys=True, ensure_ascii=False, default=str)
+
+def negation_count(question):
+    """Negation words in a normalized question."""
+    return sum(word in NEGATIONS for word in question.split())
+
+def _bucket(feature):
+    # crc32 rather than hash(): stable across processes and restarts
+    return zlib.crc32(feature.encode("utf-8")) % EMBEDDING_DIM
+
+def embed(question):
+    """
+    Hashed n-gram embedding: word unigrams, plus bigrams and character
+    trigrams of the content words (trigrams also cover Indic scripts and
+    typos), sublinear term frequency (log1p), L2-normalized so a dot product
+    is the cosine similarity.
+    """
+    words = question.split()
+    content = [w for w in words if w not in STOPWORDS]
+    counts = {}
+    for feature, weight in (
+        [(f"w:{w}", 0.1 if w in STOPWORDS else 1.0) for w in words]
+        + [(f"b:{a} {b}", 0.5) for a, b in zip(content, content[1:])]
+        + [(f"c:{w[i:i + 3]}", 0.2) for w in (f" {w} " for w in content) for i in range(len(w) - 2)]
+    ):
+        bucket = _bucket(feature)
+        counts[bucket] = counts.get(bucket, 0.0) + weight
+
+    vector = np.zeros(EMBEDDING_DIM, dtype=np.float32)
+    for bucket, count in counts.items():
+        vector[bucket] = np.log1p(count)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+def context_key(language, user_context):
+    """The parts of the request an answer depends on besides the question itself."""
+    user_context = user_context or {}
+    soil = user_context.get("soil")
+    soil = soil if isinstance(soil, dict) else {"type": soil}
+    sensors = user_context.get("sensors")
+    sensors = sensors if isinstance(sensors, dict) else {}
+    bands = []
+    for field, step in SENSOR_BANDS.items():
+        try:
+            bands.append(round(float(sensors[field]) // step * step, 2))
+        except (KeyError, TypeError, ValueError):
+            bands.append(None)
+    return (
+        (language or "en").lower(),
+        normalize_question(context_text(user_context.get("location"))),
+        normalize_question(context_text(user_context.get("crop"))),
+        normalize_question(context_text(soil.get("type"))),
+        normalize_question(context_text(soil.get("waterSource"))),
+        tuple(bands),
+    )
+
+class _Entry:
+    __slots__ = ("key", "partition", "vector", "negations", "answer", "name", "expires_at")
+
+    def __init__(self, key, partition, vector, negations, answer, name, expires_at):
+        self.key = key
+        self.partition = partition
+        self.vector = vector
+        self.negations = negations
+        self.answer = answer
+        self.name = name
+        self.expires_at = expires_at
+
+class SemanticResponseCache:
+    """
+    Chat answers looked up by meaning instead of exact text.
+
+    Requests are partitioned by context_key() (language, location, crop,
+    soil, sensor bands) and matched exactly on that. Within a partition, the
+    question's n-gram embedding is compared against every cached question;
+    the closest one at or above the threshold that negates the same number
+    of times is served. LRU + TTL bound the
+    number and age of answers.
+    """
+
+    def __init__(self, max_entries=RESPONSE_CACHE_SIZE, ttl=RESPONSE_CACHE_TTL, threshold=RESPONSE_CACHE_THRESHOLD):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.threshold = threshold
+        self.entries = OrderedDict()  # (partition, normalized question) -> _Entry, in LRU order
+        self.partitions = {}          # partition -> {"keys": [...], "matrix": np.ndarray or None}
+        self.lock = threading.Lock()
+
+        # Metrics
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.hit_similarity_sum = 0.0
+
+    def _partition(self, partition):
+        return self.partitions.setdefault(partition, {"keys": [], "matrix": None})
+
+    def _remove(self, entry):
+        del self.entries[entry.key]
+        index = self.partitions[entry.partition]
+        index["keys"].remove(entry.key)
+        index["matrix"] = None
+        if not index["keys"]:
+            del self.partitions[entry.partition]
+
+    def get(self, question, language, user_context=None):
+        """Returns (answer, similarity) for a close enough cached question, else None."""
+        if self.max_entries <= 0:
+            return None
+        normalized = normalize_question(question)
+        if not normalized:
+            return None
+        partition = context_key(language, user_context)
+        vector = embed(normalized)
+        negations = negation_count(normalized)
+        name = normalize_question(context_text((user_context or {}).get("name")))
+
+        with self.lock:
+            index = self.partitions.get(partition)
+            if index is None:
+                self.misses += 1
+                return None
+            if index["matrix"] is None:
+                index["matrix"] = np.stack([self.entries[key].vector for key in index["keys"]])
+            similarities = index["matrix"] @ vector
+
+            now = time.monotonic()
+            for position in np.argsort(similarities)[::-1]:
+                similarity = float(similarities[position])
+                if similarity < self.threshold:
+                    break
+                entry = self.entries[index["keys"][position]]
+                if entry.expires_at < now:
+                    continue  # dropped below, after the loop
+                if entry.negations != negations:
+                    continue  # "when not to ..." isn't answered by "when to ..."
+                # An answer that addresses the original asker by name isn't for anyone else
+                if entry.name and entry.name != name and entry.name in normalize_question(entry.answer):
+                    continue
+                self.entries.move_to_end(entry.key)
+                self.hits += 1
+                self.hit_similarity_sum += similarity
+                return entry.answer, similarity
+
+            for key in list(index["keys"]):
+                if self.entries[key].expires_at < now:
+                    self._remove(self.entries[key])
+                    self.expirations += 1
+            self.misses += 1
+            return None
+
+    def put(self, question, language, user_context, answer):
+        if self.max_entries <= 0 or not answer:
+            return
+        normalized = normalize_question(question)
+        if not normalized:
+            return
+        partition = context_key(language, user_context)
+        key = (partition, normalized)
+        entry = _Entry(
+            key, partition, embed(normalized), negation_count(normalized), answer,
+            normalize_question(context_text((user_context or {}).get("name"))),
+            time.monotonic() + self.ttl,
+        )
+
+        with self.lock:
+            if key in self.entries:
+                self._remove(self.entries[key])
+            self.entries[key] = entry
+            index = self._partition(partition)
+            index["keys"].append(key)
+            index["matrix"] = None
+            while len(self.entries) > self.max_entries:
+                self._remove(next(iter(self.entries.values())))
+                self.evictions += 1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.partitions.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "partitions": len(self.partitions),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl,
+            "threshold": self.threshold,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "mean_hit_similarity": round(self.hit_similarity_sum / self.hits, 4) if self.hits else None,
+        }
+
+# Global instance
+response_cache = SemanticResponseCache()
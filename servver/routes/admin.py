@@ -1,13 +1,21 @@
 from fastapi import APIRouter, UploadFile, File, HTTPException, Depends
 from typing import List
-import pandas as pd
 import io
+import asyncio
 from datetime import datetime
 from models import IrrigationEntry
 from main import db
+from model_registry import registry, FAMILIES, MODEL_REGISTRY_POLL
+from inference_pool import inference_pool
+from prediction_cache import fertilizer_cache, crop_cache
 
 router = APIRouter()
 
+# Cached predictions are only valid for the model version that produced them
+PREDICTION_CACHES = {"fertilizer": fertilizer_cache, "crop": crop_cache}
+# One model switch at a time
+model_switch_lock = asyncio.Lock()
+
 @router.post("/upload-irrigation")
 async def upload_irrigation_schedule(file: UploadFile = File(...)):
     """
@@ -19,6 +27,8 @@ async def upload_irrigation_schedule(file: UploadFile = File(...)):
         raise HTTPException(status_code=400, detail="Invalid file format. Please upload CSV or Excel.")
 
     try:
+        import pandas as pd  # heavy; only needed for uploads
+
         contents = await file.read()
         
         if file.filename.endswith('.csv'):
@@ -124,3 +134,80 @@ async def upload_irrigation_schedule(file: UploadFile = File(...)):
     except Exception as e:
         print(f"Error processing upload: {e}")
         raise HTTPException(status_code=500, detail=f"Failed to process file: {str(e)}")
+
+@router.get("/models")
+async def list_models():
+    """Registered versions of each model family, the active one, and per-version latency."""
+    return registry.describe()
+
+async def _switch_model(family: str, version: str, rollback: bool = False):
+    if family not in FAMILIES:
+        raise HTTPException(status_code=404, detail=f"Unknown model family '{family}'")
+
+    async with model_switch_lock:
+        try:
+            registry.check(family, version)
+        except ValueError as e:
+            raise HTTPException(status_code=404, detail=str(e))
+
+        previous = registry.active[family]
+        try:
+            await _load_version(family, version, rollback=rollback)
+        except (ValueError, RuntimeError) as e:
+            print(f"Error activating {family} model {version}: {e}")
+            raise HTTPException(status_code=500, detail=f"Failed to activate {family} model {version}: {str(e)}")
+
+        return {"success": True, "family": family, "active": version, "previous": previous}
+
+async def _load_version(family, version, rollback=False, persist=True):
+    """Switches this worker to version (raises ValueError/RuntimeError, keeping the old one)."""
+    if inference_pool.executor is not None:
+        # New workers load the version while the current ones keep serving
+        await inference_pool.reload(dict(registry.active_versions(), **{family: version}))
+        registry.activate(family, version, load=False, rollback=rollback, persist=persist)
+    else:
+        await asyncio.get_running_loop().run_in_executor(
+            None, lambda: registry.activate(family, version, rollback=rollback, persist=persist)
+        )
+    PREDICTION_CACHES[family].clear()
+
+async def follow_model_registry():
+    """
+    Runs in every API worker: an activation or rollback is handled by one
+    uvicorn worker, which writes registry.json; the others notice the change
+    here and switch to the same versions.
+    """
+    if MODEL_REGISTRY_POLL <= 0:
+        return
+    while True:
+        await asyncio.sleep(MODEL_REGISTRY_POLL)
+        try:
+            changes = registry.refresh()
+        except Exception as e:
+            print(f"[ModelRegistry] Could not read registry.json: {e}")
+            continue
+        for family, version in changes.items():
+            async with model_switch_lock:
+                if registry.active[family] == version:
+                    continue
+                try:
+                    await _load_version(family, version, persist=False)
+                except (ValueError, RuntimeError) as e:
+                    print(f"Error following {family} model {version}: {e}")
+                    registry.state_mtime = None  # try again on the next poll
+
+@router.post("/models/{family}/activate/{version}")
+async def activate_model(family: str, version: str):
+    """Loads a registered model version in the background and switches traffic to it."""
+    return await _switch_model(family, version)
+
+@router.post("/models/{family}/rollback")
+async def rollback_model(family: str):
+    """Switches back to the version that was active before the current one."""
+    if family not in FAMILIES:
+        raise HTTPException(status_code=404, detail=f"Unknown model family '{family}'")
+    try:
+        version = registry.rollback_target(family)
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return await _switch_model(family, version, rollback=True)
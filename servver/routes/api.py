@@ -1,81 +1,75 @@
 import os
+import re
 from datetime import datetime, timedelta
 
-from fastapi import APIRouter
+from fastapi import APIRouter, Response, HTTPException
 from main import db
 from models import Scheme, ChatSession, ChatMessage, ActiveCrop
 from typing import List, Optional
 from pydantic import BaseModel
-from groq import Groq
 from bson import ObjectId
 from sensor_manager import sensor_manager
+from llm_client import llm_client, chat_metrics, LLM_HEDGE_DEADLINE_MS, LLM_HEDGE_STREAM_DEADLINE_MS
+from response_cache import response_cache
+from chat_context import context_builder, CHAT_CONTEXT_MESSAGES
+from image_pipeline import image_pipeline
 from datetime import datetime
-import aiohttp
-from gtts import gTTS
-import io
-from fastapi.responses import StreamingResponse
+import json
+import time
+import base64
+from fastapi.responses import StreamingResponse, FileResponse
+from tts_cache import tts_cache, voice_for, cache_key
+from scheme_audio import scheme_audio
 
 
-from datetime import datetime
-import pandas as pd
-import joblib
-import numpy as np
-
-# Load ML Model (Load once at startup)
-try:
-    crop_model = joblib.load("models/crop_model.pkl")
-    label_encoder = joblib.load("models/label_encoder.pkl")
-    print("✅ Crop ML Model Loaded")
-except Exception as e:
-    print(f"⚠️ MLA Model Load Failed: {e}")
-    crop_model = None
-    label_encoder = None
-
-    crop_model = None
-    label_encoder = None
+from micro_batcher import crop_batcher, fertilizer_batcher
+from prediction_cache import crop_cache, fertilizer_cache
+from model_loader import current_report
+from inference_pool import inference_pool
 
 router = APIRouter()
 
 # --- TTS Endpoint ---
 @router.get("/chat/tts")
 async def text_to_speech(text: str, lang: str = "en"):
-    try:
-        # Edge TTS requires asyncio
-        import edge_tts
-        
-        # Map languages to Edge TTS voices
-        # List: edge-tts --list-voices
-        voice_map = {
-            "en": "en-US-ChristopherNeural",       # English (US)
-            "hi": "hi-IN-SwaraNeural",             # Hindi
-            "ta": "ta-IN-PallaviNeural",           # Tamil
-            "te": "te-IN-MohanNeural",             # Telugu
-            "kn": "kn-IN-GaganNeural",             # Kannada
-            "ml": "ml-IN-SobhanaNeural",           # Malayalam
-            "bn": "bn-IN-BashkarNeural",           # Bengali
-            "gu": "gu-IN-DhwaniNeural",            # Gujarati
-            "mr": "mr-IN-AarohiNeural",            # Marathi
-            "ur": "ur-IN-GulshanNeural"            # Urdu
-        }
-        
-        selected_voice = voice_map.get(lang, "en-US-ChristopherNeural")
-        
-        communicate = edge_tts.Communicate(text, selected_voice)
-        
-        # Save to memory buffer
-        # EdgeTTS writes async to file, but we can iterate chunks
-        buffer = io.BytesIO()
-        async for chunk in communicate.stream():
-            if chunk["type"] == "audio":
-                buffer.write(chunk["data"])
-                
-        buffer.seek(0)
-        return StreamingResponse(buffer, media_type="audio/mp3")
+    voice = voice_for(lang)
+    key = cache_key(text, voice)
+    headers = {"ETag": f'"{key}"', "Cache-Control": "public, max-age=86400"}
+
+    # Same text and voice as before: serve the file, no synthesis
+    path = tts_cache.lookup(key)
+    if path:
+        return FileResponse(path, media_type="audio/mp3", headers=dict(headers, **{"X-TTS-Cache": "hit"}))
 
+    try:
+        # Stream audio to the client as edge_tts produces it (cached once complete).
+        # The first chunk is awaited here so a synthesis error still returns JSON.
+        chunks = tts_cache.synthesize(text, voice, key)
+        first = await chunks.__anext__()
     except Exception as e:
         print(f"TTS Error: {e}")
         return {"error": str(e)}
 
+    async def audio():
+        try:
+            yield first
+            async for chunk in chunks:
+                yield chunk
+        except Exception as e:
+            print(f"TTS Error: {e}")
+        finally:
+            await chunks.aclose()
+
+    return StreamingResponse(audio(), media_type="audio/mp3", headers=dict(headers, **{"X-TTS-Cache": "miss"}))
+
+@router.get("/chat/tts/{key}.mp3")
+async def get_tts_clip(key: str):
+    """A clip from the TTS cache by key, e.g. the audio_url of a scheme card."""
+    path = tts_cache.lookup(key) if re.fullmatch(r"[0-9a-f]{64}", key) else None
+    if not path:
+        raise HTTPException(status_code=404, detail="Audio not found")
+    return FileResponse(path, media_type="audio/mp3", headers={"ETag": f'"{key}"', "Cache-Control": "public, max-age=604800, immutable"})
+
 # --- Sensors ---
 @router.get("/sensors/live")
 async def get_live_sensors():
@@ -99,12 +93,62 @@ class ChatRequest(BaseModel):
 
 # --- Chatbot Routes ---
 
+# Length of the last-message preview stored on the session for the history list
+CHAT_PREVIEW_LENGTH = 50
+# Cap on stored messages per session, oldest dropped first (0 = keep everything)
+CHAT_MAX_STORED_MESSAGES = int(os.getenv("CHAT_MAX_STORED_MESSAGES", "0"))
+
+def _encode_history_cursor(session):
+    raw = f"{session['updatedAt'].isoformat()}|{session['_id']}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def _decode_history_cursor(cursor):
+    updated_at, session_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+    return datetime.fromisoformat(updated_at), ObjectId(session_id)
+
+async def _backfill_previews(sessions):
+    """Sessions written before lastMessagePreview existed: read their last message once and store the preview."""
+    missing = [s["_id"] for s in sessions if "lastMessagePreview" not in s]
+    if not missing:
+        return
+    previews = {}
+    async for s in db.chat_sessions.find({"_id": {"$in": missing}}, {"messages": {"$slice": -1}}):
+        previews[s["_id"]] = s["messages"][-1]["content"][:CHAT_PREVIEW_LENGTH] if s.get("messages") else None
+    for s in sessions:
+        if s["_id"] in previews:
+            s["lastMessagePreview"] = previews[s["_id"]]
+            await db.chat_sessions.update_one({"_id": s["_id"]}, {"$set": {"lastMessagePreview": previews[s["_id"]]}})
+
 @router.get("/chat/history")
-async def get_chat_history(userId: str):
-    """Get list of chat sessions for a user"""
+async def get_chat_history(userId: str, response: Response, limit: int = 50, cursor: Optional[str] = None):
+    """
+    Get list of chat sessions for a user, newest first.
+    Reads only the listing fields (served by the {userId, updatedAt} index).
+    When there are more, the X-Next-Cursor header holds the value to pass
+    as ?cursor= for the next page.
+    """
+    limit = max(1, min(limit, 100))
+    query = {"userId": userId}
+    if cursor:
+        try:
+            updated_at, last_id = _decode_history_cursor(cursor)
+        except Exception:
+            return {"error": "Invalid cursor"}
+        # Keyset pagination: strictly after the last session of the previous page
+        query["$or"] = [
+            {"updatedAt": {"$lt": updated_at}},
+            {"updatedAt": updated_at, "_id": {"$lt": last_id}},
+        ]
+
     sessions = await db.chat_sessions.find(
-        {"userId": userId}
-    ).sort("updatedAt", -1).to_list(50)
+        query,
+        {"title": 1, "updatedAt": 1, "lastMessagePreview": 1}
+    ).sort([("updatedAt", -1), ("_id", -1)]).limit(limit + 1).to_list(limit + 1)
+
+    if len(sessions) > limit:
+        sessions = sessions[:limit]
+        response.headers["X-Next-Cursor"] = _encode_history_cursor(sessions[-1])
+    await _backfill_previews(sessions)
     
     # Return simplified list
     return [
@@ -112,7 +156,7 @@ async def get_chat_history(userId: str):
             "id": str(s["_id"]),
             "title": s.get("title", "New Chat"),
             "date": s.get("updatedAt"),
-            "preview": s["messages"][-1]["content"][:50] if s.get("messages") else "Empty chat"
+            "preview": s.get("lastMessagePreview") or "Empty chat"
         }
         for s in sessions
     ]
@@ -131,144 +175,252 @@ async def get_chat_session(session_id: str):
     except Exception as e:
         return {"error": str(e)}
 
-@router.post("/chat")
-async def chat(payload: ChatRequest):
+async def _load_session(session_id, user_id, message):
+    """
+    Existing session by id (with only the last CHAT_CONTEXT_MESSAGES messages
+    loaded), or a new one (also for invalid/unknown ids).
+    """
+    if session_id:
+        try:
+            session_data = await db.chat_sessions.find_one(
+                {"_id": ObjectId(session_id)},
+                {"messages": {"$slice": -CHAT_CONTEXT_MESSAGES}},
+            )
+            if session_data:
+                return ChatSession(**session_data)
+        except:
+            pass
+    # Invalid ID, create new
+    return ChatSession(userId=user_id, title=message[:30]+"...")
+
+def _build_messages(session, payload: ChatRequest):
+    """System prompt + recent history (within the token budget) + the current message, and the models to try in order."""
     message = payload.message
-    language = payload.language
     image = payload.image
-    user_id = payload.userId
-    session_id = payload.sessionId
-    user_context = payload.userContext
 
+    # Current message (with the image for the vision model)
+    if image:
+        current = [
+            {"type": "text", "text": message or "What is in this image?"},
+            {"type": "image_url", "image_url": {"url": image}},
+        ]
+    else:
+        current = message
+
+    # History before the current message (the session already has it appended)
+    history = [{"role": m.role, "content": m.content} for m in session.messages[-(CHAT_CONTEXT_MESSAGES + 1):-1]]
+    messages_for_ai, tokens = context_builder.build(payload.userId, payload.language, payload.userContext, history, current)
+    print(f"[Chat] {payload.userId}: prompt ~{tokens['total']} tokens (system {tokens['system']}, "
+          f"history {tokens['history']} in {tokens['history_messages']} messages, {tokens['dropped_messages']} dropped, "
+          f"message {tokens['message']})")
+
+    model_names = ["llama-3.3-70b-versatile", "llama3-8b-8192", "mixtral-8x7b-32768"]
+    if image:
+        model_names.insert(0, "llama-3.2-11b-vision-preview")
+    return messages_for_ai, model_names
+
+def _messages_for_model(messages_for_ai, model_name, payload: ChatRequest):
+    # Text-only fallback logic
+    current_messages = list(messages_for_ai)
+    if payload.image and "vision" not in model_name:
+         # Remove image block
+         current_messages[-1] = {"role": "user", "content": f"{payload.message} [User sent image, but model cannot see it]"}
+    return current_messages
+
+async def _save_session(session, text_reply):
+    """
+    Writes this turn (the user message already on the session + the reply).
+    Existing sessions get the two messages $push'ed instead of the whole
+    document rewritten. Returns the session id.
+    """
+    # 5. Save Bot Response
+    bot_msg = ChatMessage(role="assistant", content=text_reply)
+    session.messages.append(bot_msg)
+    session.updatedAt = datetime.utcnow()
+    session.lastMessagePreview = text_reply[:CHAT_PREVIEW_LENGTH]
+
+    # 6. Write to DB
+    if session.id:
+        push = {"$each": [m.model_dump() for m in session.messages[-2:]]}
+        if CHAT_MAX_STORED_MESSAGES > 0:
+            push["$slice"] = -CHAT_MAX_STORED_MESSAGES  # keep only the newest messages
+        await db.chat_sessions.update_one(
+            {"_id": ObjectId(session.id)},
+            {"$push": {"messages": push}, "$set": {"updatedAt": session.updatedAt, "lastMessagePreview": session.lastMessagePreview}}
+        )
+        return session.id
+    else:
+        # Convert Pydantic model to dict for Mongo
+        session_dict = session.model_dump(by_alias=True, exclude={"id"})
+        result = await db.chat_sessions.insert_one(session_dict)
+        return str(result.inserted_id)
+
+def _is_cacheable(session, payload: ChatRequest):
+    """Only the first text message of a session: follow-ups depend on the conversation, images on the image."""
+    return not payload.image and len(session.messages) == 1
+
+def _cached_reply(session, payload: ChatRequest):
+    """A cached answer to a near-identical question asked in the same context, or None."""
+    if not _is_cacheable(session, payload):
+        return None
     try:
-        api_key = os.getenv("GROQ_API_KEY")
-        if not api_key or "YOUR_GROQ_API_KEY" in api_key:
-            return {"reply": "⚠️ **Setup Required**: Please set your Groq API Key in the `server/.env` file."}
+        hit = response_cache.get(payload.message, payload.language, payload.userContext)
+    except Exception as e:
+        # The cache is an optimization: on any failure the models answer
+        print(f"[ResponseCache] Lookup failed: {e}")
+        return None
+    return hit[0] if hit else None
 
-        client = Groq(api_key=api_key)
+def _remember_reply(session, payload: ChatRequest, text):
+    if not _is_cacheable(session, payload):
+        return
+    try:
+        response_cache.put(payload.message, payload.language, payload.userContext, text)
+    except Exception as e:
+        print(f"[ResponseCache] Store failed: {e}")
 
-        # 1. Handle Session
-        if session_id:
-            try:
-                session_data = await db.chat_sessions.find_one({"_id": ObjectId(session_id)})
-                if session_data:
-                    session = ChatSession(**session_data)
-                else:
-                    # Invalid ID, create new
-                    session = ChatSession(userId=user_id, title=message[:30]+"...")
-            except:
-                session = ChatSession(userId=user_id, title=message[:30]+"...")
-        else:
-            session = ChatSession(userId=user_id, title=message[:30]+"...")
-        
-        # 2. Add User Message to History
-        user_msg = ChatMessage(role="user", content=message)
-        session.messages.append(user_msg)
+async def _cached_pieces(text):
+    yield "cache", text
 
-        # 3. Construct Context for AI
-        system_context = f"""You are "MITRON", a helpful and expert farming assistant. 
-        Context: User language is {language}.
-        Task: Answer the user's question about agriculture, crops, weather, or the provided image.
-        Style: Simple, encouraging, expert advice. Respond in the user's language if specified."""
-
-        # Inject User Profile & Soil Data if available
-        if user_context:
-            system_context += f"\n\n--- FARMER PROFILE ---\n"
-            system_context += f"Name: {user_context.get('name', 'Farmer')}\n"
-            system_context += f"Location: {user_context.get('location', 'Unknown')}\n"
-            
-            if 'soil' in user_context:
-                s = user_context['soil']
-                system_context += f"Soil Type: {s.get('type', 'N/A')}\n"
-                system_context += f"Land Size: {s.get('landSize', 'N/A')}\n"
-                system_context += f"Water Source: {s.get('waterSource', 'N/A')}\n"
-            
-            if 'sensors' in user_context:
-                sn = user_context['sensors']
-                system_context += f"\n--- REAL-TIME SOIL SENSORS (Live Data) ---\n"
-                system_context += f"Soil pH: {sn.get('ph', 'N/A')} (Ideal: 6.5-7.5)\n"
-                system_context += f"Nitrogen (N): {sn.get('n', 'N/A')} mg/kg\n"
-                system_context += f"Phosphorus (P): {sn.get('p', 'N/A')} mg/kg\n"
-                system_context += f"Potassium (K): {sn.get('k', 'N/A')} mg/kg\n"
-                system_context += f"Soil Moisture: {sn.get('moisture', 'N/A')}%\n"
-                system_context += f"Note: Use these sensor values to give specific fertilizer or irrigation advice."
-
-        messages_for_ai = [{"role": "system", "content": system_context}]
-        
-        # Add recent history (last 5 messages) for context
-        # (excluding the one we just added to keep logic clean, or include it)
-        # OpenAI/Groq expects alternating user/assistant.
-        for existing_msg in session.messages[-6:-1]: # Last 5 before current
-             messages_for_ai.append({"role": existing_msg.role, "content": existing_msg.content})
-        
-        # Add current message
-        if image:
-            messages_for_ai.append({
-                "role": "user",
-                "content": [
-                    {"type": "text", "text": message or "What is in this image?"},
-                    {"type": "image_url", "image_url": {"url": image}},
-                ]
-            })
-        else:
-            messages_for_ai.append({"role": "user", "content": message})
+def _llm_unavailable():
+    api_key = os.getenv("GROQ_API_KEY")
+    return not api_key or "YOUR_GROQ_API_KEY" in api_key
 
+SETUP_REQUIRED_REPLY = "⚠️ **Setup Required**: Please set your Groq API Key in the `server/.env` file."
 
-        # 4. Call AI
-        model_names = ["llama-3.3-70b-versatile", "llama3-8b-8192", "mixtral-8x7b-32768"]
-        if image:
-            model_names.insert(0, "llama-3.2-11b-vision-preview")
+@router.post("/chat")
+async def chat(payload: ChatRequest):
+    started = time.perf_counter()
+    try:
+        if _llm_unavailable():
+            return {"reply": SETUP_REQUIRED_REPLY}
 
-        text_reply = None
-        errors = []
+        # Downsized, re-encoded photo (raises ImageError for unusable ones)
+        payload.image = await image_pipeline.prepare(payload.image)
 
-        for model_name in model_names:
-            try:
-                # Text-only fallback logic
-                current_messages = list(messages_for_ai)
-                if image and "vision" not in model_name:
-                     # Remove image block
-                     current_messages[-1] = {"role": "user", "content": f"{message} [User sent image, but model cannot see it]"}
+        # 1. Handle Session
+        session = await _load_session(payload.sessionId, payload.userId, payload.message)
+        
+        # 2. Add User Message to History
+        user_msg = ChatMessage(role="user", content=payload.message)
+        session.messages.append(user_msg)
 
-                completion = client.chat.completions.create(
-                    messages=current_messages,
-                    model=model_name,
+        messages_for_ai, model_names = _build_messages(session, payload)
+
+        # 4. Call AI (hedged: a slow model gets company from the next one, first good answer wins)
+        try:
+            text_reply = _cached_reply(session, payload)
+            if text_reply is not None:
+                model_name = "cache"
+            else:
+                model_name, text_reply = await llm_client.complete_hedged(
+                    lambda model: _messages_for_model(messages_for_ai, model, payload),
+                    model_names,
+                    # Only the vision model can see the image: the others are a fallback if it fails, never a hedge
+                    keep_first=bool(payload.image),
+                    deadline_ms=None if payload.image else LLM_HEDGE_DEADLINE_MS,
                 )
-                
-                text_reply = completion.choices[0].message.content
-                if text_reply:
-                    break
-            except Exception as e:
-                errors.append(f"{model_name}: {e}")
-
-        if not text_reply:
+                _remember_reply(session, payload, text_reply)
+            chat_metrics.record(model_name, streamed=False, first_byte_seconds=time.perf_counter() - started)
+        except RuntimeError as e:
+            print(f"Groq API Error: {e}")
+            chat_metrics.record_failure(streamed=False)
             text_reply = f"❌ **Error**: All models failed."
 
-        # 5. Save Bot Response
-        bot_msg = ChatMessage(role="assistant", content=text_reply)
-        session.messages.append(bot_msg)
-        session.updatedAt = datetime.utcnow()
-
-        # 6. Write to DB
-        # Convert Pydantic model to dict for Mongo
-        session_dict = session.model_dump(by_alias=True, exclude={"id"})
-        
-        if session_id and ObjectId.is_valid(session_id):
-            await db.chat_sessions.update_one(
-                {"_id": ObjectId(session_id)},
-                {"$set": session_dict}
-            )
-            final_id = session_id
-        else:
-            result = await db.chat_sessions.insert_one(session_dict)
-            final_id = str(result.inserted_id)
-
+        final_id = await _save_session(session, text_reply)
         return {"reply": text_reply, "sessionId": final_id}
 
     except Exception as e:
         print(f"Groq API Error: {e}")
         return {"reply": f"❌ **Error**: {str(e)}."}
 
+def _sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+@router.post("/chat/stream")
+async def chat_stream(payload: ChatRequest):
+    """
+    Same as /chat, but forwards the reply as Server-Sent Events while the LLM
+    generates it (models are hedged on their first token):
+      event: token  data: {"text": "..."}            (repeated)
+      event: done   data: {"sessionId": "...", "model": "..."}
+      event: error  data: {"error": "..."}
+    The session (user message + full reply) is written only after the last
+    token; a failed or abandoned stream leaves it unchanged.
+    """
+    started = time.perf_counter()
+
+    async def events():
+        if _llm_unavailable():
+            yield _sse("token", {"text": SETUP_REQUIRED_REPLY})
+            yield _sse("done", {"sessionId": payload.sessionId})
+            return
+
+        try:
+            payload.image = await image_pipeline.prepare(payload.image)
+            session = await _load_session(payload.sessionId, payload.userId, payload.message)
+            session.messages.append(ChatMessage(role="user", content=payload.message))
+            messages_for_ai, model_names = _build_messages(session, payload)
+        except Exception as e:
+            print(f"Chat Stream Error: {e}")
+            yield _sse("error", {"error": str(e)})
+            return
+
+        cached = _cached_reply(session, payload)
+        if cached is not None:
+            pieces = _cached_pieces(cached)
+        else:
+            pieces = llm_client.stream_hedged(
+                lambda model: _messages_for_model(messages_for_ai, model, payload),
+                model_names,
+                # Only the vision model can see the image: the others are a fallback if it fails, never a hedge
+                keep_first=bool(payload.image),
+                deadline_ms=None if payload.image else LLM_HEDGE_STREAM_DEADLINE_MS,
+            )
+
+        parts = []
+        model_name = None
+        try:
+            async for model_name, text in pieces:
+                if not parts:
+                    chat_metrics.record(model_name, streamed=True, first_byte_seconds=time.perf_counter() - started)
+                parts.append(text)
+                yield _sse("token", {"text": text})
+        except Exception as e:
+            print(f"Chat Stream Error ({model_name}): {e}")
+            if not parts:
+                chat_metrics.record_failure(streamed=True)
+                yield _sse("error", {"error": "All models failed.", "details": str(e)})
+            else:
+                # Tokens already reached the client; don't splice in another model's answer
+                yield _sse("error", {"error": f"{model_name}: {e}"})
+            return
+
+        if cached is None:
+            _remember_reply(session, payload, "".join(parts))
+
+        try:
+            final_id = await _save_session(session, "".join(parts))
+        except Exception as e:
+            print(f"Chat Stream Error: {e}")
+            yield _sse("error", {"error": str(e)})
+            return
+        yield _sse("done", {"sessionId": final_id, "model": model_name})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        # No caching or proxy buffering, or tokens arrive all at once
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@router.get("/chat/stats")
+async def get_chat_stats():
+    """Time to first byte of chat replies (the first token for /chat/stream, the whole reply for /chat), model health, prompt sizes, images, response cache, TTS cache and scheme audio pre-synthesis."""
+    return dict(chat_metrics.stats(), health=llm_client.health.stats(), context=context_builder.stats(),
+                images=image_pipeline.stats(), response_cache=response_cache.stats(),
+                tts_cache=tts_cache.stats(), scheme_audio=scheme_audio.stats())
+
 # --- Weather (NASA Power) ---
 @router.get("/weather/rainfall")
 async def get_rainfall(lat: float, lon: float):
@@ -282,6 +434,8 @@ async def get_rainfall(lat: float, lon: float):
         
         url = f"https://power.larc.nasa.gov/api/temporal/daily/point?parameters=PRECTOTCORR&community=AG&longitude={lon}&latitude={lat}&start={start_str}&end={end_str}&format=JSON"
         
+        import aiohttp
+
         async with aiohttp.ClientSession() as session:
             async with session.get(url) as response:
                 if response.status != 200:
@@ -330,49 +484,42 @@ class CropPredictionRequest(BaseModel):
 
 @router.post("/ml/recommend")
 async def recommend_crops(data: CropPredictionRequest):
-    if not crop_model or not label_encoder:
-        return {"error": "Model not loaded", "crops": []}
-
-    try:
-        # Prepare Input
-        input_data = pd.DataFrame([{
-            "N": data.N,
-            "P": data.P,
-            "K": data.K,
-            "temperature": data.temperature,
-            "humidity": data.humidity,
-            "ph": data.ph,
-            "rainfall": data.rainfall
-        }])
-        
-        # Ensure column order
-        # input_data = input_data[crop_model.feature_names_in_] 
-        # (Assuming model was trained with these exact names, usually safe to just pass DF if names match)
-
-        # Get Probabilities
-        proba = crop_model.predict_proba(input_data)[0]
-        
-        # Get Top 5 Indices
-        top_5_indices = np.argsort(proba)[-5:][::-1]
-        
-        # Get Class Names and Scores
-        recommendations = []
-        classes = label_encoder.classes_
-        
-        for idx in top_5_indices:
-            crop_name = classes[idx]
-            score = proba[idx] * 100 # Percentage
-            if score > 0: # Only include if some probability
-                recommendations.append({
-                    "name": crop_name,
-                    "confidence": round(score, 1)
-                })
-        
-        return {"crops": recommendations}
-
-    except Exception as e:
-        print(f"ML Prediction Error: {e}")
-        return {"error": str(e), "crops": []}
+    # Near-identical sensor readings share a cached prediction
+    key, features = crop_cache.quantize(data.model_dump())
+    result = crop_cache.get(key)
+    if result is None:
+        try:
+            # Concurrent requests are micro-batched into one predict_proba in the inference pool
+            result = await crop_batcher.submit(features)
+        except Exception as e:
+            # e.g. BrokenProcessPool after the pool's one restart
+            print(f"ML Prediction Error: {e}")
+            return {"error": str(e), "crops": []}
+        if "error" not in result:
+            crop_cache.put(key, result)
+    return result
+
+@router.get("/ml/stats")
+async def get_ml_stats():
+    """
+    Micro-batching (batch sizes, queue delay), prediction cache and model load
+    metrics: cold-start time, backends and RSS of the API process and of each
+    inference worker (where the models live when the pool is on).
+    """
+    return {
+        "models": {
+            "api": current_report(),
+            "workers": await inference_pool.reports(),
+        },
+        "batching": {
+            "crop": crop_batcher.stats(),
+            "fertilizer": fertilizer_batcher.stats()
+        },
+        "cache": {
+            "crop": crop_cache.stats(),
+            "fertilizer": fertilizer_cache.stats()
+        }
+    }
 
 @router.post("/soil-analysis")
 async def soil_analysis(payload: dict):
@@ -1,8 +1,14 @@
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
+import time
+import asyncio
 
-from recommender import recommend
+from recommender import recommend_batch
+from inference_pool import inference_pool
+from model_registry import registry
+from micro_batcher import fertilizer_batcher
+from prediction_cache import fertilizer_cache
 from explanation_layer import explain_recommendation
 from impact_warning import generate_warning
 from calendar_logic import generate_schedule
@@ -10,6 +16,9 @@ from weather_adjustment import weather_adjustment
 
 router = APIRouter()
 
+# Upper bound on rows per batch call (a large village soil health card export)
+MAX_BATCH_ROWS = 10000
+
 class SoilInput(BaseModel):
     crop: str
     soil_type: str
@@ -26,65 +35,110 @@ class SoilInput(BaseModel):
     weather: Optional[Dict[str, Any]] = None 
     # Example: {"rain": True, "temperature": 30, "humidity": 80}
 
+def _to_input_data(data: SoilInput):
+    # Prepare input dict for recommender
+    return {
+        "crop": data.crop,
+        "soil_type": data.soil_type,
+        "ph": data.ph,
+        "nitrogen": data.nitrogen,
+        "phosphorus": data.phosphorus,
+        "potassium": data.potassium,
+        "temperature": data.temperature,
+        "humidity": data.humidity,
+        "moisture": data.moisture
+    }
+
+def _build_response(data: SoilInput, result: dict):
+    # 2. Prepare Soil Status for Explanation
+    # Simple logic to determine Low/Adequate based on generic thresholds
+    # These thresholds should ideally be crop-specific but generic is fine for explanation MVP
+    soil_status = {
+        "ph": data.ph,
+        "N_status": "Low" if data.nitrogen < 120 else "Adequate", # Example threshold
+        "P_status": "Low" if data.phosphorus < 20 else "Adequate",
+        "K_status": "Low" if data.potassium < 30 else "Adequate"
+    }
+
+    # 3. Generate Farmer-Friendly Explanation
+    explanation = explain_recommendation(
+        data.crop,
+        soil_status,
+        result.get("organic", {}),
+        result.get("chemical", {})
+    )
+
+    # 4. Generate Impact Warnings
+    warnings = generate_warning(data.crop, soil_status)
+
+    # 5. Generate Application Schedule
+    schedule = generate_schedule(data.crop)
+
+    # 6. Generate Weather Advisory
+    advisory = weather_adjustment(data.weather)
+
+    return {
+        "crop": data.crop,
+        "confidence": result.get("confidence", 0),
+        "recommendation": result,
+        "farmer_explanation": explanation,
+        "if_not_applied": warnings,
+        "application_schedule": schedule,
+        "weather_advisory": advisory
+    }
+
+def _build_responses(rows: List[SoilInput], results: List[dict]):
+    return [_build_response(data, result) for data, result in zip(rows, results)]
+
 @router.post("/fertilizer-recommendation")
-def get_recommendation(data: SoilInput):
+async def get_recommendation(data: SoilInput):
     try:
-        # Prepare input dict for recommender
-        input_data = {
-            "crop": data.crop,
-            "soil_type": data.soil_type,
-            "ph": data.ph,
-            "nitrogen": data.nitrogen,
-            "phosphorus": data.phosphorus,
-            "potassium": data.potassium,
-            "temperature": data.temperature,
-            "humidity": data.humidity,
-            "moisture": data.moisture
-        }
+        # Near-identical sensor readings share a cached prediction
+        key, input_data = fertilizer_cache.quantize(_to_input_data(data))
+        result = fertilizer_cache.get(key)
 
-        # 1. Get ML Recommendation
-        result = recommend(input_data)
+        if result is None:
+            # 1. Get ML Recommendation (micro-batched with concurrent requests, runs in the inference pool)
+            result = await fertilizer_batcher.submit(input_data)
         
-        if "error" in result:
-             raise HTTPException(status_code=500, detail=result["error"])
-
-        # 2. Prepare Soil Status for Explanation
-        # Simple logic to determine Low/Adequate based on generic thresholds
-        # These thresholds should ideally be crop-specific but generic is fine for explanation MVP
-        soil_status = {
-            "ph": data.ph,
-            "N_status": "Low" if data.nitrogen < 120 else "Adequate", # Example threshold
-            "P_status": "Low" if data.phosphorus < 20 else "Adequate",
-            "K_status": "Low" if data.potassium < 30 else "Adequate"
-        }
+            if "error" in result:
+                 raise HTTPException(status_code=500, detail=result["error"])
 
-        # 3. Generate Farmer-Friendly Explanation
-        explanation = explain_recommendation(
-            data.crop,
-            soil_status,
-            result.get("organic", {}),
-            result.get("chemical", {})
-        )
+            fertilizer_cache.put(key, result)
 
-        # 4. Generate Impact Warnings
-        warnings = generate_warning(data.crop, soil_status)
+        return _build_response(data, result)
 
-        # 5. Generate Application Schedule
-        schedule = generate_schedule(data.crop)
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/fertilizer-recommendation/batch")
+async def get_batch_recommendation(rows: List[SoilInput]):
+    """
+    Scores many soil samples in one call. All rows go through a single
+    predict_proba, and the response keeps the order of the request.
+    """
+    if len(rows) > MAX_BATCH_ROWS:
+        raise HTTPException(status_code=413, detail=f"Batch too large (max {MAX_BATCH_ROWS} rows)")
+
+    try:
+        version = registry.active["fertilizer"]
+        started = time.perf_counter()
+        results = await inference_pool.run(recommend_batch, [_to_input_data(r) for r in rows])
+        registry.record("fertilizer", version, time.perf_counter() - started, len(rows), error=isinstance(results, dict))
 
-        # 6. Generate Weather Advisory
-        advisory = weather_adjustment(data.weather)
+        if isinstance(results, dict) and "error" in results:
+             raise HTTPException(status_code=500, detail=results["error"])
 
+        # Explanations, warnings and schedules for up to MAX_BATCH_ROWS rows: off the event loop
         return {
-            "crop": data.crop,
-            "confidence": result.get("confidence", 0),
-            "recommendation": result,
-            "farmer_explanation": explanation,
-            "if_not_applied": warnings,
-            "application_schedule": schedule,
-            "weather_advisory": advisory
+            "count": len(results),
+            "results": await asyncio.to_thread(_build_responses, rows, results)
         }
 
+    except HTTPException:
+        raise
     except Exception as e:
         import traceback
         traceback.print_exc()
@@ -1,12 +1,25 @@
-import requests
-from bs4 import BeautifulSoup
 from fastapi import APIRouter
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
 from typing import List, Optional
-import concurrent.futures
+import os
 import re
+import json
+import time
+import asyncio
+
+from market_client import market_client, PageBatch
+from price_cache import price_cache
+from price_history import price_history, INTERVALS, LEVELS
+from price_parser import parse_price_page
 
 router = APIRouter()
 
+# Most (state, district) pairs one POST /prices/bulk may ask for
+MARKET_BULK_MAX_LOCATIONS = int(os.getenv("MARKET_BULK_MAX_LOCATIONS", "100"))
+# How long the District page may take before the State page (the fallback) is requested alongside it
+MARKET_STATE_HEDGE_MS = float(os.getenv("MARKET_STATE_HEDGE_MS", "150"))
+
 # Commodities to fetch
 COMMODITIES = [
     {"id": "rice", "name": "Rice", "slug": "rice"},
@@ -29,112 +42,93 @@ def clean_price(price_str):
     except:
         return 0
 
-def fetch_commodity_price(commodity, state, district):
+async def fetch_commodity_price(commodity, state, district, pages=None):
     """
     Fetches price for a single commodity from CommodityOnline.
-    Tries District URL first, then State URL.
+    The District price is used if that page exists, the State price
+    otherwise. The State page is requested once the District page has
+    failed, or has taken more than MARKET_STATE_HEDGE_MS while the client
+    has free request slots, so a District hit costs a single request
+    unless it is slow and the site isn't already busy with our requests.
+    pages: a PageBatch to share page requests with the rest of a bulk call.
     """
     state_slug = state.lower().replace(" ", "-")
     district_slug = district.lower().replace(" ", "-")
     
-    # Try District Level
-    url = f"https://www.commodityonline.com/mandiprices/{commodity['slug']}/{state_slug}/{district_slug}"
-    
+    get_page = pages.get_page if pages is not None else market_client.get_page
+    state_path = f"/mandiprices/{commodity['slug']}/{state_slug}"
+    district_page = asyncio.ensure_future(get_page(f"{state_path}/{district_slug}"))
+    state_page = None
     try:
-        headers = {'User-Agent': 'Mozilla/5.0'}
-        response = requests.get(url, headers=headers, timeout=3)
-        
-        if response.status_code != 200:
+        # Try District Level; hedge with the State page if it is slow
+        await asyncio.wait([district_page], timeout=MARKET_STATE_HEDGE_MS / 1000)
+        if not district_page.done() and not market_client.saturated():
+            state_page = asyncio.ensure_future(get_page(state_path))
+        status, html = await district_page
+        at_district = status == 200
+        if not at_district:
             # Fallback to State Level
-            url = f"https://www.commodityonline.com/mandiprices/{commodity['slug']}/{state_slug}"
-            response = requests.get(url, headers=headers, timeout=3)
-            
-        if response.status_code == 200:
-            soup = BeautifulSoup(response.text, 'html.parser')
-            if response.status_code == 200:
-                soup = BeautifulSoup(response.text, 'html.parser')
-                tables = soup.find_all('table')
-                
-                target_table = None
-                
-                # Smart Table Search: Find the table that looks like a Price Table
-                for table in tables:
-                    # Check headers
-                    headers = [th.get_text().strip().lower() for th in table.find_all('th')]
-                    header_text = " ".join(headers)
-                    
-                    if "market" in header_text and "price" in header_text:
-                        target_table = table
-                        break
-                
-                # Fallback: If no smart match, try the second table (often the main one) or first if only 1
-                if not target_table and len(tables) > 0:
-                    target_table = tables[1] if len(tables) > 1 else tables[0]
-
-                if target_table:
-                    # Assuming standard structure: Date | ... | Price | ...
-                    # We usually want the first row of data
-                    rows = target_table.find_all('tr')
-                    if len(rows) > 1:
-                        # Find the first valid data row (sometimes row 1 is empty or filter)
-                         cells = rows[1].find_all('td')
-                    # Heuristic: Pick the highest number in the row that looks like a price
-                    # usually col 3 or 4
-                    potential_prices = []
-                    for cell in cells:
-                        text = cell.get_text().strip()
-                        # Find all numbers in the text (integer or float)
-                        matches = re.findall(r'\b\d+(?:[\.,]\d+)?\b', text)
-                        for match in matches:
-                            try:
-                                # Replace comma if present (e.g. 1,200)
-                                val = float(match.replace(',', ''))
-                                # Filter Sanity Check for Quintal Prices:
-                                # - Must be > 100 (exclude small numbers/dates like 1, 31)
-                                # - Must be < 30000 (exclude massive concatenated dates like 20241225)
-                                if 100 < val < 30000:
-                                    potential_prices.append(val)
-                            except:
-                                continue
-                    
-                    if potential_prices:
-                        # Max price is usually a safe bet for "Model Price" or "Max Price"
-                        # Max price is usually a safe bet for "Model Price" or "Max Price"
-                        price_per_quintal = max(potential_prices)
-                        price_per_kg = round(price_per_quintal / 100, 2)
-                        
-                        return {
-                            "commodity": commodity['id'],
-                            "name": commodity['name'],
-                            "price": price_per_kg,
-                            "change": 0, # Cannot calculate change easily without history
-                            "unit": "₹/kg",
-                            "market": f"{district} Mandi" if district_slug in url else f"{state} Avg",
-                            "grade": "FAQ"
-                        }
+            state_page = state_page or asyncio.ensure_future(get_page(state_path))
+            status, html = await state_page
+    finally:
+        district_page.cancel()
+        if state_page is not None:
+            state_page.cancel()
+
+    if html is None:
+        return None
+    try:
+        price_per_quintal = await asyncio.to_thread(parse_price_page, html)
     except Exception as e:
-        print(f"Error fetching {commodity['name']}: {e}")
-        
-    return None
+        print(f"Error parsing {commodity['name']}: {e}")
+        return None
+    if price_per_quintal is None:
+        return None
+
+    return {
+        "commodity": commodity['id'],
+        "name": commodity['name'],
+        "price": round(price_per_quintal / 100, 2),
+        "change": 0, # Set from the price history (or price_cache's previous price)
+        "unit": "₹/kg",
+        "market": f"{district} Mandi" if at_district else f"{state} Avg",
+        "level": "district" if at_district else "state",
+        "grade": "FAQ"
+    }
+
+async def scrape_price(commodity, state, district, pages=None):
+    """
+    fetch_commodity_price, with the price recorded in the price history and
+    "change" set against the last price of the same level (district mandi
+    or state average) from an earlier day.
+    """
+    row = await fetch_commodity_price(commodity, state, district, pages)
+    if row:
+        previous = await price_history.previous_close(commodity["id"], state, district, row["level"])
+        await price_history.record(row, state, district)
+        if previous:
+            row["change"] = round(row["price"] - previous["price"], 2)
+            row["change_since"] = previous["date"]
+    return row
+
+async def fetch_all_prices(state, district, pages=None):
+    """
+    Prices of all COMMODITIES that could be found, in COMMODITIES order.
+    Served from price_cache (stale prices are refreshed in the background).
+    """
+    results = await asyncio.gather(*(
+        price_cache.get(state, district, c, lambda c=c: scrape_price(c, state, district, pages))
+        for c in COMMODITIES
+    ))
+    return [r for r in results if r]
 
 @router.get("/prices")
 async def get_market_prices(state: str = "Tamil Nadu", district: str = "Madurai"):
     """
-    Returns real-time market prices scraped from the web.
+    Returns market prices scraped from the web, cached per (state, district,
+    commodity). Each row has age_seconds/updated_at of its price.
     """
-    results = []
-    
-    # Use ThreadPool to fetch concurrently to minimize wait time
-    with concurrent.futures.ThreadPoolExecutor(max_workers=5) as executor:
-        future_to_commodity = {
-            executor.submit(fetch_commodity_price, c, state, district): c 
-            for c in COMMODITIES
-        }
-        
-        for future in concurrent.futures.as_completed(future_to_commodity):
-            data = future.result()
-            if data:
-                results.append(data)
+    results = await fetch_all_prices(state, district)
                 
     # If scraping failed completely, return a fallback (marked as such)
     # but try REALLY hard to return real data.
@@ -144,3 +138,91 @@ async def get_market_prices(state: str = "Tamil Nadu", district: str = "Madurai"
         ]
         
     return results
+
+class MarketLocation(BaseModel):
+    state: str
+    district: str
+
+class BulkPricesRequest(BaseModel):
+    locations: List[MarketLocation]
+
+@router.post("/prices/bulk")
+async def get_market_prices_bulk(payload: BulkPricesRequest):
+    """
+    Prices for many (state, district) pairs in one call, streamed as NDJSON:
+    a {"state", "district", "prices"} line per district as soon as it is
+    done (in completion order), then a {"summary"} line. Repeated pairs are
+    answered once, each page is fetched once for the whole call (districts
+    of a state share its state page) and page requests go through
+    market_client's global concurrency cap.
+    """
+    locations = {}
+    for location in payload.locations:
+        locations.setdefault((location.state.strip().lower(), location.district.strip().lower()), location)
+    if not locations:
+        return {"error": "No locations given"}
+    if len(locations) > MARKET_BULK_MAX_LOCATIONS:
+        return {"error": f"At most {MARKET_BULK_MAX_LOCATIONS} locations per request"}
+
+    pages = PageBatch(market_client)
+
+    async def district_prices(location):
+        line = {"state": location.state, "district": location.district}
+        try:
+            line["prices"] = await fetch_all_prices(location.state, location.district, pages)
+        except Exception as e:
+            print(f"Bulk Market Error ({location.state}, {location.district}): {e}")
+            line["error"] = str(e)
+        return line
+
+    async def lines():
+        started = time.perf_counter()
+        tasks = [asyncio.ensure_future(district_prices(location)) for location in locations.values()]
+        try:
+            for done in asyncio.as_completed(tasks):
+                yield json.dumps(await done, ensure_ascii=False) + "\n"
+        finally:
+            # Client gone: stop waiting (fetches already under way still fill the cache)
+            for task in tasks:
+                task.cancel()
+        summary = dict(locations=len(tasks), **pages.stats(), elapsed_ms=round((time.perf_counter() - started) * 1000))
+        yield json.dumps({"summary": summary}) + "\n"
+
+    return StreamingResponse(
+        lines(),
+        media_type="application/x-ndjson",
+        # No proxy buffering, or the districts arrive all at once
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@router.get("/history")
+async def get_price_history(commodity: str, state: str = "Tamil Nadu", district: str = "Madurai",
+                            interval: str = "day", days: int = 90, level: Optional[str] = None):
+    """
+    Stored price series for trend charts, aggregated per day or week (IST):
+    [{date, open, close, min, max, avg, points, change}] in ₹/kg, oldest first.
+    level: "district" (mandi prices) or "state" (state averages); by default
+    the district's series, or the state's if the district has no prices of its own.
+    """
+    if commodity not in {c["id"] for c in COMMODITIES}:
+        return {"error": f"Unknown commodity: {commodity}"}
+    if interval not in INTERVALS:
+        return {"error": f"interval must be one of {sorted(INTERVALS)}"}
+    if level is not None and level not in LEVELS:
+        return {"error": f"level must be one of {sorted(LEVELS)}"}
+    if price_history.collection is None:
+        return {"error": "Price history is not available"}
+    try:
+        for series_level in [level] if level else ["district", "state"]:
+            series = await price_history.series(commodity, state, district, interval, max(1, days), series_level)
+            if series:
+                break
+    except Exception as e:
+        print(f"Price History Error: {e}")
+        return {"error": str(e)}
+    return {"commodity": commodity, "state": state, "district": district, "level": series_level,
+            "interval": interval, "series": series}
+
+@router.get("/cache/stats")
+async def get_price_cache_stats():
+    return price_cache.stats()
@@ -3,17 +3,14 @@ from main import db
 from pydantic import BaseModel
 from typing import List, Optional, Dict
 from utils.scraper import update_scheme_data
-from groq import Groq
+from llm_client import llm_client
+from scheme_audio import scheme_audio, audio_url, stored_translation, source_hash, scheme_query_id
 import os
 import json
 import asyncio
 
 router = APIRouter()
 
-# Setup Groq for final verification
-api_key = os.getenv("GROQ_API_KEY")
-client = Groq(api_key=api_key)
-
 class UserProfile(BaseModel):
     state: Optional[str] = None
     farmerType: Optional[str] = "small" # small, marginal, large
@@ -25,17 +22,35 @@ class RecommendRequest(BaseModel):
     userProfile: UserProfile
     language: Optional[str] = "en"
 
-async def translate_schemes(schemes, target_lang):
+def apply_translation(scheme, translation):
+    scheme["name"] = translation.get("name") or scheme["name"]
+    scheme["description"] = translation.get("description") or scheme["description"]
+    scheme["detailed_description"] = translation.get("detailed_description") or scheme.get("detailed_description")
+    scheme["translated"] = True
+
+async def translate_schemes(schemes, target_lang, schedule_audio=True):
     """
     Translates scheme names and descriptions to target language using LLM.
+    Translations are stored on the scheme (translations.<lang>) and reused
+    until its English text changes, so only new or edited schemes are sent.
     """
     if target_lang == "en":
         return schemes
 
+    pending = []
+    for s in schemes:
+        translation = stored_translation(s, target_lang)
+        if translation:
+            apply_translation(s, translation)
+        else:
+            pending.append(s)
+    if not pending:
+        return schemes
+
     try:
         # Batch translation prompt
         text_to_translate = []
-        for s in schemes:
+        for s in pending:
             text_to_translate.append(f"ID: {s['_id']}\nName: {s['name']}\nDesc: {s['description']}\nDetail: {s.get('detailed_description', '')}")
         
         joined_text = "\n---\n".join(text_to_translate)
@@ -47,16 +62,16 @@ async def translate_schemes(schemes, target_lang):
         Do not add any conversational text.
         """
         
-        completion = client.chat.completions.create(
-            messages=[
+        content = await llm_client.complete(
+            [
                 {"role": "system", "content": system_prompt},
                 {"role": "user", "content": joined_text}
             ],
-            model="llama-3.3-70b-versatile",
+            "llama-3.3-70b-versatile",
             response_format={"type": "json_object"}
         )
         
-        translated_data = json.loads(completion.choices[0].message.content)
+        translated_data = json.loads(content)
         
         # Determine if the response is wrapped
         if isinstance(translated_data, dict):
@@ -73,13 +88,32 @@ async def translate_schemes(schemes, target_lang):
         # Map back to schemes
         translate_map = {item['id']: item for item in translated_list if 'id' in item}
         
-        for s in schemes:
+        updates = []
+        for s in pending:
             t_item = translate_map.get(str(s["_id"])) or translate_map.get(s["_id"])
             if t_item:
-                s["name"] = t_item.get("name", s["name"])
-                s["description"] = t_item.get("description", s["description"])
-                s["detailed_description"] = t_item.get("detailed_description", s.get("detailed_description"))
-                s["translated"] = True
+                translation = {
+                    "name": t_item.get("name", s["name"]),
+                    "description": t_item.get("description", s["description"]),
+                    "detailed_description": t_item.get("detailed_description", s.get("detailed_description")),
+                    "source_hash": source_hash(s),  # of the English text, before it's replaced
+                }
+                apply_translation(s, translation)
+                updates.append(db.schemes.update_one(
+                    {"_id": scheme_query_id(s["_id"])},
+                    {"$set": {f"translations.{target_lang}": translation}}
+                ))
+
+        # Keep the translations (a failed write only means translating again next time)
+        for result in await asyncio.gather(*updates, return_exceptions=True):
+            if isinstance(result, Exception):
+                print(f"Translation Save Error: {result}")
+
+        # New translations: pre-synthesize them (after saving, so the job reads them back)
+        if schedule_audio:
+            for s in pending:
+                if s.get("translated"):
+                    scheme_audio.schedule(s["_id"], [target_lang])
                 
         return schemes
 
@@ -154,4 +188,11 @@ async def recommend_schemes(payload: RecommendRequest):
     if lang and lang != "en":
         results = await translate_schemes(results, lang)
 
+    # 4. Pre-synthesized voice playback, if ready (otherwise queue it for next time)
+    for r in results:
+        r.pop("translations", None)
+        r["audio_url"] = audio_url(r, lang or "en")
+        if r["audio_url"] is None:
+            scheme_audio.schedule(r["_id"], [lang or "en"])
+
     return results
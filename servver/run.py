@@ -0,0 +1,18 @@
+import os
+import sys
+
+# Starts the API server: python run.py
+#   python run.py --profile-imports   # rank what `import main` spends its time on
+#
+# The entry point lives here rather than in main.py: the inference workers
+# are spawned processes, which re-run the parent's __main__ module first.
+# This file imports nothing heavy; main.py would build the whole app (FastAPI,
+# Motor client, routes) in every worker.
+
+if __name__ == "__main__":
+    if "--profile-imports" in sys.argv:
+        from import_profiler import profile_imports
+        profile_imports("main")
+    else:
+        import uvicorn
+        uvicorn.run("main:app", host="0.0.0.0", port=int(os.getenv("PORT", "5000")))
@@ -0,0 +1,210 @@
+import os
+import uuid
+import socket
+import asyncio
+import hashlib
+from datetime import datetime, timedelta
+
+from tts_cache import tts_cache, cache_key, voice_for, VOICE_MAP
+
+# Configuration
+SCHEME_AUDIO_WORKERS = int(os.getenv("SCHEME_AUDIO_WORKERS", "2"))       # concurrent edge_tts syntheses
+SCHEME_AUDIO_BACKFILL = os.getenv("SCHEME_AUDIO_BACKFILL", "1") == "1"  # queue every active scheme at startup
+SCHEME_AUDIO_LEASE_SECONDS = 600                                        # backfill lease, renewed while it runs
+SCHEME_AUDIO_LANGUAGES = [                                              # default: every voice in VOICE_MAP
+    lang.strip() for lang in os.getenv("SCHEME_AUDIO_LANGUAGES", ",".join(VOICE_MAP)).split(",") if lang.strip()
+]
+
+def spoken_text(scheme):
+    """What the schemes page reads aloud for a card (same fallback as the frontend)."""
+    return scheme.get("detailed_description") or f"{scheme.get('name', '')}. {scheme.get('description', '')}"
+
+def source_hash(scheme):
+    """Changes whenever the English text a translation was made from changes."""
+    source = "\n".join(scheme.get(field) or "" for field in ("name", "description", "detailed_description"))
+    return hashlib.sha256(source.encode("utf-8")).hexdigest()[:16]
+
+def stored_translation(scheme, lang):
+    """The persisted translation for lang, if it was made from the current English text."""
+    translation = (scheme.get("translations") or {}).get(lang)
+    if translation and translation.get("source_hash") == source_hash(scheme):
+        return translation
+    return None
+
+def scheme_query_id(scheme_id):
+    """The _id to query with: seeded schemes have ObjectIds, API results carry them as strings."""
+    from bson import ObjectId
+
+    scheme_id = str(scheme_id)
+    return ObjectId(scheme_id) if ObjectId.is_valid(scheme_id) else scheme_id
+
+def audio_url(scheme, lang):
+    """URL of the pre-synthesized clip for this card (as displayed, i.e. translated), or None if it isn't ready yet."""
+    key = cache_key(spoken_text(scheme), voice_for(lang))
+    return f"/api/chat/tts/{key}.mp3" if tts_cache.contains(key) else None
+
+class SchemeAudioJob:
+    """
+    Background pre-synthesis of the scheme cards' voice playback.
+
+    schedule() queues (scheme id, languages); workers load the scheme, take
+    its English text or the stored translation for each language
+    (translating first if there is none for the current text), and
+    synthesize it into the TTS cache unless the clip is already there. The
+    queue is deduplicated, so a scheme edited twice before its turn is only
+    processed once.
+
+    The startup backfill runs in one uvicorn worker only: it holds a lease
+    in db.job_leases until its queue is drained, and workers that can't get
+    the lease skip it.
+    """
+
+    LEASE_ID = "scheme_audio_backfill"
+
+    def __init__(self):
+        self.db = None
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.queue = None
+        self.queued = set()
+        self.workers = []
+
+        # Metrics
+        self.synthesized = 0
+        self.already_cached = 0
+        self.skipped = 0
+        self.failures = 0
+
+    def start(self, db):
+        if self.workers:
+            return
+        self.db = db
+        self.queue = asyncio.Queue()
+        self.workers = [asyncio.create_task(self._worker()) for _ in range(max(1, SCHEME_AUDIO_WORKERS))]
+        print(f"[SchemeAudio] {len(self.workers)} workers for {len(SCHEME_AUDIO_LANGUAGES)} languages")
+        if SCHEME_AUDIO_BACKFILL:
+            self.workers.append(asyncio.create_task(self._backfill()))
+
+    async def stop(self):
+        for task in self.workers:
+            task.cancel()
+        await asyncio.gather(*self.workers, return_exceptions=True)
+        self.workers = []
+        self.queued.clear()
+
+    def schedule(self, scheme_id, languages=None):
+        """Queue pre-synthesis for a scheme whose text or translations changed. No-op if not started."""
+        if self.queue is None:
+            return
+        for lang in languages or SCHEME_AUDIO_LANGUAGES:
+            item = (str(scheme_id), lang)
+            if item not in self.queued:
+                self.queued.add(item)
+                self.queue.put_nowait(item)
+
+    async def _take_lease(self):
+        """Takes (or renews) the backfill lease. False if another worker holds it."""
+        from pymongo import ReturnDocument
+        from pymongo.errors import DuplicateKeyError
+
+        now = datetime.utcnow()
+        try:
+            lease = await self.db.job_leases.find_one_and_update(
+                {"_id": self.LEASE_ID, "$or": [{"owner": self.owner}, {"expires_at": {"$lt": now}}]},
+                {"$set": {"owner": self.owner, "expires_at": now + timedelta(seconds=SCHEME_AUDIO_LEASE_SECONDS)}},
+                upsert=True,
+                return_document=ReturnDocument.AFTER,
+            )
+        except DuplicateKeyError:
+            return False  # the lease exists and isn't ours or expired
+        return lease is not None
+
+    async def _backfill(self):
+        lease = await self._try(self._take_lease)
+        if not lease:
+            if lease is False:
+                print("[SchemeAudio] Backfill skipped: another worker is running it")
+            return
+        drained = None
+        try:
+            async for scheme in self.db.schemes.find({"active": {"$ne": False}}, {"_id": 1}):
+                self.schedule(scheme["_id"])
+            # Hold the lease until the queued work is done (it includes the translations)
+            drained = asyncio.ensure_future(self.queue.join())
+            while not drained.done():
+                await asyncio.wait([drained], timeout=SCHEME_AUDIO_LEASE_SECONDS / 3)
+                await self._take_lease()
+        except Exception as e:
+            print(f"[SchemeAudio] Backfill skipped: {e}")
+        finally:
+            if drained is not None:
+                drained.cancel()
+            await self._try(lambda: self.db.job_leases.delete_one({"_id": self.LEASE_ID, "owner": self.owner}))
+
+    @staticmethod
+    async def _try(operation):
+        try:
+            return await operation()
+        except Exception as e:
+            print(f"[SchemeAudio] Lease: {e}")
+            return None
+
+    async def _load(self, scheme_id):
+        return await self.db.schemes.find_one({"_id": scheme_query_id(scheme_id)})
+
+    async def _text_for(self, scheme, lang):
+        if lang == "en":
+            return spoken_text(scheme)
+        translation = stored_translation(scheme, lang)
+        if translation is None:
+            # Lazy import: routes.schemes imports the app's db at module level
+            from routes.schemes import translate_schemes
+
+            translated = (await translate_schemes([dict(scheme)], lang, schedule_audio=False))[0]
+            if not translated.get("translated"):
+                return None  # no LLM available; don't read English text in another voice
+            translation = translated
+        return spoken_text(translation)
+
+    async def process(self, scheme_id, lang):
+        scheme = await self._load(scheme_id)
+        if scheme is None:
+            self.skipped += 1
+            return
+        text = await self._text_for(scheme, lang)
+        if not text or not text.strip(". "):
+            self.skipped += 1
+            return
+        voice = voice_for(lang)
+        key = cache_key(text, voice)
+        if tts_cache.contains(key):
+            self.already_cached += 1
+            return
+        async for _ in tts_cache.synthesize(text, voice, key):
+            pass
+        self.synthesized += 1
+
+    async def _worker(self):
+        while True:
+            scheme_id, lang = await self.queue.get()
+            self.queued.discard((scheme_id, lang))
+            try:
+                await self.process(scheme_id, lang)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.failures += 1
+                print(f"[SchemeAudio] {scheme_id} ({lang}) failed: {e}")
+            finally:
+                self.queue.task_done()
+
+    def stats(self):
+        return {
+            "queued": self.queue.qsize() if self.queue is not None else 0,
+            "synthesized": self.synthesized,
+            "already_cached": self.already_cached,
+            "skipped": self.skipped,
+            "failures": self.failures,
+        }
+
+# Global instance
+scheme_audio = SchemeAudioJob()
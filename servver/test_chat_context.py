@@ -0,0 +1,71 @@
+import sys
+import os
+
+# Ensure we can import from local directory
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from chat_context import ChatContextBuilder, estimate_tokens, TRUNCATION_MARK
+
+PROFILE = {
+    "name": "Lakshmi",
+    "location": "Guntur",
+    "soil": {"type": "Black", "landSize": "2 acres", "waterSource": "Canal"},
+    "sensors": {"ph": 6.8, "n": 140, "p": 45, "k": 60, "moisture": 42},
+}
+
+def turns(*contents):
+    return [{"role": "user" if i % 2 == 0 else "assistant", "content": c} for i, c in enumerate(contents)]
+
+def test_estimate_is_close_to_bpe_counts():
+    assert estimate_tokens("") == 0
+    assert 8 <= estimate_tokens("When should I apply urea to my paddy field?") <= 14
+    assert 6 <= estimate_tokens("मुझे गेहूं के लिए खाद बताओ") <= 14
+    assert estimate_tokens("word " * 1000) == 1000
+
+def test_profile_block_is_cached_per_user_and_context():
+    builder = ChatContextBuilder()
+    first, _ = builder.build("u1", "en", PROFILE, [], "hello")
+    second, _ = builder.build("u1", "en", dict(PROFILE), [], "again")
+    assert first[0] is not second[0] and first[0]["content"] is second[0]["content"]
+    assert "Soil pH: 6.8" in first[0]["content"] and "Name: Lakshmi" in first[0]["content"]
+
+    changed, _ = builder.build("u1", "en", dict(PROFILE, sensors=dict(PROFILE["sensors"], ph=5.9)), [], "x")
+    assert "Soil pH: 5.9" in changed[0]["content"]
+    builder.build("u2", "en", PROFILE, [], "x")
+    assert (builder.cache_hits, builder.cache_misses) == (1, 3)
+
+def test_history_is_trimmed_to_the_token_budget():
+    builder = ChatContextBuilder(history_budget=100, message_limit=10_000)
+    pasted = "soil report " * 200  # one long pasted message, ~400 tokens
+    history = turns("old question", "old answer", pasted, "that looks fine", "what about potash?", "add 20 kg MOP")
+
+    messages, tokens = builder.build("u1", "en", None, history, "and nitrogen?")
+    contents = [m["content"] for m in messages[1:]]
+    # The long message and everything before it are dropped; the reply to it is dropped with it
+    assert contents == ["what about potash?", "add 20 kg MOP", "and nitrogen?"]
+    assert tokens["dropped_messages"] == 4 and tokens["history_messages"] == 2
+    assert tokens["history"] <= 100
+    assert tokens["total"] == tokens["system"] + tokens["history"] + tokens["message"]
+
+def test_long_messages_are_truncated():
+    builder = ChatContextBuilder(history_budget=1000, message_limit=50)
+    messages, tokens = builder.build("u1", "en", None, turns("q", "a"), "urea " * 500)
+    assert messages[-1]["content"].endswith(TRUNCATION_MARK)
+    assert tokens["message"] <= 50 + estimate_tokens(TRUNCATION_MARK)
+    assert [m["content"] for m in messages[1:3]] == ["q", "a"]
+    assert builder.stats()["truncated_messages"] == 1
+
+def test_image_message_is_passed_through():
+    builder = ChatContextBuilder()
+    image = [{"type": "text", "text": "What disease is this?"}, {"type": "image_url", "image_url": {"url": "data:..."}}]
+    messages, tokens = builder.build("u1", "hi", PROFILE, [], image)
+    assert messages[-1] == {"role": "user", "content": image}
+    assert tokens["message"] == estimate_tokens("What disease is this?")
+
+if __name__ == "__main__":
+    test_estimate_is_close_to_bpe_counts()
+    test_profile_block_is_cached_per_user_and_context()
+    test_history_is_trimmed_to_the_token_budget()
+    test_long_messages_are_truncated()
+    test_image_message_is_passed_through()
+    print("✅ Chat context builder behaves as expected")
@@ -0,0 +1,171 @@
+import sys
+import os
+import json
+import asyncio
+from datetime import datetime
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+# Ensure we can import from local directory
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import main  # noqa: F401 (routes.api imports db from main)
+from routes import api
+from llm_client import llm_client
+from memory_db import MemoryDB
+from response_cache import SemanticResponseCache
+
+REPLY = ["Apply", " urea", " in", " two", " splits."]
+
+@pytest.fixture
+def db(monkeypatch):
+    monkeypatch.setenv("GROQ_API_KEY", "test-key")
+    monkeypatch.setattr(api, "db", MemoryDB())
+    monkeypatch.setattr(api, "response_cache", SemanticResponseCache())  # nothing cached from other tests
+    return api.db
+
+@pytest.fixture
+def client(db):
+    app = FastAPI()
+    app.include_router(api.router, prefix="/api")
+    return TestClient(app)
+
+def fake_stream(monkeypatch, pieces=REPLY, fail_after=None):
+    """llm_client.stream stand-in: yields pieces, raising after fail_after of them if set."""
+    async def stream(messages, model, **kwargs):
+        for i, piece in enumerate(pieces):
+            if i == fail_after:
+                raise RuntimeError("connection reset")
+            yield piece
+        if fail_after is not None and fail_after >= len(pieces):
+            raise RuntimeError("connection reset")
+
+    monkeypatch.setattr(llm_client, "stream", stream)
+
+def fake_complete(monkeypatch):
+    """llm_client.complete stand-in: answers "reply N" to the Nth call."""
+    calls = []
+
+    async def complete(messages, model, **kwargs):
+        calls.append(messages)
+        return f"reply {len(calls)}"
+
+    monkeypatch.setattr(llm_client, "complete", complete)
+    return calls
+
+def sse_events(response):
+    """[(event, data)] of a Server-Sent Events body."""
+    events = []
+    for block in response.text.split("\n\n"):
+        if not block:
+            continue
+        fields = dict(line.split(": ", 1) for line in block.split("\n"))
+        events.append((fields["event"], json.loads(fields["data"])))
+    return events
+
+def stream_chat(client, message, session_id=None):
+    response = client.post("/api/chat/stream", json={"userId": "farmer-1", "message": message, "sessionId": session_id})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    return sse_events(response)
+
+def test_stream_sends_tokens_then_done_and_saves_the_turn(client, db, monkeypatch):
+    fake_stream(monkeypatch)
+    events = stream_chat(client, "When should I apply urea?")
+    assert [e for e, _ in events] == ["token"] * len(REPLY) + ["done"]
+    assert "".join(data["text"] for _, data in events[:-1]) == "".join(REPLY)
+
+    done = events[-1][1]
+    session = db.chat_sessions.docs[api.ObjectId(done["sessionId"])]
+    assert done["model"] == "llama-3.3-70b-versatile"
+    assert [(m["role"], m["content"]) for m in session["messages"]] == [
+        ("user", "When should I apply urea?"), ("assistant", "".join(REPLY))]
+    assert session["lastMessagePreview"] == "".join(REPLY)
+
+    # A follow-up in the same session appends the new turn
+    events = stream_chat(client, "And how much?", done["sessionId"])
+    assert events[-1] == ("done", done)
+    assert len(session["messages"]) == 4 and session["messages"][2]["content"] == "And how much?"
+
+def test_stream_error_before_any_token(client, db, monkeypatch):
+    fake_stream(monkeypatch, fail_after=0)
+    events = stream_chat(client, "When should I apply urea?")
+    assert [e for e, _ in events] == ["error"]
+    assert events[0][1]["error"] == "All models failed." and "connection reset" in events[0][1]["details"]
+    assert not db.chat_sessions.docs  # nothing saved
+
+def test_stream_error_after_tokens_keeps_the_session_unchanged(client, db, monkeypatch):
+    fake_stream(monkeypatch)
+    session_id = stream_chat(client, "When should I apply urea?")[-1][1]["sessionId"]
+    stored = list(db.chat_sessions.docs[api.ObjectId(session_id)]["messages"])
+
+    fake_stream(monkeypatch, fail_after=2)
+    events = stream_chat(client, "And how much?", session_id)
+    assert [e for e, _ in events] == ["token", "token", "error"]
+    assert "connection reset" in events[-1][1]["error"]
+    assert db.chat_sessions.docs[api.ObjectId(session_id)]["messages"] == stored
+
+def test_stored_history_is_capped_and_only_the_tail_is_loaded(client, db, monkeypatch):
+    monkeypatch.setattr(api, "CHAT_MAX_STORED_MESSAGES", 4)
+    monkeypatch.setattr(api, "CHAT_CONTEXT_MESSAGES", 3)
+    calls = fake_complete(monkeypatch)
+
+    session_id = None
+    for turn in range(1, 5):
+        reply = client.post("/api/chat", json={"userId": "farmer-1", "message": f"question {turn}", "sessionId": session_id}).json()
+        assert reply["reply"] == f"reply {turn}"
+        session_id = reply["sessionId"]
+
+    # Each turn is $push'ed; the stored array keeps the newest CHAT_MAX_STORED_MESSAGES
+    stored = db.chat_sessions.docs[api.ObjectId(session_id)]["messages"]
+    assert [m["content"] for m in stored] == ["question 3", "reply 3", "question 4", "reply 4"]
+
+    # Only the last CHAT_CONTEXT_MESSAGES are read back, and only they reach the prompt
+    session = asyncio.run(api._load_session(session_id, "farmer-1", "question 5"))
+    assert [m.content for m in session.messages] == ["reply 3", "question 4", "reply 4"]
+    assert [m["content"] for m in calls[-1][1:]] == ["reply 2", "question 3", "reply 3", "question 4"]  # turn 4's prompt
+
+def test_uncapped_history_keeps_every_message(client, db, monkeypatch):
+    monkeypatch.setattr(api, "CHAT_CONTEXT_MESSAGES", 2)
+    fake_complete(monkeypatch)
+    session_id = None
+    for turn in range(1, 4):
+        session_id = client.post("/api/chat", json={"userId": "farmer-1", "message": f"question {turn}",
+                                                     "sessionId": session_id}).json()["sessionId"]
+    # Loading a 2-message slice per turn doesn't drop the older messages from the database
+    assert len(db.chat_sessions.docs[api.ObjectId(session_id)]["messages"]) == 6
+
+def test_history_pages_have_no_duplicates_or_gaps(client, db):
+    times = [datetime(2026, 10, 1, 9, 0)] * 4 + [datetime(2026, 10, 2, 9, 0)] * 4 + [datetime(2026, 10, 3, 9, 0)]
+    for i, updated_at in enumerate(times):
+        session = {"_id": api.ObjectId(), "userId": "farmer-1", "title": f"chat {i}", "updatedAt": updated_at,
+                   "messages": [{"role": "user", "content": f"question {i}"}, {"role": "assistant", "content": f"reply {i}"}]}
+        if i % 3:
+            session["lastMessagePreview"] = f"reply {i}"  # the others predate the stored preview
+        asyncio.run(db.chat_sessions.insert_one(session))
+        asyncio.run(db.chat_sessions.insert_one(dict(session, _id=api.ObjectId(), userId="farmer-2")))
+    asyncio.run(db.chat_sessions.insert_one({"_id": api.ObjectId(), "userId": "farmer-1", "title": "empty",
+                                             "updatedAt": times[0], "messages": []}))
+
+    pages, cursor = [], None
+    for _ in range(10):  # a cursor that doesn't advance would page forever
+        response = client.get("/api/chat/history", params={"userId": "farmer-1", "limit": 2, **({"cursor": cursor} if cursor else {})})
+        pages.append(response.json())
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            break
+    else:
+        pytest.fail("history pages never ended")
+
+    listed = [s for page in pages for s in page]
+    expected = sorted((d for d in db.chat_sessions.docs.values() if d["userId"] == "farmer-1"),
+                      key=lambda d: (d["updatedAt"], d["_id"]), reverse=True)
+    assert [len(page) for page in pages] == [2, 2, 2, 2, 2]
+    assert [s["id"] for s in listed] == [str(d["_id"]) for d in expected]  # newest first, ties by _id, each once
+    assert {s["preview"] for s in listed} == {f"reply {i}" for i in range(9)} | {"Empty chat"}
+    # Missing previews were backfilled from the last message and stored
+    assert all("lastMessagePreview" in d for d in expected)
+
+    assert client.get("/api/chat/history", params={"userId": "farmer-1", "cursor": "not-a-cursor"}).json() == {"error": "Invalid cursor"}
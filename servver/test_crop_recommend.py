@@ -0,0 +1,45 @@
+import sys
+import os
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+# Ensure we can import from local directory
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import main  # noqa: F401 (routes.api imports db from main)
+from routes import api
+from prediction_cache import PredictionCache, CROP_STEPS
+
+READING = {"N": 90, "P": 42, "K": 43, "temperature": 20.9, "humidity": 82, "ph": 6.5, "rainfall": 203}
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(api, "crop_cache", PredictionCache("crop", CROP_STEPS))
+    app = FastAPI()
+    app.include_router(api.router, prefix="/api")
+    return TestClient(app)
+
+def test_pool_failure_returns_the_error_dict(client, monkeypatch):
+    async def broken(features):
+        raise BrokenProcessPool("A process in the process pool was terminated abruptly")
+
+    monkeypatch.setattr(api.crop_batcher, "submit", broken)
+    response = client.post("/api/ml/recommend", json=READING)
+    assert response.status_code == 200
+    assert response.json() == {"error": "A process in the process pool was terminated abruptly", "crops": []}
+    assert api.crop_cache.stats()["entries"] == 0  # failures aren't cached
+
+def test_predictions_are_cached(client, monkeypatch):
+    calls = []
+
+    async def submit(features):
+        calls.append(features)
+        return {"crops": [{"name": "rice", "confidence": 87.5}]}
+
+    monkeypatch.setattr(api.crop_batcher, "submit", submit)
+    for _ in range(2):
+        assert client.post("/api/ml/recommend", json=READING).json() == {"crops": [{"name": "rice", "confidence": 87.5}]}
+    assert len(calls) == 1
@@ -0,0 +1,66 @@
+import sys
+import os
+
+import numpy as np
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+# Ensure we can import from local directory
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from model_loader import MODEL_PATH, ENCODER_PATH, get_fertilizer_models
+from model_registry import registry
+from recommender import recommend, recommend_batch
+from routes import fertilizer
+
+needs_models = pytest.mark.skipif(not (os.path.exists(MODEL_PATH) and os.path.exists(ENCODER_PATH)),
+                                  reason="fertilizer model not found")
+
+def random_rows(n, seed=0):
+    plan = get_fertilizer_models().plan
+    soils, crops = list(plan.soil_codes) + ["Peaty"], list(plan.crop_codes) + ["Quinoa"]  # a few unseen labels
+    rng = np.random.default_rng(seed)
+    return [{
+        "crop": str(rng.choice(crops)),
+        "soil_type": str(rng.choice(soils)),
+        "ph": round(float(rng.uniform(4.5, 8.5)), 1),
+        "nitrogen": round(float(rng.uniform(0, 140)), 1),
+        "phosphorus": round(float(rng.uniform(0, 60)), 1),
+        "potassium": round(float(rng.uniform(0, 60)), 1),
+        "organic_carbon": round(float(rng.uniform(0.1, 1.5)), 2),
+        "temperature": round(float(rng.uniform(15, 40)), 1),
+        "humidity": round(float(rng.uniform(30, 90)), 1),
+        "moisture": round(float(rng.uniform(20, 70)), 1),
+    } for _ in range(n)]
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(registry, "stats", {})  # keep test batches out of the real version stats
+    app = FastAPI()
+    app.include_router(fertilizer.router, prefix="/api")
+    return TestClient(app)
+
+@needs_models
+def test_batch_matches_single_row_recommend():
+    rows = random_rows(300)
+    assert recommend_batch(rows) == [recommend(row) for row in rows]
+
+@needs_models
+def test_batch_endpoint_matches_per_row_responses(client):
+    rows = random_rows(40, seed=1)
+    response = client.post("/api/fertilizer-recommendation/batch", json=rows)
+    assert response.status_code == 200
+    body = response.json()
+    assert body["count"] == len(rows)
+    for row, result in zip(rows, body["results"]):
+        data = fertilizer.SoilInput(**row)
+        assert result == fertilizer._build_response(data, recommend(fertilizer._to_input_data(data)))
+
+def test_oversized_batch_is_rejected(client, monkeypatch):
+    monkeypatch.setattr(fertilizer, "MAX_BATCH_ROWS", 3)
+    row = {"crop": "Paddy", "soil_type": "Clayey", "ph": 6.5, "nitrogen": 40, "phosphorus": 20,
+           "potassium": 20, "organic_carbon": 0.5}
+    response = client.post("/api/fertilizer-recommendation/batch", json=[row] * 4)
+    assert response.status_code == 413
+    assert client.post("/api/fertilizer-recommendation/batch", json=[]).json() == {"count": 0, "results": []}
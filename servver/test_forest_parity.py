@@ -0,0 +1,115 @@
+import sys
+import os
+import tempfile
+
+import numpy as np
+import joblib
+from sklearn.ensemble import RandomForestClassifier
+
+# Ensure we can import from local directory
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from forest_compiler import FlatForest, HybridForest
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+REAL_MODELS = [
+    # (pickle, number of features, value ranges used for random probes)
+    (os.path.join(BASE_DIR, "trained_model", "fertilizer_model.pkl"), [(10, 45), (20, 100), (10, 80), (0, 4), (0, 10), (0, 150), (0, 80), (0, 80)]),
+    (os.path.join(BASE_DIR, "models", "crop_model.pkl"), [(0, 140), (5, 145), (5, 205), (8, 44), (14, 100), (3.5, 10), (20, 300)]),
+]
+
+def random_rows(ranges, n, seed=0):
+    rng = np.random.default_rng(seed)
+    return np.column_stack([rng.uniform(low, high, n) for low, high in ranges])
+
+def assert_parity(model, X):
+    flat = FlatForest.from_sklearn(model)
+    expected = model.predict_proba(X)
+    actual = flat.predict_proba(X)
+    np.testing.assert_allclose(actual, expected, rtol=0, atol=1e-12)
+    assert (flat.predict(X) == model.predict(X)).all()
+
+    # Round trip through the on-disk export
+    with tempfile.TemporaryDirectory() as tmp:
+        flat.save(os.path.join(tmp, "model.flat"))
+        loaded = FlatForest.load(os.path.join(tmp, "model.flat"))
+        np.testing.assert_allclose(loaded.predict_proba(X), expected, rtol=0, atol=1e-12)
+        assert list(loaded.classes_) == list(model.classes_)
+
+def test_parity_synthetic_forest():
+    rng = np.random.default_rng(42)
+    X = rng.uniform(0, 100, size=(1500, 8))
+    # Integer-coded categorical columns, like Soil Type / Crop Type
+    X[:, 3] = rng.integers(0, 5, 1500)
+    X[:, 4] = rng.integers(0, 11, 1500)
+    y = ((X[:, 0] // 20) + X[:, 3]).astype(int) % 7
+
+    model = RandomForestClassifier(n_estimators=50, random_state=42).fit(X, y)
+    assert_parity(model, rng.uniform(0, 100, size=(300, 8)))
+    # Single-row calls are the common request shape
+    assert_parity(model, X[:1])
+
+def test_parity_string_classes_and_feature_names():
+    import pandas as pd
+
+    rng = np.random.default_rng(7)
+    X = pd.DataFrame(rng.uniform(0, 10, size=(600, 3)), columns=["N", "P", "K"])
+    y = np.where(X["N"] > 5, "rice", np.where(X["P"] > 5, "maize", "cotton"))
+
+    model = RandomForestClassifier(n_estimators=20, max_depth=6, random_state=0).fit(X, y)
+    flat = FlatForest.from_sklearn(model)
+    probe = X.sample(100, random_state=1)
+    np.testing.assert_allclose(flat.predict_proba(probe), model.predict_proba(probe), rtol=0, atol=1e-12)
+    # Reordered DataFrame columns are realigned by name
+    np.testing.assert_allclose(flat.predict_proba(probe[["K", "N", "P"]]), model.predict_proba(probe), rtol=0, atol=1e-12)
+    assert (flat.predict(probe) == model.predict(probe)).all()
+
+def test_rows_that_reach_a_leaf_early_stop_walking():
+    # A stump next to deep trees: most rows are done after one step
+    rng = np.random.default_rng(3)
+    X = rng.uniform(0, 100, size=(400, 4))
+    y = (X[:, 0] > 50).astype(int) + (X[:, 1] > 90).astype(int)
+    model = RandomForestClassifier(n_estimators=10, max_depth=1, random_state=0).fit(X, y)
+    deep = RandomForestClassifier(n_estimators=10, random_state=0).fit(X, y)
+    model.estimators_ += deep.estimators_
+    model.n_estimators = len(model.estimators_)
+    assert_parity(model, rng.uniform(0, 100, size=(257, 4)))
+
+def test_large_batches_go_to_sklearn():
+    rng = np.random.default_rng(5)
+    X = rng.uniform(0, 100, size=(500, 8))
+    model = RandomForestClassifier(n_estimators=10, random_state=5).fit(X, (X[:, 0] > 50).astype(int))
+    loads = []
+
+    def load_sklearn():
+        loads.append(1)
+        return model
+
+    hybrid = HybridForest(FlatForest.from_sklearn(model), load_sklearn, max_flat_rows=64)
+    assert list(hybrid.classes_) == [0, 1]
+    assert hybrid.backend_for(X[:64]) is hybrid.flat and not loads  # the pickle is never touched
+    np.testing.assert_allclose(hybrid.predict_proba(X[:64]), model.predict_proba(X[:64]), rtol=0, atol=1e-12)
+    assert hybrid.backend_for(X) is model
+    assert (hybrid.predict(X) == model.predict(X)).all()
+    assert len(loads) == 1  # unpickled once
+
+def test_parity_real_models():
+    for pickle_path, ranges in REAL_MODELS:
+        if not os.path.exists(pickle_path):
+            print(f"Skipping {pickle_path} (not found)")
+            continue
+        model = joblib.load(pickle_path)
+        X = random_rows(ranges, 500)
+        if hasattr(model, "feature_names_in_"):
+            import pandas as pd
+            X = pd.DataFrame(X, columns=model.feature_names_in_)
+        assert_parity(model, X)
+        print(f"✅ Parity OK for {os.path.basename(pickle_path)}")
+
+if __name__ == "__main__":
+    test_parity_synthetic_forest()
+    test_parity_string_classes_and_feature_names()
+    test_rows_that_reach_a_leaf_early_stop_walking()
+    test_large_batches_go_to_sklearn()
+    test_parity_real_models()
+    print("✅ FlatForest matches sklearn predict_proba")
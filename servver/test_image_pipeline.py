@@ -0,0 +1,97 @@
+import sys
+import os
+import io
+import base64
+import asyncio
+
+import numpy as np
+import pytest
+
+# Ensure we can import from local directory
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+Image = pytest.importorskip("PIL.Image")
+
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+from image_pipeline import ImagePipeline, ImageError, CHAT_IMAGE_MAX_SIDE
+from body_limit import BodySizeLimitMiddleware
+
+def photo(width, height, fmt="JPEG", mode="RGB", orientation=None):
+    """A noisy test image (noise keeps JPEGs realistically large)."""
+    rng = np.random.default_rng(0)
+    pixels = rng.integers(0, 255, (height, width, len(mode)), dtype=np.uint8)
+    img = Image.fromarray(pixels, mode)
+    out = io.BytesIO()
+    if orientation:
+        exif = Image.Exif()
+        exif[0x0112] = orientation
+        img.save(out, fmt, exif=exif)
+    else:
+        img.save(out, fmt)
+    return out.getvalue()
+
+def data_url(data, mime="image/jpeg"):
+    return f"data:{mime};base64," + base64.b64encode(data).decode()
+
+def decode(prepared):
+    assert prepared.startswith("data:image/jpeg;base64,")
+    return Image.open(io.BytesIO(base64.b64decode(prepared.split(",", 1)[1])))
+
+def test_large_photo_is_downsized_and_cached():
+    pipeline = ImagePipeline()
+    original = photo(4000, 3000)
+    prepared = asyncio.run(pipeline.prepare(data_url(original)))
+
+    img = decode(prepared)
+    assert max(img.size) == CHAT_IMAGE_MAX_SIDE and img.size[0] > img.size[1]
+    assert len(prepared) < len(original) / 4
+
+    # Same bytes as bare base64: served from the cache
+    assert asyncio.run(pipeline.prepare(base64.b64encode(original).decode())) == prepared
+    assert pipeline.stats()["processed"] == 1 and pipeline.stats()["cache_hits"] == 1
+
+def test_exif_rotation_and_transparency():
+    pipeline = ImagePipeline()
+    rotated = decode(asyncio.run(pipeline.prepare(data_url(photo(1200, 600, orientation=6)))))
+    assert rotated.size[1] > rotated.size[0]  # portrait, as the phone showed it
+
+    png = decode(asyncio.run(pipeline.prepare(data_url(photo(300, 200, "PNG", "RGBA"), "image/png"))))
+    assert png.mode == "RGB" and png.size == (300, 200)
+
+def test_unusable_images_are_rejected():
+    pipeline = ImagePipeline()
+    with pytest.raises(ImageError):
+        asyncio.run(pipeline.prepare(data_url(b"not an image at all")))
+    with pytest.raises(ImageError):
+        asyncio.run(pipeline.prepare("data:image/jpeg;base64," + "A" * (20 * 1024 * 1024)))  # over the size cap
+    assert pipeline.stats()["rejected"] == 2
+
+    # URLs go to the LLM provider untouched
+    assert asyncio.run(pipeline.prepare("https://example.com/leaf.jpg")) == "https://example.com/leaf.jpg"
+    assert asyncio.run(pipeline.prepare(None)) is None
+
+def test_body_size_limit():
+    app = FastAPI()
+    app.add_middleware(BodySizeLimitMiddleware, limits={"/api/chat": 1000})
+
+    @app.post("/api/chat")
+    async def chat(request: Request):
+        return {"bytes": len(await request.body())}
+
+    @app.post("/api/other")
+    async def other(request: Request):
+        return {"bytes": len(await request.body())}
+
+    client = TestClient(app)
+    assert client.post("/api/chat", content=b"x" * 1000).json() == {"bytes": 1000}
+    assert client.post("/api/chat", content=b"x" * 1001).status_code == 413
+    assert client.post("/api/other", content=b"x" * 5000).status_code == 200
+
+    # Chunked upload with no Content-Length: cut off once past the limit
+    def chunks():
+        for _ in range(10):
+            yield b"x" * 400
+
+    assert client.post("/api/chat", content=chunks()).status_code == 413
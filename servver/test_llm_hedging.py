@@ -0,0 +1,119 @@
+import sys
+import os
+import asyncio
+
+import pytest
+
+# Ensure we can import from local directory
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from llm_client import LLMClient
+
+MODELS = ["primary", "secondary", "tertiary"]
+
+def make_client(delays, failing=()):
+    """LLMClient whose complete()/stream() are fakes with a fixed delay per model."""
+    client = LLMClient()
+    client.cancelled = []
+
+    async def complete(messages, model, **kwargs):
+        try:
+            await asyncio.sleep(delays[model])
+        except asyncio.CancelledError:
+            client.cancelled.append(model)
+            raise
+        if model in failing:
+            raise RuntimeError("overloaded")
+        return f"reply from {model}"
+
+    async def stream(messages, model, **kwargs):
+        await asyncio.sleep(delays[model])
+        if model in failing:
+            raise RuntimeError("overloaded")
+        for word in ("reply", " from", f" {model}"):
+            yield word
+
+    client.complete = complete
+    client.stream = stream
+    return client
+
+def run(coro):
+    return asyncio.run(coro)
+
+def test_fast_primary_is_not_hedged():
+    client = make_client({"primary": 0.01, "secondary": 0.01, "tertiary": 0.01})
+    model, reply = run(client.complete_hedged(lambda m: [], MODELS, deadline_ms=200))
+    assert (model, reply) == ("primary", "reply from primary")
+    assert client.health.hedges == 0
+
+def test_slow_primary_is_hedged_and_cancelled():
+    client = make_client({"primary": 5, "secondary": 0.02, "tertiary": 5})
+
+    async def timed():
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        result = await client.complete_hedged(lambda m: [], MODELS, deadline_ms=50)
+        return result, loop.time() - started
+
+    (model, _), elapsed = run(timed())
+    assert model == "secondary"
+    assert elapsed < 1  # didn't wait for the primary's 5 s
+    assert client.cancelled == ["primary"]
+    assert client.health.models["primary"]["cancelled"] == 1
+
+def test_failure_moves_on_without_waiting_for_deadline():
+    client = make_client({"primary": 0.01, "secondary": 0.01, "tertiary": 0.01}, failing={"primary"})
+    model, _ = run(client.complete_hedged(lambda m: [], MODELS, deadline_ms=10_000))
+    assert model == "secondary"
+    assert client.health.models["primary"]["errors"] == 1
+
+def test_all_failing_raises():
+    client = make_client({m: 0.01 for m in MODELS}, failing=set(MODELS))
+    with pytest.raises(RuntimeError):
+        run(client.complete_hedged(lambda m: [], MODELS, deadline_ms=10))
+
+def test_order_adapts_to_latency_and_keep_first():
+    client = make_client({"primary": 0.2, "secondary": 0.01, "tertiary": 0.05})
+    # Before any measurements the configured order is kept
+    assert client.health.order(MODELS) == MODELS
+    for model in MODELS:
+        run(client.complete_hedged(lambda m: [], [model]))
+
+    assert client.health.order(MODELS) == ["secondary", "tertiary", "primary"]
+    # A model that must stay first (the vision model for images) isn't reordered
+    assert client.health.order(MODELS, keep_first=True)[0] == "primary"
+
+def test_slow_vision_model_is_not_hedged():
+    # An image request: only "primary" (the vision model) sees the photo, so a
+    # faster text model must not win just because the vision model is slow
+    client = make_client({"primary": 0.3, "secondary": 0.01, "tertiary": 0.01})
+    model, _ = run(client.complete_hedged(lambda m: [], MODELS, keep_first=True, deadline_ms=None))
+    assert model == "primary"
+    assert client.health.hedges == 0 and "secondary" not in client.health.models
+
+    async def collect():
+        return [piece async for piece in client.stream_hedged(lambda m: [], MODELS, keep_first=True, deadline_ms=None)]
+    assert {model for model, _ in run(collect())} == {"primary"}
+
+    # The text models still answer if the vision model fails
+    client = make_client({"primary": 0.3, "secondary": 0.01, "tertiary": 0.01}, failing={"primary"})
+    model, _ = run(client.complete_hedged(lambda m: [], MODELS, keep_first=True, deadline_ms=None))
+    assert model == "secondary"
+
+def test_stream_hedged_races_on_first_token():
+    client = make_client({"primary": 5, "secondary": 0.02, "tertiary": 5})
+
+    async def collect():
+        return [piece async for piece in client.stream_hedged(lambda m: [], MODELS, deadline_ms=50)]
+
+    pieces = run(collect())
+    assert {model for model, _ in pieces} == {"secondary"}
+    assert "".join(text for _, text in pieces) == "reply from secondary"
+
+if __name__ == "__main__":
+    for test in (test_fast_primary_is_not_hedged, test_slow_primary_is_hedged_and_cancelled,
+                 test_failure_moves_on_without_waiting_for_deadline, test_all_failing_raises,
+                 test_order_adapts_to_latency_and_keep_first, test_slow_vision_model_is_not_hedged,
+                 test_stream_hedged_races_on_first_token):
+        test()
+    print("✅ Hedged LLM requests behave as expected")
@@ -0,0 +1,108 @@
+import sys
+import os
+import json
+import asyncio
+from collections import Counter
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+# Ensure we can import from local directory
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from price_cache import PriceCache
+from routes import market
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "commodityonline")
+
+with open(os.path.join(FIXTURE_DIR, "tomato_tamil-nadu_madurai.html"), encoding="utf-8") as f:
+    DISTRICT_PAGE = f.read()
+with open(os.path.join(FIXTURE_DIR, "rice_tamil-nadu.html"), encoding="utf-8") as f:
+    STATE_PAGE = f.read()
+
+class FakeSite:
+    """market_client.get_page stand-in: only Madurai and Nashik have district pages."""
+
+    def __init__(self, delays=None):
+        self.requests = Counter()
+        self.delays = delays or {}  # district slug -> seconds before its page (or 404) comes back
+
+    async def get_page(self, path):
+        self.requests[path] += 1
+        parts = path.strip("/").split("/")  # mandiprices, commodity, state[, district]
+        await asyncio.sleep(self.delays.get(parts[-1], 0.01))
+        if len(parts) == 4:
+            return (200, DISTRICT_PAGE) if parts[3] in ("madurai", "nashik") else (404, None)
+        return 200, STATE_PAGE
+
+def client_for(monkeypatch, site, ttl=60):
+    monkeypatch.setattr(market.market_client, "get_page", site.get_page)
+    monkeypatch.setattr(market, "price_cache", PriceCache(ttl=ttl))
+    app = FastAPI()
+    app.include_router(market.router, prefix="/api/market")
+    return TestClient(app)
+
+def bulk(client, pairs):
+    response = client.post("/api/market/prices/bulk",
+                           json={"locations": [{"state": s, "district": d} for s, d in pairs]})
+    assert response.status_code == 200
+    if response.headers["content-type"].startswith("application/json"):
+        return response.json()
+    return [json.loads(line) for line in response.text.splitlines()]
+
+def test_pages_are_fetched_once_per_call(monkeypatch):
+    site = FakeSite()
+    client = client_for(monkeypatch, site, ttl=0)  # no price cache: every district is scraped
+    pairs = [("Tamil Nadu", d) for d in ("Madurai", "Salem", "Erode", "Theni")] + \
+            [("Maharashtra", d) for d in ("Nashik", "Pune")] + [("tamil nadu", "SALEM ")]
+    lines = bulk(client, pairs)
+
+    districts, summary = lines[:-1], lines[-1]["summary"]
+    assert len(districts) == 6  # the repeated Salem is answered once
+    commodities = len(market.COMMODITIES)
+    # Every district page once, every state page once (not once per district)
+    assert all(count == 1 for count in site.requests.values())
+    assert len(site.requests) == commodities * (6 + 2)
+    # Madurai and Nashik answer before the State hedge: only the 4 fallbacks look up a State page
+    assert summary == dict(summary, locations=6, pages_fetched=commodities * 8, page_lookups=commodities * 10)
+
+    by_district = {line["district"]: line["prices"] for line in districts}
+    assert {row["market"] for row in by_district["Madurai"]} == {"Madurai Mandi"}
+    assert {row["market"] for row in by_district["Salem"]} == {"Tamil Nadu Avg"}
+    assert by_district["Salem"][0]["price"] == 26.05 and by_district["Madurai"][0]["price"] == 23.12
+
+def test_state_page_is_only_requested_when_needed(monkeypatch):
+    monkeypatch.setattr(market, "MARKET_STATE_HEDGE_MS", 100)
+    site = FakeSite(delays={"madurai": 0.01, "nashik": 0.3})
+    client = client_for(monkeypatch, site, ttl=0)
+    client.get("/api/market/prices", params={"state": "Tamil Nadu", "district": "Madurai"})
+    assert all(len(path.strip("/").split("/")) == 4 for path in site.requests)  # district pages only
+
+    # A slow district page is hedged with the state page, but its own price still wins
+    prices = client.get("/api/market/prices", params={"state": "Maharashtra", "district": "Nashik"}).json()
+    assert site.requests["/mandiprices/rice/maharashtra"] == 1
+    assert {row["market"] for row in prices} == {"Nashik Mandi"}
+
+def test_prices_match_the_single_district_route(monkeypatch):
+    client = client_for(monkeypatch, FakeSite(), ttl=0)
+    lines = bulk(client, [("Tamil Nadu", "Madurai"), ("Tamil Nadu", "Salem")])
+    for line in lines[:-1]:
+        single = client.get("/api/market/prices", params={"state": line["state"], "district": line["district"]}).json()
+        assert line["prices"] == single
+
+def test_districts_stream_in_completion_order(monkeypatch):
+    site = FakeSite(delays={"madurai": 0.3})
+    client = client_for(monkeypatch, site)
+    lines = bulk(client, [("Tamil Nadu", "Madurai"), ("Tamil Nadu", "Salem")])
+    assert [line.get("district") for line in lines] == ["Salem", "Madurai", None]
+
+    # Cached districts don't fetch anything
+    fetched = sum(site.requests.values())
+    lines = bulk(client, [("Tamil Nadu", "Madurai"), ("Tamil Nadu", "Salem")])
+    assert sum(site.requests.values()) == fetched and lines[-1]["summary"]["pages_fetched"] == 0
+
+def test_location_list_is_validated(monkeypatch):
+    client = client_for(monkeypatch, FakeSite())
+    assert "error" in bulk(client, [])
+    monkeypatch.setattr(market, "MARKET_BULK_MAX_LOCATIONS", 2)
+    assert "error" in bulk(client, [("Tamil Nadu", d) for d in ("Madurai", "Salem", "Erode")])
@@ -0,0 +1,60 @@
+import sys
+import os
+import asyncio
+
+import pytest
+
+# Ensure we can import from local directory
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from inference_pool import inference_pool
+from micro_batcher import MicroBatcher
+from model_registry import registry
+
+class FakeModel:
+    """batch_fn stand-in: doubles each row and remembers the batches it was given."""
+
+    def __init__(self, result=None):
+        self.batches = []
+        self.result = result  # returned (or raised) instead of the doubled rows
+
+    def __call__(self, rows):
+        self.batches.append(list(rows))
+        if isinstance(self.result, Exception):
+            raise self.result
+        return self.result if self.result is not None else [row * 2 for row in rows]
+
+@pytest.fixture(autouse=True)
+def no_pool(monkeypatch):
+    # Run batch_fn on the default thread pool, not in worker processes
+    monkeypatch.setattr(inference_pool, "executor", None)
+    monkeypatch.setattr(registry, "stats", {})  # keep fake batches out of the real version stats
+
+def submit_all(batcher, rows, return_exceptions=False):
+    async def scenario():
+        return await asyncio.gather(*(batcher.submit(row) for row in rows), return_exceptions=return_exceptions)
+    return asyncio.run(scenario())
+
+def test_full_batches_flush_without_waiting():
+    model = FakeModel()
+    batcher = MicroBatcher("crop", model, max_batch=4, max_wait_ms=10_000)
+    assert submit_all(batcher, range(8)) == [0, 2, 4, 6, 8, 10, 12, 14]
+    assert model.batches == [[0, 1, 2, 3], [4, 5, 6, 7]]
+
+def test_partial_batch_flushes_on_the_timer():
+    model = FakeModel()
+    batcher = MicroBatcher("crop", model, max_batch=64, max_wait_ms=20)
+    assert submit_all(batcher, [3, 1, 2]) == [6, 2, 4]  # each caller gets its own row back
+    assert model.batches == [[3, 1, 2]]
+    stats = batcher.stats()
+    assert stats["total_batches"] == 1 and stats["total_rows"] == 3 and stats["queued_rows"] == 0
+    assert stats["queue_delay_ms"]["p50"] >= 15
+
+def test_batch_error_reaches_every_caller():
+    batcher = MicroBatcher("crop", FakeModel(result={"error": "Model not loaded"}), max_batch=64, max_wait_ms=1)
+    assert submit_all(batcher, [1, 2, 3]) == [{"error": "Model not loaded"}] * 3
+
+def test_exception_reaches_every_caller():
+    batcher = MicroBatcher("crop", FakeModel(result=ValueError("bad row")), max_batch=2, max_wait_ms=1)
+    results = submit_all(batcher, [1, 2, 3], return_exceptions=True)
+    assert len(results) == 3 and all(isinstance(r, ValueError) for r in results)
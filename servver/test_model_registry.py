@@ -0,0 +1,98 @@
+import sys
+import os
+import json
+
+import numpy as np
+import pytest
+
+# Ensure we can import from local directory
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from model_registry import ModelRegistry, BASELINE, FAMILIES
+
+def test_register_activate_rollback(tmp_path):
+    registry = ModelRegistry(root=str(tmp_path))
+    baseline_dir = FAMILIES["crop"]["baseline_dir"]
+    if not os.path.exists(os.path.join(baseline_dir, "crop_model.pkl")):
+        pytest.skip("crop model not trained")
+
+    assert registry.active["crop"] == BASELINE
+    version = registry.register("crop", baseline_dir, "v2", export_flat=False)
+    assert [v["version"] for v in registry.list_versions("crop")] == [BASELINE, "v2"]
+
+    before = registry.get("crop")
+    registry.activate("crop", "v2")
+    after = registry.get("crop")
+    # A new object was swapped in; anyone still holding the old one keeps working
+    assert after is not before
+    X = np.zeros((1, len(before.feature_order)))
+    np.testing.assert_allclose(after.model.predict_proba(X), before.model.predict_proba(X))
+
+    # The switch is persisted for the next process
+    with open(tmp_path / "registry.json") as f:
+        assert json.load(f)["crop"]["active"] == version
+    assert ModelRegistry(root=str(tmp_path)).active["crop"] == version
+
+    assert registry.rollback_target("crop") == BASELINE
+    registry.activate("crop", BASELINE, rollback=True)
+    assert registry.active["crop"] == BASELINE
+    with pytest.raises(ValueError):
+        registry.rollback_target("crop")
+
+def test_workers_follow_each_other(tmp_path):
+    # Two uvicorn workers: separate registries on the same registry.json
+    worker_a, worker_b = ModelRegistry(root=str(tmp_path)), ModelRegistry(root=str(tmp_path))
+    baseline_dir = FAMILIES["crop"]["baseline_dir"]
+    if not os.path.exists(os.path.join(baseline_dir, "crop_model.pkl")):
+        pytest.skip("crop model not trained")
+    worker_a.register("crop", baseline_dir, "v2", export_flat=False)
+    assert worker_b.refresh() == {}
+
+    worker_a.activate("crop", "v2", load=False)
+    assert worker_b.refresh() == {"crop": "v2"}
+    worker_b.activate("crop", "v2", load=False, persist=False)
+    assert worker_b.active["crop"] == "v2" and worker_b.refresh() == {}
+
+    # A rollback handled by worker B sees the history worker A wrote
+    assert worker_b.rollback_target("crop") == BASELINE
+    worker_b.activate("crop", BASELINE, load=False, rollback=True)
+    assert worker_a.refresh() == {"crop": BASELINE}
+    with open(tmp_path / "registry.json") as f:
+        assert json.load(f)["crop"] == {"active": BASELINE, "history": [BASELINE]}
+
+def test_rejects_missing_and_invalid_versions(tmp_path):
+    registry = ModelRegistry(root=str(tmp_path))
+    with pytest.raises(ValueError):
+        registry.activate("crop", "does-not-exist")
+    with pytest.raises(ValueError):
+        registry.activate("crop", "../trained_model")
+    with pytest.raises(ValueError):
+        registry.check("unknown", BASELINE)
+
+    # An incomplete version is listed but can't be activated
+    os.makedirs(tmp_path / "fertilizer" / "partial")
+    assert not registry.list_versions("fertilizer")[1]["complete"]
+    with pytest.raises(ValueError):
+        registry.activate("fertilizer", "partial")
+    assert registry.active["fertilizer"] == BASELINE
+
+def test_latency_stats_per_version(tmp_path):
+    registry = ModelRegistry(root=str(tmp_path))
+    for seconds in (0.001, 0.002, 0.003):
+        registry.record("fertilizer", BASELINE, seconds, rows=4)
+    registry.record("fertilizer", BASELINE, 0.010, rows=1, error=True)
+
+    stats = registry.list_versions("fertilizer")[0]["stats"]
+    assert stats["batches"] == 4
+    assert stats["rows"] == 13
+    assert stats["errors"] == 1
+    assert stats["latency_ms"]["p50"] == pytest.approx(2.5)
+
+if __name__ == "__main__":
+    import tempfile
+    from pathlib import Path
+    for test in (test_register_activate_rollback, test_workers_follow_each_other,
+                 test_rejects_missing_and_invalid_versions, test_latency_stats_per_version):
+        with tempfile.TemporaryDirectory() as tmp:
+            test(Path(tmp))
+    print("✅ Model registry tests passed")
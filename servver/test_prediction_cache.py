@@ -0,0 +1,78 @@
+import sys
+import os
+import time
+
+# Ensure we can import from local directory
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import prediction_cache
+from prediction_cache import PredictionCache, CROP_STEPS, FERTILIZER_STEPS, FERTILIZER_CATEGORICAL
+
+READING = {"N": 90.4, "P": 42, "K": 43.2, "temperature": 20.87, "humidity": 82.1, "ph": 6.54, "rainfall": 202.9}
+
+def test_nearby_readings_share_a_key():
+    cache = PredictionCache("crop", CROP_STEPS)
+    key, quantized = cache.quantize(READING)
+    assert quantized == {"N": 90.0, "P": 42.0, "K": 43.0, "temperature": 21.0, "humidity": 82.0, "ph": 6.5, "rainfall": 203.0}
+    assert cache.quantize(dict(READING, ph=6.46, temperature=20.9))[0] == key
+    assert cache.quantize(dict(READING, ph=6.56))[0] != key
+    # Float noise doesn't leak into the key
+    assert cache.quantize(dict(READING, ph=0.3))[1]["ph"] == 0.3
+
+def test_categorical_fields_match_exactly():
+    cache = PredictionCache("fertilizer", FERTILIZER_STEPS, FERTILIZER_CATEGORICAL)
+    row = {"temperature": 26, "humidity": 52, "moisture": 38, "soil_type": "Sandy", "crop": "Maize",
+           "nitrogen": 37, "potassium": 0, "phosphorus": 0}
+    key, quantized = cache.quantize(row)
+    assert key[:2] == ("Sandy", "Maize") and quantized["crop"] == "Maize"
+    assert cache.quantize(dict(row, crop="Sugarcane"))[0] != key
+    assert cache.quantize(dict(row, humidity=None))[1]["humidity"] is None  # missing readings pass through
+
+def test_step_overrides(monkeypatch):
+    monkeypatch.setattr(prediction_cache, "CACHE_STEPS_OVERRIDE", {"ph": 0.5, "temperature": 2})
+    shared = PredictionCache("crop", CROP_STEPS)
+    assert shared.steps["ph"] == 0.5 and shared.steps["temperature"] == 2
+    assert shared.quantize(dict(READING, ph=6.7))[0] == shared.quantize(dict(READING, ph=6.4))[0]
+
+    # A model's own overrides win over the shared ones; other models are unaffected
+    crop = PredictionCache("crop", CROP_STEPS, overrides={"ph": 0.05})
+    fertilizer = PredictionCache("fertilizer", FERTILIZER_STEPS, FERTILIZER_CATEGORICAL)
+    assert crop.steps["ph"] == 0.05 and crop.steps["temperature"] == 2
+    assert "ph" not in fertilizer.steps and fertilizer.steps["temperature"] == 2
+    assert crop.quantize(READING)[1]["ph"] == 6.55
+
+def test_ttl_expiry():
+    cache = PredictionCache("crop", CROP_STEPS, max_entries=10, ttl=0.05)
+    key, _ = cache.quantize(READING)
+    cache.put(key, ["rice"])
+    assert cache.get(key) == ["rice"]
+    time.sleep(0.1)
+    assert cache.get(key) is None
+    stats = cache.stats()
+    assert stats["hits"] == 1 and stats["misses"] == 1 and stats["expirations"] == 1 and stats["entries"] == 0
+
+def test_least_recently_used_is_evicted():
+    cache = PredictionCache("crop", CROP_STEPS, max_entries=2, ttl=60)
+    keys = [cache.quantize(dict(READING, N=n))[0] for n in (10, 20, 30)]
+    cache.put(keys[0], ["rice"])
+    cache.put(keys[1], ["maize"])
+    cache.get(keys[0])  # the first entry is now the most recently used
+    cache.put(keys[2], ["jute"])
+    assert cache.get(keys[1]) is None
+    assert cache.get(keys[0]) == ["rice"] and cache.get(keys[2]) == ["jute"]
+    assert cache.stats()["evictions"] == 1 and cache.stats()["entries"] == 2
+
+def test_size_zero_disables_the_cache():
+    cache = PredictionCache("crop", CROP_STEPS, max_entries=0, ttl=60)
+    key, _ = cache.quantize(READING)
+    cache.put(key, ["rice"])
+    assert cache.get(key) is None
+    assert cache.stats()["entries"] == 0
+
+if __name__ == "__main__":
+    test_nearby_readings_share_a_key()
+    test_categorical_fields_match_exactly()
+    test_ttl_expiry()
+    test_least_recently_used_is_evicted()
+    test_size_zero_disables_the_cache()
+    print("✅ Prediction cache behaves as expected")
@@ -0,0 +1,125 @@
+import sys
+import os
+import asyncio
+
+# Ensure we can import from local directory
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import price_cache as price_cache_module
+from price_cache import PriceCache
+
+TOMATO = {"id": "tomato", "name": "Tomato", "slug": "tomato"}
+ONION = {"id": "onion", "name": "Onion", "slug": "onion"}
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def time(self):
+        return self.now
+
+class Site:
+    """fetch() stand-in: counts calls and returns the current price (None = not found)."""
+
+    def __init__(self, price=24.5, delay=0.01):
+        self.price = price
+        self.delay = delay
+        self.calls = 0
+
+    def fetcher(self, commodity):
+        async def fetch():
+            self.calls += 1
+            await asyncio.sleep(self.delay)
+            if self.price is None:
+                return None
+            return {"commodity": commodity["id"], "price": self.price, "change": 0, "market": "Madurai Mandi"}
+        return fetch
+
+def run(coro):
+    return asyncio.run(coro)
+
+def with_clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(price_cache_module.time, "time", clock.time)
+    return clock
+
+def test_concurrent_misses_share_one_fetch(monkeypatch):
+    with_clock(monkeypatch)
+    cache, site = PriceCache(ttl=60), Site()
+
+    async def burst():
+        return await asyncio.gather(*(cache.get("Tamil Nadu", "Madurai", TOMATO, site.fetcher(TOMATO)) for _ in range(20)))
+
+    rows = run(burst())
+    assert site.calls == 1
+    assert all(row["price"] == 24.5 and row["age_seconds"] == 0 for row in rows)
+    assert cache.stats()["misses"] == 1 and cache.stats()["coalesced"] == 19
+
+    # Same location, other spelling: cached
+    assert run(cache.get(" tamil nadu", "MADURAI", TOMATO, site.fetcher(TOMATO)))["price"] == 24.5
+    assert site.calls == 1
+
+def test_stale_rows_are_served_and_refreshed_in_background(monkeypatch):
+    clock = with_clock(monkeypatch)
+    cache, site = PriceCache(ttl=60, max_age=3600), Site(price=20.0)
+
+    async def scenario():
+        await cache.get("Tamil Nadu", "Madurai", TOMATO, site.fetcher(TOMATO))
+        clock.now += 120
+        site.price = 22.5
+        stale = await cache.get("Tamil Nadu", "Madurai", TOMATO, site.fetcher(TOMATO))
+        await asyncio.gather(*cache.background)
+        fresh = await cache.get("Tamil Nadu", "Madurai", TOMATO, site.fetcher(TOMATO))
+        return stale, fresh
+
+    stale, fresh = run(scenario())
+    assert stale["price"] == 20.0 and stale["age_seconds"] == 120 and stale["change"] == 0
+    assert fresh["price"] == 22.5 and fresh["age_seconds"] == 0 and fresh["change"] == 2.5
+    assert site.calls == 2 and cache.stats()["stale_hits"] == 1 and cache.stats()["refreshes"] == 1
+
+    # A refresh with the same price keeps the change
+    async def same_price():
+        clock.now += 120
+        await cache.get("Tamil Nadu", "Madurai", TOMATO, site.fetcher(TOMATO))
+        await asyncio.gather(*cache.background)
+        return await cache.get("Tamil Nadu", "Madurai", TOMATO, site.fetcher(TOMATO))
+
+    assert run(same_price())["change"] == 2.5
+
+def test_failed_refresh_keeps_last_price_and_backs_off(monkeypatch):
+    clock = with_clock(monkeypatch)
+    cache, site = PriceCache(ttl=60, max_age=3600, retry=300), Site(price=20.0)
+
+    async def scenario():
+        await cache.get("Tamil Nadu", "Madurai", TOMATO, site.fetcher(TOMATO))
+        site.price = None  # site down
+        clock.now += 120
+        await cache.get("Tamil Nadu", "Madurai", TOMATO, site.fetcher(TOMATO))
+        await asyncio.gather(*cache.background)
+        clock.now += 10
+        return await cache.get("Tamil Nadu", "Madurai", TOMATO, site.fetcher(TOMATO))
+
+    row = run(scenario())
+    assert row["price"] == 20.0 and row["age_seconds"] == 130
+    assert site.calls == 2  # no third attempt within the retry window
+    assert cache.stats()["fetch_failures"] == 1
+
+    # Past max_age the old price isn't served any more
+    clock.now += 4000
+    assert run(cache.get("Tamil Nadu", "Madurai", TOMATO, site.fetcher(TOMATO))) is None
+
+def test_locations_are_bounded(monkeypatch):
+    with_clock(monkeypatch)
+    cache, site = PriceCache(ttl=60, max_locations=2), Site()
+    for district in ("Madurai", "Salem", "Madurai", "Erode"):
+        for commodity in (TOMATO, ONION):
+            run(cache.get("Tamil Nadu", district, commodity, site.fetcher(commodity)))
+    assert cache.stats()["locations"] == 2 and cache.stats()["entries"] == 4
+    assert cache.stats()["evictions"] == 1
+    assert ("tamil nadu", "salem") not in cache.locations  # least recently used went first
+
+def test_zero_ttl_disables_the_cache():
+    cache, site = PriceCache(ttl=0), Site()
+    run(cache.get("Tamil Nadu", "Madurai", TOMATO, site.fetcher(TOMATO)))
+    run(cache.get("Tamil Nadu", "Madurai", TOMATO, site.fetcher(TOMATO)))
+    assert site.calls == 2
@@ -0,0 +1,106 @@
+import sys
+import os
+import asyncio
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+# Ensure we can import from local directory
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from price_history import PriceHistory, aggregate_series, MARKET_UTC_OFFSET
+
+def random_points(n=500, seed=0):
+    rng = np.random.default_rng(seed)
+    start = datetime(2026, 7, 1)
+    ts = [start + timedelta(minutes=int(m)) for m in np.sort(rng.integers(0, 60 * 24 * 90, n))]
+    prices = np.round(20 + np.cumsum(rng.normal(0, 0.3, n)), 2)
+    order = rng.permutation(n)  # storage order doesn't matter
+    return [ts[i] for i in order], prices[order]
+
+def pandas_reference(ts, prices, rule):
+    frame = pd.Series(prices, index=pd.DatetimeIndex(ts) + MARKET_UTC_OFFSET).sort_index()
+    grouped = frame.resample(rule, label="left", closed="left")
+    out = pd.DataFrame({
+        "open": grouped.first(), "close": grouped.last(), "min": grouped.min(), "max": grouped.max(),
+        "avg": grouped.mean(), "points": grouped.count(),
+    })
+    return out[out["points"] > 0]
+
+def test_daily_and_weekly_match_pandas():
+    ts, prices = random_points()
+    for interval, rule in (("day", "D"), ("week", "W-MON")):
+        series = aggregate_series(ts, prices, interval)
+        expected = pandas_reference(ts, prices, rule)
+        assert [s["date"] for s in series] == [str(d.date()) for d in expected.index]
+        for field in ("open", "close", "min", "max", "avg"):
+            assert np.allclose([s[field] for s in series], expected[field], atol=0.006), (interval, field)
+        assert [s["points"] for s in series] == expected["points"].tolist()
+        assert series[0]["change"] is None
+        assert series[1]["change"] == round(series[1]["close"] - series[0]["close"], 2)
+
+def test_buckets_follow_ist_days_and_monday_weeks():
+    # 18:00 UTC Sunday is 23:30 IST Sunday; 19:00 UTC is already Monday in India
+    ts = [datetime(2026, 10, 11, 18, 0), datetime(2026, 10, 11, 19, 0)]
+    days = aggregate_series(ts, [10.0, 12.0], "day")
+    assert [d["date"] for d in days] == ["2026-10-11", "2026-10-12"]
+    weeks = aggregate_series(ts, [10.0, 12.0], "week")
+    assert [w["date"] for w in weeks] == ["2026-10-05", "2026-10-12"]
+    assert aggregate_series([], [], "day") == []
+
+class FakeCollection:
+    """Just enough of a Motor collection for record() and previous_close()."""
+
+    def __init__(self):
+        self.docs = []
+
+    async def insert_one(self, doc):
+        self.docs.append(doc)
+
+    async def find_one(self, query, projection=None, sort=None):
+        bounds = query["ts"]
+        matches = [d for d in self.docs
+                   if all(d["meta"][k.split(".")[1]] == v for k, v in query.items() if k.startswith("meta."))
+                   and d["ts"] < bounds.get("$lt", datetime.max) and d["ts"] > bounds.get("$gt", datetime.min)]
+        return max(matches, key=lambda d: d["ts"]) if matches else None
+
+def test_previous_close_is_from_an_earlier_ist_day():
+    history = PriceHistory()
+    history.collection = FakeCollection()
+    row = {"commodity": "tomato", "price": 20.0, "market": "Madurai Mandi"}
+
+    async def scenario():
+        await history.record(dict(row, price=18.0), "Tamil Nadu", "Madurai", when=datetime(2026, 10, 15, 10, 0))
+        await history.record(dict(row, price=19.0), "Tamil Nadu", "Madurai", when=datetime(2026, 10, 15, 18, 0))  # 23:30 IST
+        await history.record(dict(row, price=21.0), "tamil nadu ", "MADURAI", when=datetime(2026, 10, 15, 19, 0))  # 16th IST
+        await history.record(dict(row, price=99.0), "Tamil Nadu", "Salem", when=datetime(2026, 10, 15, 12, 0))
+        return await history.previous_close("tomato", "Tamil Nadu", "Madurai", now=datetime(2026, 10, 16, 6, 0))
+
+    assert asyncio.run(scenario()) == {"price": 19.0, "date": "2026-10-15"}
+    assert asyncio.run(PriceHistory().previous_close("tomato", "Tamil Nadu", "Madurai")) is None  # not started
+
+def test_state_averages_are_a_separate_series():
+    history = PriceHistory()
+    history.collection = FakeCollection()
+    mandi = {"commodity": "tomato", "price": 23.0, "market": "Madurai Mandi", "level": "district"}
+    average = {"commodity": "tomato", "price": 26.0, "market": "Tamil Nadu Avg", "level": "state"}
+    day_one, day_two = datetime(2026, 10, 15, 6, 0), datetime(2026, 10, 16, 6, 0)
+
+    async def scenario():
+        await history.record(mandi, "Tamil Nadu", "Madurai", when=day_one)
+        # Salem and Erode have no district page: both fall back to the same state average
+        await history.record(average, "Tamil Nadu", "Salem", when=day_one)
+        await history.record(average, "Tamil Nadu", "Erode", when=day_one + timedelta(minutes=1))
+        return (
+            await history.previous_close("tomato", "Tamil Nadu", "Madurai", "district", now=day_two),
+            await history.previous_close("tomato", "Tamil Nadu", "Salem", "district", now=day_two),
+            await history.previous_close("tomato", "Tamil Nadu", "Erode", "state", now=day_two),
+        )
+
+    madurai, salem_mandi, erode_average = asyncio.run(scenario())
+    assert madurai == {"price": 23.0, "date": "2026-10-15"}
+    assert salem_mandi is None  # a state average is never compared with a mandi price
+    assert erode_average == {"price": 26.0, "date": "2026-10-15"}
+    assert len(history.collection.docs) == 2  # the average was stored once
+    assert history.collection.docs[1]["meta"] == {"commodity": "tomato", "state": "tamil nadu", "district": "", "level": "state"}
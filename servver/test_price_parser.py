@@ -0,0 +1,86 @@
+import sys
+import os
+import glob
+
+# Ensure we can import from local directory
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import price_parser
+from price_parser import parse_price_page_soup, parse_price_page_stream
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "commodityonline")
+
+# Saved CommodityOnline pages and the per-quintal price the old parser read from them
+FIXTURE_PRICES = {
+    "tomato_tamil-nadu_madurai.html": 2312.0,
+    "rice_tamil-nadu.html": 2605.0,
+    "onion_maharashtra_nashik.html": 2121.0,  # no th headers: second-table fallback
+}
+
+# Layouts the table search has to get right
+EDGE_CASES = {
+    "no tables": "<html><body><p>Price 2,000</p></body></html>",
+    "empty page": "",
+    "single table": "<table><tr><td>x</td></tr><tr><td>₹ 1,500</td><td>₹ 1,800</td></tr></table>",
+    "match without data row": "<table><tr><th>Market</th><th>Price</th></tr></table>"
+                              "<table><tr><td>a</td></tr><tr><td>2000</td></tr></table>",
+    "second-table fallback": "<table><tr><td>a</td></tr><tr><td>999</td></tr></table>"
+                             "<table><tr><td>a</td></tr><tr><td>1,234</td></tr></table>",
+    "match after other tables": "<table><tr><td>a</td></tr><tr><td>999</td></tr></table>"
+                                "<table><tr><td>a</td></tr><tr><td>500</td></tr></table>"
+                                "<table><tr><th>Market</th><th>Modal Price</th></tr>"
+                                "<tr><td>Salem</td><td>2,480</td><td>20241225</td></tr><tr><td>9999</td></tr></table>",
+    "headers after the data row": "<table><tr><td>a</td></tr><tr><td>777</td></tr>"
+                                  "<tfoot><tr><th>Market</th><th>Price</th></tr></tfoot></table>"
+                                  "<table><tr><th>Market Price</th></tr><tr><td>888</td></tr></table>",
+    "nested tables": "<table><tr><th>Market</th></tr><tr><td><table><tr><th>Price</th></tr>"
+                     "<tr><td>1,111</td></tr></table></td><td>2222</td></tr></table>",
+    "upper case tags": "<TABLE><TR><TH>MARKET</TH><TH>PRICE</TH></TR><TR><TD>1,500.50</TD></TR></TABLE>",
+    "table markup in a script": "<script>var t='<table><tr><th>market price</th></tr><tr><td>5000</td></tr></table>';</script>"
+                                "<table><tr><th>Market</th><th>Price</th></tr><tr><td>1,200</td></tr></table>",
+}
+
+def read_fixture(name):
+    with open(os.path.join(FIXTURE_DIR, name), encoding="utf-8") as f:
+        return f.read()
+
+def test_fixture_pages_parse_the_same():
+    assert sorted(FIXTURE_PRICES) == sorted(os.path.basename(p) for p in glob.glob(os.path.join(FIXTURE_DIR, "*.html")))
+    for name, price in FIXTURE_PRICES.items():
+        html = read_fixture(name)
+        assert parse_price_page_soup(html) == price, name
+        assert parse_price_page_stream(html) == price, name
+
+def test_edge_cases_parse_the_same():
+    for name, html in EDGE_CASES.items():
+        assert parse_price_page_stream(html) == parse_price_page_soup(html), name
+
+def test_unclosed_rows_follow_html_rules():
+    # html.parser nests an unclosed <tr> in the one before it (the soup parser
+    # then also sees 9999); libxml2 closes it, so the first data row is read
+    html = "<table><tr><th>Market<th>Price<tr><td>12/10/2026<td>₹ 1,572<td>₹ 2,312<tr><td>9999</table>"
+    assert parse_price_page_stream(html) == 2312.0
+
+class RecordingPage(str):
+    """A page that records how far the parser read into it."""
+
+    def __getitem__(self, key):
+        self.read_up_to = max(getattr(self, "read_up_to", 0), key.stop)
+        return str.__getitem__(self, key)
+
+def test_stream_parser_stops_after_the_first_data_row(monkeypatch):
+    monkeypatch.setattr(price_parser, "STREAM_CHUNK_CHARS", 1024)
+    html = read_fixture("tomato_tamil-nadu_madurai.html")
+    end = html.rindex("</table>") + len("</table>")
+    # Thousands of further tables the parser should never reach
+    html = html[:end] + "<table><tr><td>1</td></tr></table>" * 5000 + html[end:]
+    page = RecordingPage(html)
+    assert parse_price_page_stream(page) == 2312.0
+    first_data_row_end = html.index("</tr>", html.index("12/10/2026"))
+    assert page.read_up_to < first_data_row_end + 1024
+
+def test_parser_is_selected_by_env(monkeypatch):
+    html = read_fixture("rice_tamil-nadu.html")
+    for mode in price_parser.PARSERS:
+        monkeypatch.setattr(price_parser, "MARKET_PARSER", mode)
+        assert price_parser.parse_price_page(html) == 2605.0
@@ -0,0 +1,92 @@
+import sys
+import os
+import time
+
+# Ensure we can import from local directory
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from response_cache import SemanticResponseCache, embed, normalize_question
+
+CONTEXT = {
+    "name": "Farmer",
+    "location": "Guntur, Andhra Pradesh",
+    "soil": {"type": "Black", "waterSource": "Canal"},
+    "sensors": {"ph": 6.8, "n": 140, "p": 45, "k": 60, "moisture": 42},
+}
+ANSWER = "Apply urea in two splits: at tillering and at panicle initiation."
+
+def similarity(a, b):
+    return float(embed(normalize_question(a)) @ embed(normalize_question(b)))
+
+def test_paraphrases_are_close_and_different_questions_are_not():
+    base = "when to apply urea for paddy"
+    assert similarity(base, "When should I apply urea to my paddy?") > 0.95
+    for other in ("how much urea for paddy", "when to apply urea for wheat", "when to apply DAP for paddy"):
+        assert similarity(base, other) < 0.8, other
+
+def test_hit_requires_same_context():
+    cache = SemanticResponseCache(max_entries=10, ttl=60, threshold=0.85)
+    cache.put("When to apply urea for paddy?", "en", CONTEXT, ANSWER)
+
+    answer, score = cache.get("when should i apply urea for paddy", "en", CONTEXT)
+    assert answer == ANSWER and score > 0.85
+    # Same question, different language / soil / sensor band: no hit
+    assert cache.get("When to apply urea for paddy?", "hi", CONTEXT) is None
+    assert cache.get("When to apply urea for paddy?", "en", dict(CONTEXT, soil={"type": "Red", "waterSource": "Canal"})) is None
+    assert cache.get("When to apply urea for paddy?", "en", dict(CONTEXT, sensors=dict(CONTEXT["sensors"], ph=5.1))) is None
+    # A reading in the same band still hits
+    assert cache.get("When to apply urea for paddy?", "en", dict(CONTEXT, sensors=dict(CONTEXT["sensors"], ph=6.6))) is not None
+
+    stats = cache.stats()
+    assert stats["hits"] == 2 and stats["misses"] == 3
+
+def test_ttl_and_size_limit():
+    cache = SemanticResponseCache(max_entries=2, ttl=0.05, threshold=0.85)
+    cache.put("when to apply urea for paddy", "en", CONTEXT, ANSWER)
+    time.sleep(0.1)
+    assert cache.get("when to apply urea for paddy", "en", CONTEXT) is None
+    assert cache.stats()["expirations"] == 1
+
+    cache.ttl = 60
+    for question in ("when to apply urea for paddy", "how to control stem borer", "when to sow cotton"):
+        cache.put(question, "en", CONTEXT, ANSWER)
+    assert cache.stats()["entries"] == 2
+    assert cache.stats()["evictions"] == 1
+    assert cache.get("when to apply urea for paddy", "en", CONTEXT) is None  # least recently used went first
+
+def test_personal_answers_are_not_shared():
+    cache = SemanticResponseCache(max_entries=10, ttl=60, threshold=0.85)
+    ramesh = dict(CONTEXT, name="Ramesh")
+    cache.put("when to apply urea for paddy", "en", ramesh, "Ramesh, apply urea in two splits.")
+    assert cache.get("when to apply urea for paddy", "en", ramesh) is not None
+    assert cache.get("when to apply urea for paddy", "en", dict(CONTEXT, name="Suresh")) is None
+
+def test_negated_questions_do_not_share_answers():
+    # 0.847 apart: a threshold a hair lower would serve one for the other
+    assert similarity("when not to apply urea for paddy", "when to apply urea for paddy") > 0.84
+    cache = SemanticResponseCache(max_entries=10, ttl=60, threshold=0.8)
+    cache.put("when to apply urea for paddy", "en", CONTEXT, ANSWER)
+    assert cache.get("when not to apply urea for paddy", "en", CONTEXT) is None
+    assert cache.get("When should I apply urea for paddy?", "en", CONTEXT)[0] == ANSWER
+
+    cache.put("when not to apply urea for paddy", "en", CONTEXT, "Not before transplanting.")
+    assert cache.get("When not to apply urea to my paddy?", "en", CONTEXT)[0] == "Not before transplanting."
+    assert cache.get("when to apply urea for paddy", "en", CONTEXT)[0] == ANSWER
+
+def test_structured_context_fields():
+    # userContext is free-form: fields may be objects, numbers or lists
+    cache = SemanticResponseCache(max_entries=10, ttl=60, threshold=0.85)
+    context = dict(CONTEXT, name={"first": "Ramesh"}, location={"state": "TN", "district": "Madurai"},
+                   crop=["paddy"], soil="Black", sensors=None)
+    cache.put("when to apply urea for paddy", "en", context, ANSWER)
+    assert cache.get("when to apply urea for paddy", "en", context)[0] == ANSWER
+    assert cache.get("when to apply urea for paddy", "en", dict(context, location={"state": "KA"})) is None
+
+if __name__ == "__main__":
+    test_paraphrases_are_close_and_different_questions_are_not()
+    test_hit_requires_same_context()
+    test_ttl_and_size_limit()
+    test_personal_answers_are_not_shared()
+    test_negated_questions_do_not_share_answers()
+    test_structured_context_fields()
+    print("✅ Response cache behaves as expected")
@@ -0,0 +1,91 @@
+import sys
+import os
+import asyncio
+
+# Ensure we can import from local directory
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from pymongo.errors import DuplicateKeyError
+
+import scheme_audio as scheme_audio_module
+from scheme_audio import SchemeAudioJob
+
+class FakeLeases:
+    """Just enough of db.job_leases: a conditional upsert on _id, like MongoDB's."""
+
+    def __init__(self):
+        self.docs = {}
+
+    def _matches(self, doc, query):
+        return any(
+            all(doc.get(field) == value if not isinstance(value, dict) else doc.get(field) < value["$lt"]
+                for field, value in condition.items())
+            for condition in query["$or"]
+        )
+
+    async def find_one_and_update(self, query, update, upsert=False, return_document=None):
+        doc = self.docs.get(query["_id"])
+        if doc is None:
+            doc = self.docs[query["_id"]] = {"_id": query["_id"]}
+        elif not self._matches(doc, query):
+            raise DuplicateKeyError("E11000 duplicate key")  # the upsert's insert collides
+        doc.update(update["$set"])
+        return dict(doc)
+
+    async def delete_one(self, query):
+        if self.docs.get(query["_id"], {}).get("owner") == query["owner"]:
+            del self.docs[query["_id"]]
+
+class FakeSchemes:
+    def __init__(self, ids):
+        self.ids = ids
+
+    async def find(self, query, projection):
+        for scheme_id in self.ids:
+            yield {"_id": scheme_id}
+
+class FakeDB:
+    def __init__(self, scheme_ids):
+        self.job_leases = FakeLeases()
+        self.schemes = FakeSchemes(scheme_ids)
+
+def worker_job(db, processed):
+    job = SchemeAudioJob()
+
+    async def process(scheme_id, lang):
+        processed.append((job.owner, scheme_id, lang))
+        await asyncio.sleep(0.01)
+
+    job.process = process
+    job.db = db
+    job.queue = asyncio.Queue()
+    job.workers = [asyncio.ensure_future(job._worker())]
+    return job
+
+def test_backfill_runs_in_one_worker(monkeypatch):
+    monkeypatch.setattr(scheme_audio_module, "SCHEME_AUDIO_LANGUAGES", ["en", "hi"])
+    db = FakeDB(["s1", "s2"])
+    processed = []
+
+    async def boot():
+        # Three uvicorn workers start at the same time
+        jobs = [worker_job(db, processed) for _ in range(3)]
+        await asyncio.gather(*(job._backfill() for job in jobs))
+        for job in jobs:
+            await job.stop()
+
+    asyncio.run(boot())
+    assert sorted(item[1:] for item in processed) == [("s1", "en"), ("s1", "hi"), ("s2", "en"), ("s2", "hi")]
+    assert len({owner for owner, _, _ in processed}) == 1
+    assert db.job_leases.docs == {}  # released once the queue drained
+
+    # A later boot (e.g. a restart) can take it again
+    processed.clear()
+
+    async def restart():
+        job = worker_job(db, processed)
+        await job._backfill()
+        await job.stop()
+
+    asyncio.run(restart())
+    assert len(processed) == 4
@@ -0,0 +1,136 @@
+import sys
+import os
+import asyncio
+import tempfile
+import threading
+
+import pytest
+
+# Ensure we can import from local directory
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import edge_tts
+from tts_cache import TTSCache, cache_key
+
+VOICE = "hi-IN-SwaraNeural"
+
+class FakeCommunicate:
+    """Stands in for edge_tts.Communicate (which needs the network): 4 chunks per text."""
+    calls = 0
+    fail_after = None
+
+    def __init__(self, text, voice):
+        self.text = text
+        FakeCommunicate.calls += 1
+
+    async def stream(self):
+        yield {"type": "WordBoundary", "offset": 0}
+        for i in range(4):
+            if FakeCommunicate.fail_after == i:
+                raise RuntimeError("connection reset")
+            await asyncio.sleep(0)
+            yield {"type": "audio", "data": f"{self.text}:{i};".encode()}
+
+@pytest.fixture
+def cache(monkeypatch):
+    monkeypatch.setattr(edge_tts, "Communicate", FakeCommunicate)
+    FakeCommunicate.calls = 0
+    FakeCommunicate.fail_after = None
+    with tempfile.TemporaryDirectory() as root:
+        yield TTSCache(root=root, max_bytes=1024 * 1024)
+
+async def collect(chunks):
+    return b"".join([chunk async for chunk in chunks])
+
+def test_streams_then_serves_from_disk(cache):
+    key = cache_key("Apply urea  today", VOICE)
+    assert cache.lookup(key) is None
+
+    audio = asyncio.run(collect(cache.synthesize("Apply urea  today", VOICE)))
+    assert audio == b"Apply urea today:0;Apply urea today:1;Apply urea today:2;Apply urea today:3;"
+
+    path = cache.lookup(cache_key(" Apply urea today ", VOICE))  # same text after whitespace normalization
+    assert path and open(path, "rb").read() == audio
+    assert cache.lookup(cache_key("Apply urea today", "en-US-ChristopherNeural")) is None  # other voice
+    assert FakeCommunicate.calls == 1
+    assert cache.stats()["hits"] == 1
+
+def test_partial_audio_is_not_cached(cache):
+    FakeCommunicate.fail_after = 2
+    with pytest.raises(RuntimeError):
+        asyncio.run(collect(cache.synthesize("Irrigate tomorrow", VOICE)))
+
+    async def abandon():
+        FakeCommunicate.fail_after = None
+        chunks = cache.synthesize("Irrigate tomorrow", VOICE)
+        await chunks.__anext__()
+        await chunks.aclose()  # client went away
+
+    asyncio.run(abandon())
+    assert cache.lookup(cache_key("Irrigate tomorrow", VOICE)) is None
+    assert [name for _, _, names in os.walk(cache.root) for name in names] == []
+    assert cache.stats()["synth_failures"] == 1
+
+def test_lru_eviction_by_size_and_restart(cache):
+    texts = [f"advisory {i}" for i in range(4)]
+    clip_size = len(asyncio.run(collect(cache.synthesize(texts[0], VOICE))))
+    cache.max_bytes = clip_size * 3
+
+    asyncio.run(collect(cache.synthesize(texts[1], VOICE)))
+    asyncio.run(collect(cache.synthesize(texts[2], VOICE)))
+    assert cache.lookup(cache_key(texts[0], VOICE))  # played again, so texts[1] is now least recent
+    asyncio.run(collect(cache.synthesize(texts[3], VOICE)))
+
+    assert cache.stats()["evictions"] == 1
+    assert cache.lookup(cache_key(texts[1], VOICE)) is None
+    assert not os.path.exists(cache.path(cache_key(texts[1], VOICE)))
+
+    # A new process rebuilds the index from the files on disk
+    reopened = TTSCache(root=cache.root, max_bytes=cache.max_bytes)
+    assert reopened.stats()["clips"] == 3
+    assert reopened.stats()["size_mb"] == cache.stats()["size_mb"]
+
+def test_workers_share_the_directory(cache, monkeypatch):
+    # Two uvicorn workers: separate caches on the same directory, both indexed before any clip exists
+    other = TTSCache(root=cache.root, max_bytes=cache.max_bytes)
+    assert other.stats()["clips"] == 0 and cache.stats()["clips"] == 0
+
+    audio = asyncio.run(collect(cache.synthesize("Spray neem oil", VOICE)))
+    key = cache_key("Spray neem oil", VOICE)
+    assert other.contains(key)
+    assert open(other.lookup(key), "rb").read() == audio
+    assert other.stats()["clips"] == 1 and FakeCommunicate.calls == 1
+
+    # Clips written elsewhere count against the budget after a rescan
+    asyncio.run(collect(cache.synthesize("Sow after rain", VOICE)))
+    monkeypatch.setattr("tts_cache.TTS_CACHE_RESCAN_SECONDS", 0)
+    assert other.stats()["clips"] == 2
+
+def test_rescan_walks_the_directory_off_the_event_loop(cache, monkeypatch):
+    other = TTSCache(root=cache.root, max_bytes=cache.max_bytes)
+    asyncio.run(collect(cache.synthesize("Spray neem oil", VOICE)))
+    assert other.stats()["clips"] == 1
+    asyncio.run(collect(cache.synthesize("Sow after rain", VOICE)))
+
+    walks = []
+    walk = os.walk
+
+    def recording_walk(root):
+        walks.append(threading.current_thread())
+        return walk(root)
+
+    monkeypatch.setattr("tts_cache.os.walk", recording_walk)
+    monkeypatch.setattr("tts_cache.TTS_CACHE_RESCAN_SECONDS", 0)
+
+    async def request():
+        key = cache_key("Spray neem oil", VOICE)
+        assert other.lookup(key)  # answered from the current index while the rescan runs
+        assert len(other.index) == 1 and not walks
+        await other.rescan_task
+        return len(other.index)
+
+    assert asyncio.run(request()) == 2
+    assert len(walks) == 1 and walks[0] is not threading.main_thread()
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
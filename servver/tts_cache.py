@@ -0,0 +1,240 @@
+import os
+import time
+import asyncio
+import uuid
+import hashlib
+import unicodedata
+from collections import OrderedDict
+
+# Configuration
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+TTS_CACHE_DIR = os.getenv("TTS_CACHE_DIR", os.path.join(BASE_DIR, "tts_cache"))
+TTS_CACHE_MAX_MB = float(os.getenv("TTS_CACHE_MAX_MB", "500"))  # disk budget; least recently played files go first
+DEFAULT_VOICE = "en-US-ChristopherNeural"
+STALE_TMP_SECONDS = 3600                                         # older .tmp files are leftovers of a crashed synthesis
+TTS_CACHE_RESCAN_SECONDS = float(os.getenv("TTS_CACHE_RESCAN_SECONDS", "600"))  # re-read the directory (other workers' clips)
+
+# Map languages to Edge TTS voices
+# List: edge-tts --list-voices
+VOICE_MAP = {
+    "en": "en-US-ChristopherNeural",       # English (US)
+    "hi": "hi-IN-SwaraNeural",             # Hindi
+    "ta": "ta-IN-PallaviNeural",           # Tamil
+    "te": "te-IN-MohanNeural",             # Telugu
+    "kn": "kn-IN-GaganNeural",             # Kannada
+    "ml": "ml-IN-SobhanaNeural",           # Malayalam
+    "bn": "bn-IN-BashkarNeural",           # Bengali
+    "gu": "gu-IN-DhwaniNeural",            # Gujarati
+    "mr": "mr-IN-AarohiNeural",            # Marathi
+    "ur": "ur-IN-GulshanNeural"            # Urdu
+}
+
+def voice_for(lang):
+    return VOICE_MAP.get(lang, DEFAULT_VOICE)
+
+def normalize_text(text):
+    """Texts that differ only in Unicode form or surrounding/repeated whitespace sound the same."""
+    return " ".join(unicodedata.normalize("NFC", text or "").split())
+
+def cache_key(text, voice):
+    return hashlib.sha256(f"{voice}\n{normalize_text(text)}".encode("utf-8")).hexdigest()
+
+class TTSCache:
+    """
+    Content-addressed store of synthesized speech: one MP3 per (text, voice)
+    at <dir>/<key[:2]>/<key>.mp3, where key = sha256(voice + text).
+
+    Files are written to a temporary name while edge_tts streams and renamed
+    into place only once synthesis finished, so a half-written file is never
+    served. The index (key -> size, in LRU order) is rebuilt from the
+    directory on first use, ordered by modification time; a hit touches the
+    file's mtime so the order survives restarts.
+
+    The directory is shared by every uvicorn worker: a clip missing from
+    this worker's index is still found on disk (and adopted), and the index
+    is rebuilt every TTS_CACHE_RESCAN_SECONDS so eviction accounts for the
+    clips the other workers wrote. Inside the event loop that rescan walks
+    the directory in a worker thread; requests keep using the current index
+    until it finishes.
+    """
+
+    def __init__(self, root=TTS_CACHE_DIR, max_bytes=int(TTS_CACHE_MAX_MB * 1024 * 1024)):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.index = None  # OrderedDict key -> size, least recently used first
+        self.indexed_at = 0.0
+        self.total_bytes = 0
+        self.rescan_task = None
+
+        # Metrics
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.synth_failures = 0
+        self.synth_seconds = 0.0
+
+    def path(self, key):
+        return os.path.join(self.root, key[:2], f"{key}.mp3")
+
+    def _scan(self):
+        """(index, total bytes) of the clips on disk, oldest first. Removes stale .tmp files."""
+        files = []
+        if os.path.isdir(self.root):
+            for dirpath, _, names in os.walk(self.root):
+                for name in names:
+                    path = os.path.join(dirpath, name)
+                    try:
+                        stat = os.stat(path)
+                    except FileNotFoundError:
+                        continue  # renamed or evicted by another worker meanwhile
+                    if name.endswith(".tmp") and stat.st_mtime < time.time() - STALE_TMP_SECONDS:
+                        os.remove(path)  # another worker may still be writing a recent one
+                    elif name.endswith(".mp3"):
+                        files.append((stat.st_mtime, name[:-4], stat.st_size))
+        files.sort()
+        index = OrderedDict((key, size) for _, key, size in files)
+        return index, sum(index.values())
+
+    def _use_scan(self, index, total_bytes):
+        # Keep clips stored while the thread was walking (newer than anything it saw)
+        for key, size in self.index.items():
+            if key not in index and os.path.exists(self.path(key)):
+                index[key] = size
+                total_bytes += size
+        self.index, self.total_bytes = index, total_bytes
+        self._evict()
+
+    async def _rescan(self):
+        try:
+            self._use_scan(*await asyncio.to_thread(self._scan))
+        except Exception as e:
+            print(f"[TTSCache] Rescan failed: {e}")
+        finally:
+            self.rescan_task = None
+
+    def _load_index(self):
+        if self.index is not None and time.time() - self.indexed_at < TTS_CACHE_RESCAN_SECONDS:
+            return self.index
+        if self.index is not None:
+            try:
+                asyncio.get_running_loop()
+            except RuntimeError:
+                pass  # no event loop (scripts, stats from a thread): rescan inline
+            else:
+                if self.rescan_task is None:
+                    self.indexed_at = time.time()
+                    self.rescan_task = asyncio.ensure_future(self._rescan())
+                return self.index
+        first_load = self.index is None
+        self.index, self.total_bytes = self._scan()
+        self.indexed_at = time.time()
+        if first_load:
+            print(f"[TTSCache] {len(self.index)} cached clips ({self.total_bytes / 1024 / 1024:.1f} MB) in {self.root}")
+        self._evict()
+        return self.index
+
+    def _adopt(self, key):
+        """Adds a clip another worker wrote since the last scan. Whether it is on disk."""
+        try:
+            size = os.path.getsize(self.path(key))
+        except OSError:
+            return False
+        self.index[key] = size
+        self.total_bytes += size
+        self._evict()
+        return key in self.index
+
+    def _evict(self):
+        while self.total_bytes > self.max_bytes and len(self.index) > 1:
+            key, size = self.index.popitem(last=False)
+            self.total_bytes -= size
+            self.evictions += 1
+            try:
+                os.remove(self.path(key))
+            except FileNotFoundError:
+                pass
+
+    def _forget(self, key):
+        self.total_bytes -= self.index.pop(key, 0)
+
+    def contains(self, key):
+        """Whether a clip is cached, without counting a play."""
+        if key in self._load_index():
+            return os.path.exists(self.path(key))
+        return self._adopt(key)
+
+    def lookup(self, key):
+        """Path of the cached clip, or None. Counts as a play for LRU purposes."""
+        index = self._load_index()
+        if key not in index and not self._adopt(key):
+            self.misses += 1
+            return None
+        path = self.path(key)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            self._forget(key)  # deleted behind our back
+            self.misses += 1
+            return None
+        index.move_to_end(key)
+        self.hits += 1
+        return path
+
+    def _store(self, key, tmp_path):
+        index = self._load_index()
+        path = self.path(key)
+        os.replace(tmp_path, path)
+        self._forget(key)
+        index[key] = os.path.getsize(path)
+        self.total_bytes += index[key]
+        self._evict()
+
+    async def synthesize(self, text, voice, key=None):
+        """
+        Yields MP3 chunks as edge_tts produces them while writing them to the
+        cache. The clip is only added once the whole text was synthesized; if
+        the reader stops early or synthesis fails, the partial file is dropped.
+        """
+        import edge_tts
+
+        self._load_index()
+        key = key or cache_key(text, voice)
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        started = time.perf_counter()
+        completed = False
+        try:
+            with open(tmp_path, "wb") as f:
+                async for chunk in edge_tts.Communicate(normalize_text(text), voice).stream():
+                    if chunk["type"] == "audio":
+                        f.write(chunk["data"])
+                        yield chunk["data"]
+            completed = True
+        except Exception:
+            self.synth_failures += 1
+            raise
+        finally:
+            if completed and os.path.getsize(tmp_path) > 0:
+                self.synth_seconds += time.perf_counter() - started
+                self._store(key, tmp_path)
+            elif os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def stats(self):
+        self._load_index()
+        lookups = self.hits + self.misses
+        return {
+            "clips": len(self.index),
+            "size_mb": round(self.total_bytes / 1024 / 1024, 2),
+            "max_mb": round(self.max_bytes / 1024 / 1024, 2),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "synth_failures": self.synth_failures,
+            "synth_seconds": round(self.synth_seconds, 2),
+        }
+
+# Global instance
+tts_cache = TTSCache()
@@ -1,13 +1,19 @@
 import requests
 from bs4 import BeautifulSoup
 from datetime import datetime, timedelta
-from groq import Groq
 import os
 import json
 
-# Setup Groq Client
+# Setup Groq Client (created on first use so importing this module stays cheap)
 api_key = os.getenv("GROQ_API_KEY")
-client = Groq(api_key=api_key)
+_client = None
+
+def get_client():
+    global _client
+    if _client is None:
+        from groq import Groq
+        _client = Groq(api_key=api_key)
+    return _client
 
 def scrape_and_extract(url, scheme_name):
     """
@@ -56,7 +62,7 @@ def scrape_and_extract(url, scheme_name):
         If information is missing, use null or "all".
         """
 
-        completion = client.chat.completions.create(
+        completion = get_client().chat.completions.create(
             messages=[
                 {"role": "system", "content": system_prompt},
                 {"role": "user", "content": f"Extract eligibility for scheme '{scheme_name}' from this text:\n\n{content_for_llm}"}
@@ -115,6 +121,10 @@ async def update_scheme_data(db, scheme):
         
         # Merge for return
         scheme.update(valid_scheme)
+
+        # New text: re-translate and pre-synthesize its voice playback in the background
+        from scheme_audio import scheme_audio
+        scheme_audio.schedule(scheme["_id"])
         return scheme
     else:
         # Scrape failed, return old data but don't crash